@@ -0,0 +1,228 @@
+"""成绩统计分析 (NumPy 向量化)
+
+一次流式查询把所有已有成绩的选课读成列数组 (course_id, student_id, grade, credits)，
+再按课程 / 院系 / 入学年份分组，用排序 + reduceat 一次算出所有分组的人数、平均分、
+学分加权平均分、标准差、最值、分位数和分数段直方图，不对每个分组单独查询数据库。
+
+用法:
+    data = analytics.load_grades()
+    rows = analytics.course_stats(data)        # [{'course_id':..., 'mean':..., 'p50':..., 'histogram': [...]}, ...]
+    analytics.to_dataframe(rows)               # 需要 pandas
+"""
+try:
+    import numpy as np
+except ImportError:  # 只有统计分析需要 numpy，其余功能不受影响
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+import backend
+from compact_rows import ROW_COLUMNS, fetch_rows
+
+# 分数段边界：[0,60) [60,70) [70,80) [80,90) [90,100]
+GRADE_BINS = (0, 60, 70, 80, 90, 100)
+PERCENTILES = (25, 50, 75, 90)
+
+# grade + 0E0 让 MySQL 把 DECIMAL 转为 DOUBLE、SQLite 直接返回 REAL，省掉逐行构造 Decimal
+SQL_GRADE_COLUMNS = """
+    SELECT course_id, student_id, grade + 0E0 AS grade
+    FROM selections
+    WHERE grade IS NOT NULL
+"""
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("成绩统计分析需要安装 numpy (pip install numpy)")
+
+
+class GradeData:
+    """已有成绩的选课的列数组，以及课程、学生维度信息 (按选课行对齐)"""
+
+    def __init__(self, course_id, student_id, grade, courses, students):
+        self.course_id = course_id
+        self.student_id = student_id
+        self.grade = grade
+        self.courses = courses  # course_id -> 课程行
+        # 维度列：用排序后的 ID 做 searchsorted，把课程/学生属性展开到每一行
+        course_keys = np.array(sorted(courses), dtype=np.int64)
+        credits = np.array([courses[c]['credits'] or 0 for c in course_keys], dtype=np.float64)
+        departments = sorted({courses[c]['department'] or '' for c in course_keys})
+        dept_codes = np.array([departments.index(courses[c]['department'] or '') for c in course_keys],
+                              dtype=np.int64) if len(course_keys) else np.zeros(0, dtype=np.int64)
+        course_pos = np.searchsorted(course_keys, course_id)
+        self.credits = credits[course_pos] if len(course_keys) else np.zeros(0)
+        self.department_code = dept_codes[course_pos] if len(course_keys) else np.zeros(0, dtype=np.int64)
+        self.departments = departments
+        student_keys, years = students
+        student_pos = np.searchsorted(student_keys, student_id)
+        self.enrollment_year = years[student_pos] if len(student_keys) else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.grade)
+
+
+def _column_array(column, dtype):
+    """ColumnSet 的一列转为 numpy 数组：array.array 列直接按缓冲区转换，list 列中的 None 视为 0"""
+    if isinstance(column, list):
+        column = [value or 0 for value in column]
+    return np.asarray(column, dtype=dtype)
+
+
+def load_grades(chunk_size=50000):
+    """流式读取所有已有成绩的选课，返回 GradeData；连接失败时返回 None"""
+    _require_numpy()
+    # 按列读取 (compact_rows.ColumnSet)：整数/浮点列存为 array.array，不为每行构造 dict 或 numpy 行
+    conn, cursor = backend.get_db_connection(ROW_COLUMNS)
+    if not conn:
+        return None
+    try:
+        cursor.execute(SQL_GRADE_COLUMNS)
+        grades = fetch_rows(cursor, ROW_COLUMNS, chunk_size)
+        cursor.execute("SELECT course_id, course_name, credits, department FROM courses")
+        courses = {row[0]: {'course_id': row[0], 'course_name': row[1], 'credits': row[2], 'department': row[3]}
+                   for row in cursor.fetchall()}
+        cursor.execute("SELECT student_id, enrollment_year FROM students ORDER BY student_id")
+        student_columns = fetch_rows(cursor, ROW_COLUMNS, chunk_size)
+    except backend.DB_ERRORS as err:
+        backend.log(f"读取成绩数据失败: {err}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+    students = (_column_array(student_columns['student_id'], np.int64),
+                _column_array(student_columns['enrollment_year'], np.int64))
+    return GradeData(_column_array(grades['course_id'], np.int64), _column_array(grades['student_id'], np.int64),
+                     _column_array(grades['grade'], np.float64), courses, students)
+
+
+def group_stats(keys, grades, weights=None, percentiles=PERCENTILES, bins=GRADE_BINS):
+    """按 keys 分组计算成绩统计，所有分组一起向量化计算
+
+    返回 dict：'key' 为各分组的键，其余为与之对齐的数组 (count, mean, std, min, max,
+    weighted_mean, p25/p50/...)，'histogram' 为 (分组数, 分数段数) 的计数矩阵。
+    std 为总体标准差；分位数在组内线性插值 (与 numpy.percentile 默认方法一致)。
+    """
+    _require_numpy()
+    # 先按键、再按成绩排序：每个分组是连续的一段，且段内有序，分位数可以直接按下标取
+    order = np.lexsort((grades, keys))
+    keys, grades = keys[order], grades[order]
+    unique_keys, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    result = {'key': unique_keys, 'count': counts}
+    if len(unique_keys) == 0:
+        empty = np.zeros(0)
+        result.update(mean=empty, std=empty, min=empty, max=empty, weighted_mean=empty,
+                      histogram=np.zeros((0, len(bins) - 1), dtype=np.int64))
+        for pct in percentiles:
+            result[f'p{pct}'] = empty
+        return result
+
+    sums = np.add.reduceat(grades, starts)
+    squares = np.add.reduceat(grades * grades, starts)
+    mean = sums / counts
+    result['mean'] = mean
+    result['std'] = np.sqrt(np.maximum(squares / counts - mean * mean, 0.0))
+    result['min'] = grades[starts]
+    result['max'] = grades[starts + counts - 1]
+
+    if weights is not None:
+        weights = weights[order]
+        weight_sums = np.add.reduceat(weights, starts)
+        weighted = np.add.reduceat(grades * weights, starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result['weighted_mean'] = np.where(weight_sums > 0, weighted / weight_sums, np.nan)
+
+    for pct in percentiles:
+        position = starts + (counts - 1) * (pct / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, starts + counts - 1)
+        fraction = position - lower
+        result[f'p{pct}'] = grades[lower] + (grades[upper] - grades[lower]) * fraction
+
+    # 分数段：最后一段包含上界 (100 分落在 [90,100])
+    bin_index = np.clip(np.searchsorted(np.asarray(bins[1:-1]), grades, side='right'), 0, len(bins) - 2)
+    group_index = np.repeat(np.arange(len(unique_keys)), counts)
+    n_bins = len(bins) - 1
+    result['histogram'] = np.bincount(group_index * n_bins + bin_index,
+                                      minlength=len(unique_keys) * n_bins).reshape(len(unique_keys), n_bins)
+    return result
+
+
+def _rows(stats, key_name, labels=None):
+    """把 group_stats 的列数组转成 [dict]，数值保留两位小数"""
+    rows = []
+    value_fields = [name for name in stats if name not in ('key', 'count', 'histogram')]
+    for i, key in enumerate(stats['key'].tolist()):
+        row = {key_name: key, 'count': int(stats['count'][i])}
+        if labels:
+            row.update(labels(key))
+        for name in value_fields:
+            value = float(stats[name][i])
+            row[name] = None if np.isnan(value) else round(value, 2)
+        row['histogram'] = stats['histogram'][i].tolist()
+        rows.append(row)
+    return rows
+
+
+def course_stats(data=None):
+    """每门课程的成绩统计 (附课程名和院系)"""
+    data = data if data is not None else load_grades()
+    if data is None:
+        return []
+    stats = group_stats(data.course_id, data.grade, data.credits)
+
+    def labels(course_id):
+        course = data.courses.get(course_id, {})
+        return {'course_name': course.get('course_name'), 'department': course.get('department')}
+    return _rows(stats, 'course_id', labels)
+
+
+def department_stats(data=None):
+    """各开课院系的成绩统计 (按课程所属院系分组)"""
+    data = data if data is not None else load_grades()
+    if data is None:
+        return []
+    stats = group_stats(data.department_code, data.grade, data.credits)
+    return _rows(stats, 'department_code', lambda code: {'department': data.departments[code] or '未填写'})
+
+
+def enrollment_year_stats(data=None):
+    """按学生入学年份分组的成绩统计"""
+    data = data if data is not None else load_grades()
+    if data is None:
+        return []
+    stats = group_stats(data.enrollment_year, data.grade, data.credits)
+    return _rows(stats, 'enrollment_year')
+
+
+def overall_stats(data=None):
+    """全部已有成绩的选课作为一组的统计"""
+    data = data if data is not None else load_grades()
+    if data is None or len(data) == 0:
+        return None
+    stats = group_stats(np.zeros(len(data), dtype=np.int64), data.grade, data.credits)
+    row = _rows(stats, 'group')[0]
+    row.pop('group')
+    return row
+
+
+def to_dataframe(rows):
+    """把统计结果转成 pandas.DataFrame，直方图展开为每个分数段一列"""
+    if pd is None:
+        raise ImportError("to_dataframe 需要安装 pandas (pip install pandas)")
+    frame = pd.DataFrame(rows)
+    if 'histogram' in frame:
+        labels = [f"{GRADE_BINS[i]}-{GRADE_BINS[i + 1]}" for i in range(len(GRADE_BINS) - 1)]
+        frame[labels] = pd.DataFrame(frame.pop('histogram').tolist(), index=frame.index)
+    return frame
+
+
+# 供 GUI 使用：分组方式 -> (统计函数, 取分组显示名的函数)
+GROUPINGS = {
+    '按课程': (course_stats, lambda row: f"{row['course_id']} - {row['course_name']}"),
+    '按院系': (department_stats, lambda row: row['department']),
+    '按入学年份': (enrollment_year_stats, lambda row: str(row['enrollment_year'])),
+}
@@ -0,0 +1,379 @@
+"""异步 (asyncio) 版本的 backend 接口
+
+供 HTTP 等异步服务在一个事件循环里并发处理大量选课请求。函数名、参数和返回值与 backend.py
+中的同步函数一致。单条查询类的操作直接驱动 backend 中的 *_steps 生成器 (见 backend.run_steps)，
+SQL、事务边界、错误码处理、缓存失效和提示信息都与同步接口是同一份代码。
+
+- MySQL 引擎且安装了 aiomysql 时，使用 aiomysql 的异步连接池，等待数据库时不占用线程；
+- 否则 (SQLite 引擎，或没有安装 aiomysql) 把对应的同步函数放到专用线程池中执行。
+退课、删除学生、修改容量和候补队列的写操作需要在一个多语句事务中录取候补学生，始终复用同步实现。
+
+用法:
+    ok = await async_backend.select_course(1, 2)
+    ...
+    await async_backend.close_async_pool()   # 服务退出时
+"""
+import asyncio
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import backend
+from compact_rows import ROW_DICT, convert_rows, cursor_columns
+from storage_engines import DatabaseError
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+# --- 异步连接池配置 ---
+ASYNC_POOL_CONFIG = {
+    'minsize': 2,
+    'maxsize': 50,        # 异步连接不占线程，可以比同步连接池大，但不能超过 MySQL 的 max_connections
+    'pool_recycle': 300,  # 连接创建超过该秒数后重建
+}
+
+ASYNC_DB_ERRORS = backend.DB_ERRORS + ((aiomysql.MySQLError, OSError) if aiomysql is not None else ())
+
+_pool = None
+_pool_loop = None
+_pool_lock = None
+_executor = None
+
+def uses_aiomysql():
+    return aiomysql is not None and backend.DB_ENGINE == 'mysql'
+
+async def get_async_pool():
+    """获取(必要时创建)当前事件循环上的 aiomysql 连接池；不使用 aiomysql 时返回 None"""
+    global _pool, _pool_loop, _pool_lock
+    if not uses_aiomysql():
+        return None
+    loop = asyncio.get_running_loop()
+    if _pool_loop is not loop:
+        # aiomysql 连接池绑定在创建它的事件循环上，换了事件循环 (如多次 asyncio.run) 需要重建；
+        # 旧连接池要先关闭，否则它的连接会一直占着 MySQL 的连接数
+        if _pool is not None:
+            _discard_pool(_pool, _pool_loop)
+        _pool, _pool_loop, _pool_lock = None, loop, asyncio.Lock()
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                config = backend.DB_CONFIG
+                # autocommit：单条写语句不需要额外的 BEGIN/COMMIT 往返；
+                # aiomysql 归还连接时若仍在事务中会直接关闭该连接
+                _pool = await aiomysql.create_pool(
+                    host=config.get('host', 'localhost'), port=config.get('port', 3306),
+                    user=config.get('user'), password=config.get('password', ''),
+                    db=config.get('database'), autocommit=True, **ASYNC_POOL_CONFIG)
+    return _pool
+
+async def _close_pool(pool):
+    pool.close()
+    await pool.wait_closed()
+
+def _discard_pool(pool, pool_loop):
+    """关闭绑定在另一个事件循环上的连接池
+
+    旧循环仍在 (其他线程中) 运行时在它上面正常关闭。已经停止的循环上无法再等待 wait_closed，
+    transport.close() 也要靠旧循环执行回调才会真正关闭 socket，所以直接 shutdown 各连接的 socket：
+    MySQL 服务端随即释放这些连接，文件描述符随连接对象回收。
+    """
+    if pool_loop.is_running():
+        asyncio.run_coroutine_threadsafe(_close_pool(pool), pool_loop)
+        return
+    pool.close()  # 不再借出连接
+    for conn in (*pool._free, *pool._used):  # aiomysql 没有公开遍历连接的接口
+        sock = conn._writer.transport.get_extra_info('socket') if conn._writer is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # 连接已经断开
+
+async def close_async_pool():
+    """关闭异步连接池和备用线程池"""
+    global _pool, _executor
+    if _pool is not None:
+        if _pool_loop is asyncio.get_running_loop():
+            await _close_pool(_pool)
+        else:
+            _discard_pool(_pool, _pool_loop)
+        _pool = None
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+def _get_executor():
+    # 线程数与同步连接池的最大连接数相同，避免线程比连接多、在连接池上排队超时
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=backend.POOL_CONFIG['max_size'],
+                                       thread_name_prefix='async-backend')
+    return _executor
+
+async def _run_sync(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+def _database_error(err):
+    """aiomysql (PyMySQL) 的错误转换为 storage_engines.DatabaseError，backend 的 *_steps 才能按 err.errno 处理"""
+    if isinstance(err, backend.DB_ERRORS):
+        return err
+    # PyMySQL 的错误码和信息在 args 中: (errno, msg)
+    if len(err.args) >= 2 and isinstance(err.args[0], int):
+        return DatabaseError(str(err.args[1]), err.args[0])
+    return DatabaseError(str(err))
+
+async def _fetchall(pool, sql, params=(), row_format=ROW_DICT):
+    async with pool.acquire() as conn:
+        if row_format == ROW_DICT:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return convert_rows(cursor_columns(cursor), await cursor.fetchall(), row_format)
+
+async def _run_step(pool, conn, cursor, step, row_format):
+    action, sql, params = step
+    if action == backend.STEP_FETCH_EACH:
+        # 各条查询互不依赖，各借一个连接并发执行
+        return await asyncio.gather(*(_fetchall(pool, query, query_params, row_format) for query, query_params in sql))
+    if step == backend.STEP_BEGIN:
+        await conn.begin()
+    elif step in (backend.STEP_COMMIT, backend.STEP_ROLLBACK):
+        # 没有 STEP_BEGIN 时语句已自动提交，不必再多一次往返
+        if conn.get_transaction_status():
+            await (conn.commit() if step == backend.STEP_COMMIT else conn.rollback())
+    else:
+        await cursor.execute(sql, params)
+        if action == backend.STEP_FETCH_ONE:
+            return await cursor.fetchone()
+        if action == backend.STEP_FETCH_ALL:
+            rows = await cursor.fetchall()
+            return rows if row_format == ROW_DICT else convert_rows(cursor_columns(cursor), rows, row_format)
+        return cursor.rowcount, cursor.lastrowid
+    return None
+
+async def _run_steps(pool, steps, failed, row_format=ROW_DICT):
+    """在一个 aiomysql 连接上驱动 backend 的 *_steps 生成器，语义同 backend.run_steps
+
+    连接是自动提交的：没有 STEP_BEGIN 的写语句执行后即生效，STEP_COMMIT 不再发送 COMMIT；
+    有 STEP_BEGIN 时各语句在同一个事务中执行，出错时先回滚再把错误送回生成器。
+    """
+    try:
+        step = next(steps)
+    except StopIteration as stop:
+        return stop.value
+    try:
+        async with pool.acquire() as conn:
+            cursor_class = aiomysql.DictCursor if row_format == ROW_DICT else aiomysql.Cursor
+            async with conn.cursor(cursor_class) as cursor:
+                while True:
+                    result = error = None
+                    try:
+                        result = await _run_step(pool, conn, cursor, step, row_format)
+                    except ASYNC_DB_ERRORS as err:
+                        if conn.get_transaction_status():
+                            await conn.rollback()
+                        error = _database_error(err)
+                    try:
+                        step = steps.send(result) if error is None else steps.throw(error)
+                    except StopIteration as stop:
+                        return stop.value
+    except ASYNC_DB_ERRORS as err:
+        steps.close()
+        backend.log(f"数据库连接错误: {err}")
+        return failed
+
+# --- 学生管理 ---
+async def add_student(name, gender, enrollment_year, email):
+    """添加新学生"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.add_student, name, gender, enrollment_year, email)
+    return await _run_steps(pool, backend.add_student_steps(name, gender, enrollment_year, email), False)
+
+async def get_student_by_id(student_id):
+    """根据ID查询学生 (优先读缓存)"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_student_by_id, student_id)
+    return await _run_steps(pool, backend.get_student_by_id_steps(student_id), None)
+
+async def get_all_students(row_format=ROW_DICT):
+    """查询所有学生 (row_format 见 compact_rows.py)"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_all_students, row_format)
+    return await _run_steps(pool, backend.get_all_students_steps(), [], row_format)
+
+async def get_students_page(after_id=0, limit=100):
+    """键集分页查询学生：返回 student_id > after_id 的前 limit 条"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_students_page, after_id, limit)
+    return await _run_steps(pool, backend.get_students_page_steps(after_id, limit), [])
+
+async def update_student_email(student_id, new_email):
+    """更新学生邮箱"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.update_student_email, student_id, new_email)
+    return await _run_steps(pool, backend.update_student_email_steps(student_id, new_email), False)
+
+async def delete_student(student_id):
+    """删除学生；空出的名额要在同一事务中补给候补学生，直接复用同步实现"""
+    return await _run_sync(backend.delete_student, student_id)
+
+# --- 课程管理 ---
+async def add_course(course_name, teacher_name, credits, department, capacity=None):
+    """添加新课程；capacity 为选课人数上限，None 表示不限"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.add_course, course_name, teacher_name, credits, department, capacity)
+    return await _run_steps(pool, backend.add_course_steps(course_name, teacher_name, credits, department, capacity),
+                            False)
+
+async def get_course_by_id(course_id):
+    """根据ID查询课程 (优先读缓存)"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_course_by_id, course_id)
+    return await _run_steps(pool, backend.get_course_by_id_steps(course_id), None)
+
+async def get_all_courses(row_format=ROW_DICT):
+    """查询所有课程 (row_format 见 compact_rows.py)"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_all_courses, row_format)
+    return await _run_steps(pool, backend.get_all_courses_steps(), [], row_format)
+
+async def get_courses_page(after_id=0, limit=100):
+    """键集分页查询课程：返回 course_id > after_id 的前 limit 条"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_courses_page, after_id, limit)
+    return await _run_steps(pool, backend.get_courses_page_steps(after_id, limit), [])
+
+async def delete_course(course_id):
+    """删除课程 (级联删除其选课记录)"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.delete_course, course_id)
+    return await _run_steps(pool, backend.delete_course_steps(course_id), False)
+
+async def set_course_capacity(course_id, capacity):
+    """设置课程容量 (None 表示不限)；扩容时在同一事务中录取候补学生，直接复用同步实现"""
+    return await _run_sync(backend.set_course_capacity, course_id, capacity)
+
+# --- 选课管理 ---
+async def select_course(student_id, course_id):
+    """学生选课 (检查和插入在同一事务中，与同步接口相同)"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.select_course, student_id, course_id)
+    return await _run_steps(pool, backend.select_course_steps(student_id, course_id), False)
+
+async def bulk_select_courses(pairs, batch_size=1000):
+    """批量选课；本身是按批的集合操作，直接在线程池中执行同步实现"""
+    return await _run_sync(backend.bulk_select_courses, pairs, batch_size)
+
+async def record_grades(course_id, grades, batch_size=500):
+    """一个事务内为一门课批量录入成绩；需要先锁行再按批更新，直接在线程池中执行同步实现"""
+    return await _run_sync(backend.record_grades, course_id, grades, batch_size)
+
+async def drop_course(student_id, course_id):
+    """学生退课；空出的名额在同一事务中补给候补队列第一位，直接复用同步实现"""
+    return await _run_sync(backend.drop_course, student_id, course_id)
+
+async def get_student_selected_courses(student_id):
+    """查询某学生已选的所有课程"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_student_selected_courses, student_id)
+    return await _run_steps(pool, backend.get_student_selected_courses_steps(student_id), [])
+
+async def get_course_enrolled_students(course_id, row_format=ROW_DICT):
+    """查询某课程的所有选课学生"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_course_enrolled_students, course_id, row_format)
+    return await _run_steps(pool, backend.get_course_enrolled_students_steps(course_id), [], row_format)
+
+async def get_enrolled_students_by_course(course_ids, id_chunk=backend.ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    """{course_id: 选课学生列表}，参数同 backend.get_enrolled_students_by_course；各段查询并发执行，出错时返回 None"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_enrolled_students_by_course, course_ids, id_chunk, row_format)
+    return await _run_steps(pool, backend.get_enrolled_students_by_course_steps(course_ids, id_chunk, row_format),
+                            None, row_format)
+
+async def get_selected_courses_by_student(student_ids, id_chunk=backend.ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    """{student_id: 已选课程列表}，参数同 backend.get_selected_courses_by_student；各段查询并发执行，出错时返回 None"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_selected_courses_by_student, student_ids, id_chunk, row_format)
+    return await _run_steps(pool, backend.get_selected_courses_by_student_steps(student_ids, id_chunk, row_format),
+                            None, row_format)
+
+# --- 搜索 (全文索引查询，复用同步实现) ---
+async def search_students(query, limit=backend.SEARCH_LIMIT):
+    return await _run_sync(backend.search_students, query, limit)
+
+async def search_courses(query, limit=backend.SEARCH_LIMIT):
+    return await _run_sync(backend.search_courses, query, limit)
+
+# --- 变更日志 (复用同步实现) ---
+async def get_change_version(table_name=None):
+    return await _run_sync(backend.get_change_version, table_name)
+
+async def get_changes_since(version, limit=backend.CHANGE_LOG_LIMIT, tables=None):
+    return await _run_sync(backend.get_changes_since, version, limit, tables)
+
+async def get_students_by_ids(student_ids, row_format=backend.ROW_DICT):
+    return await _run_sync(backend.get_students_by_ids, student_ids, row_format)
+
+async def get_courses_by_ids(course_ids, row_format=backend.ROW_DICT):
+    return await _run_sync(backend.get_courses_by_ids, course_ids, row_format)
+
+# --- 候补队列 (多语句事务，复用同步实现) ---
+async def join_waitlist(student_id, course_id):
+    return await _run_sync(backend.join_waitlist, student_id, course_id)
+
+async def leave_waitlist(student_id, course_id):
+    return await _run_sync(backend.leave_waitlist, student_id, course_id)
+
+async def get_waitlist_position(student_id, course_id):
+    """查询候补排队位置 (从 1 开始)，不在队列中返回 None"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_waitlist_position, student_id, course_id)
+    return await _run_steps(pool, backend.get_waitlist_position_steps(student_id, course_id), None)
+
+# --- 成绩 ---
+async def record_grade(student_id, course_id, grade):
+    """为学生的某门已选课程记录成绩"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.record_grade, student_id, course_id, grade)
+    return await _run_steps(pool, backend.record_grade_steps(student_id, course_id, grade), False)
+
+async def get_student_summary(student_id):
+    """按主键读取学生的学分/成绩汇总"""
+    pool = await get_async_pool()
+    if pool is None:
+        return await _run_sync(backend.get_student_summary, student_id)
+    return await _run_steps(pool, backend.get_student_summary_steps(student_id), None)
+
+async def get_grade_audit_logs(limit=20, row_format=ROW_DICT):
+    """查询最近的成绩变更日志"""
+    return await get_grade_audit_page(limit=limit, row_format=row_format)
+
+async def get_grade_audit_page(after=None, limit=100, student_id=None, course_id=None, changed_by=None,
+                               since=None, until=None, include_archive=True, row_format=ROW_DICT):
+    """键集分页查询成绩变更日志 (含归档表)，参数同 backend.get_grade_audit_page；热表和归档表并发查询"""
+    pool = await get_async_pool()
+    args = (after, limit, student_id, course_id, changed_by, since, until, include_archive, row_format)
+    if pool is None:
+        return await _run_sync(backend.get_grade_audit_page, *args)
+    return await _run_steps(pool, backend.get_grade_audit_page_steps(*args), [], row_format)
@@ -0,0 +1,318 @@
+"""成绩审计日志归档脚本
+
+grade_audit_log 只保留最近 --keep-months 个月 (按变更时间所在月份) 的日志，更早的整月日志
+按批移入没有外键的归档表 grade_audit_log_archive (迁移 007)。backend.get_grade_audit_page /
+get_grade_audit_logs 会同时查询两张表，界面和调用方看到的仍是完整的日志。
+
+归档表中更冷的月份还可以导出为 gzip 压缩的 JSON Lines 文件 (记录在 manifest.json 中，含行数和
+sha256)，加 --purge 后从归档表删除已导出的行；需要时用 --restore 导回归档表。已删除过的月份
+再次导出 (之后又有该月的日志归档进来) 时写入新的分卷 grade_audit_YYYY-MM.partN.jsonl.gz，
+不会覆盖唯一的那份副本；未删除的分卷其行仍在归档表中，重新导出时被替换。
+
+用法:
+    python audit_archive.py --status                                  # 各月份热表/归档表行数
+    python audit_archive.py --keep-months 6                           # 把 6 个月之前的日志移入归档表
+    python audit_archive.py --export-dir archive --export-months 24   # 导出 24 个月之前的归档月份
+    python audit_archive.py --export-dir archive --export-months 24 --purge
+    python audit_archive.py --restore archive/grade_audit_2023-01.jsonl.gz
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+import backend
+
+AUDIT_COLUMNS = ('log_id', 'selection_id', 'student_id', 'course_id', 'old_grade', 'new_grade',
+                 'changed_by', 'change_timestamp')
+MANIFEST_NAME = 'manifest.json'
+NO_TIMESTAMP = '(无时间)'  # change_timestamp 为 NULL 的日志不参与归档
+
+SQL_OLDEST_BEFORE = """
+    SELECT log_id FROM {table}
+    WHERE change_timestamp < %s
+    ORDER BY change_timestamp, log_id
+    LIMIT %s
+"""
+SQL_ARCHIVE_MONTH = f"""
+    SELECT {', '.join(AUDIT_COLUMNS)} FROM grade_audit_log_archive
+    WHERE change_timestamp >= %s AND change_timestamp < %s
+    ORDER BY change_timestamp, log_id
+"""
+# 月份分组表达式 (状态统计用)
+MONTH_EXPR = {
+    'mysql': "DATE_FORMAT(change_timestamp, '%Y-%m')",
+    'sqlite': "strftime('%Y-%m', change_timestamp)",
+}
+
+
+def month_start(value, months_back=0):
+    """value 所在月份往前 months_back 个月的 1 日零点"""
+    index = value.year * 12 + value.month - 1 - months_back
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(text):
+    """'YYYY-MM' -> (该月 1 日, 下月 1 日)"""
+    start = datetime.strptime(text, '%Y-%m')
+    return start, month_start(start, -1)
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def archive_audit_logs(keep_months=6, before=None, batch_size=5000):
+    """把 change_timestamp 早于 before (默认为保留期起点) 的日志移到归档表
+
+    每批在一个事务中 INSERT ... SELECT 再 DELETE，中断后重新运行即可继续。
+    返回移动的行数，出错时返回 None。
+    """
+    cutoff = before or month_start(datetime.now(), keep_months)
+    columns = ', '.join(AUDIT_COLUMNS)
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        return None
+    moved = 0
+    try:
+        while True:
+            cursor.execute(SQL_OLDEST_BEFORE.format(table=backend.AUDIT_TABLE), (cutoff, batch_size))
+            log_ids = [row['log_id'] for row in cursor.fetchall()]
+            if not log_ids:
+                break
+            cursor.execute(f"INSERT INTO {backend.AUDIT_ARCHIVE_TABLE} ({columns}) "
+                           f"SELECT {columns} FROM {backend.AUDIT_TABLE} WHERE log_id IN ({_placeholders(log_ids)})",
+                           log_ids)
+            cursor.execute(f"DELETE FROM {backend.AUDIT_TABLE} WHERE log_id IN ({_placeholders(log_ids)})", log_ids)
+            conn.commit()
+            moved += len(log_ids)
+        return moved
+    except backend.DB_ERRORS as err:
+        print(f"归档审计日志失败 (已移动 {moved} 条): {err}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def audit_month_counts():
+    """{月份: {'hot': 热表行数, 'archived': 归档表行数}}，按月份排序"""
+    month = MONTH_EXPR[backend.get_engine().name]
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        return None
+    counts = {}
+    try:
+        for key, table in (('hot', backend.AUDIT_TABLE), ('archived', backend.AUDIT_ARCHIVE_TABLE)):
+            cursor.execute(f"SELECT {month} AS month, COUNT(*) AS n FROM {table} GROUP BY {month}")
+            for row in cursor.fetchall():
+                counts.setdefault(row['month'] or NO_TIMESTAMP, {'hot': 0, 'archived': 0})[key] = row['n']
+        return dict(sorted(counts.items()))
+    except backend.DB_ERRORS as err:
+        print(f"统计审计日志失败: {err}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# --- 归档文件 ---
+def load_manifest(directory):
+    """{'files': {月份: [分卷信息, ...]}}；旧版 manifest 每月只有一个文件，读入时转成单元素列表"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'files': {}}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    for month, parts in manifest['files'].items():
+        if isinstance(parts, dict):
+            manifest['files'][month] = [parts]
+    return manifest
+
+
+def save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def part_file_name(month, number):
+    """第 1 卷沿用旧的文件名，之后为 grade_audit_YYYY-MM.partN.jsonl.gz"""
+    if number == 1:
+        return f"grade_audit_{month}.jsonl.gz"
+    return f"grade_audit_{month}.part{number}.jsonl.gz"
+
+
+def export_archive_month(month, directory, purge=False, batch_size=5000):
+    """把归档表中 month ('YYYY-MM') 的日志写入 gzip JSON Lines 文件并登记到 manifest
+
+    已删除过 (purged) 的分卷是这些日志唯一的副本，保留不动，本次写入新的分卷；未删除的分卷
+    其行仍在归档表中，会包含在本次导出里，因此被替换。读取没有完成时放弃本次导出，不删除任何行。
+    purge 为 True 时，文件写完后按 log_id 删除刚导出的行 (导出后新归档进来的行不受影响)。
+    返回导出的行数，出错时返回 None。
+    """
+    start, end = parse_month(month)
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory)
+    parts = manifest['files'].get(month, [])
+    kept = [part for part in parts if part['purged']]
+    kept_names = {part['file'] for part in kept}
+    number = len(kept) + 1
+    while part_file_name(month, number) in kept_names:
+        number += 1
+    name = part_file_name(month, number)
+    path = os.path.join(directory, name)
+    digest = hashlib.sha256()
+    log_ids = []
+    try:
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+            for row in backend.iter_query(SQL_ARCHIVE_MONTH, (start, end), 5000, "读取归档日志", raise_errors=True):
+                line = json.dumps(row, ensure_ascii=False, default=str) + "\n"
+                f.write(line)
+                digest.update(line.encode('utf-8'))
+                log_ids.append(row['log_id'])
+    except backend.QueryInterrupted as err:
+        os.remove(path + '.tmp')
+        print(f"导出 {month} 失败，未删除任何日志: {err}")
+        return None
+    if not log_ids:
+        os.remove(path + '.tmp')
+        return 0
+    os.replace(path + '.tmp', path)
+
+    entry = {
+        'file': name,
+        'rows': len(log_ids),
+        'min_log_id': min(log_ids),
+        'max_log_id': max(log_ids),
+        'sha256': digest.hexdigest(),  # 解压后内容的摘要
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+        'purged': False,
+    }
+    manifest['files'][month] = kept + [entry]
+    save_manifest(directory, manifest)
+    for part in parts:
+        if not part['purged'] and part['file'] != name and os.path.exists(os.path.join(directory, part['file'])):
+            os.remove(os.path.join(directory, part['file']))
+    if not purge:
+        return len(log_ids)
+
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        return None
+    # 先登记为已删除再删除：中途失败时部分行已经只存在于这个文件里，以后重新导出不能再替换它
+    entry['purged'] = True
+    save_manifest(directory, manifest)
+    try:
+        for i in range(0, len(log_ids), batch_size):
+            chunk = log_ids[i:i + batch_size]
+            cursor.execute(f"DELETE FROM {backend.AUDIT_ARCHIVE_TABLE} WHERE log_id IN ({_placeholders(chunk)})", chunk)
+            conn.commit()
+    except backend.DB_ERRORS as err:
+        print(f"删除已导出的归档日志失败 (剩余的行下次导出时写入新的分卷): {err}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+    return len(log_ids)
+
+
+def read_archive_file(path):
+    """逐行读取归档文件，产出日志 dict"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def restore_archive_file(path, batch_size=5000):
+    """把归档文件中的日志导回归档表 (已存在的 log_id 跳过)，返回读取的行数，出错时返回 None"""
+    sql = (f"INSERT IGNORE INTO {backend.AUDIT_ARCHIVE_TABLE} ({', '.join(AUDIT_COLUMNS)}) "
+           f"VALUES ({_placeholders(AUDIT_COLUMNS)})")
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        return None
+    total = 0
+    batch = []
+    try:
+        for row in read_archive_file(path):
+            batch.append(tuple(row.get(column) for column in AUDIT_COLUMNS))
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                conn.commit()
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+        return total
+    except backend.DB_ERRORS as err:
+        print(f"导回归档文件失败: {err}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def print_status(directory=None):
+    counts = audit_month_counts()
+    if counts is None:
+        return False
+    files = load_manifest(directory)['files'] if directory else {}
+    print(f"{'月份':<10} {'热表':>10} {'归档表':>10}  归档文件")
+    for month in sorted(set(counts) | set(files)):
+        row = counts.get(month, {'hot': 0, 'archived': 0})
+        note = "; ".join(f"{part['file']} ({part['rows']} 行{', 已从归档表删除' if part['purged'] else ''})"
+                         for part in files.get(month, []))
+        print(f"{month:<10} {row['hot']:>10} {row['archived']:>10}  {note}")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="成绩审计日志按月归档")
+    parser.add_argument('--status', action='store_true', help="查看各月份热表/归档表行数")
+    parser.add_argument('--keep-months', type=int, default=6, help="热表保留最近几个月的日志")
+    parser.add_argument('--before', help="改为归档此日期 (YYYY-MM-DD) 之前的日志")
+    parser.add_argument('--batch-size', type=int, default=5000, help="每个事务移动的行数")
+    parser.add_argument('--export-dir', help="把归档表中的冷月份导出为压缩文件的目录")
+    parser.add_argument('--export-months', type=int, default=24, help="导出多少个月之前的归档月份")
+    parser.add_argument('--purge', action='store_true', help="导出后从归档表删除这些行")
+    parser.add_argument('--restore', help="把归档文件导回归档表")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        sys.exit(0 if print_status(args.export_dir) else 2)
+    if args.restore:
+        restored = restore_archive_file(args.restore, args.batch_size)
+        if restored is None:
+            sys.exit(2)
+        print(f"已从 {args.restore} 导回 {restored} 条日志。")
+        return
+    if args.export_dir:
+        counts = audit_month_counts()
+        if counts is None:
+            sys.exit(2)
+        cutoff = month_start(datetime.now(), args.export_months).strftime('%Y-%m')
+        for month, row in counts.items():
+            if row['archived'] and month != NO_TIMESTAMP and month < cutoff:
+                exported = export_archive_month(month, args.export_dir, args.purge, args.batch_size)
+                if exported is None:
+                    sys.exit(2)
+                print(f"{month}: 导出 {exported} 条{'，已从归档表删除' if args.purge else ''}")
+        return
+
+    before = datetime.strptime(args.before, '%Y-%m-%d') if args.before else None
+    moved = archive_audit_logs(args.keep_months, before, args.batch_size)
+    if moved is None:
+        sys.exit(2)
+    print(f"已归档 {moved} 条成绩审计日志。")
+
+if __name__ == "__main__":
+    main()
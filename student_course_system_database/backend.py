@@ -1,5 +1,21 @@
-import mysql.connector
+import os
+import sys
+import threading
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from decimal import Decimal
+
+import metrics
+from compact_rows import ROW_COLUMNS, ROW_DICT, ROW_TUPLE, cursor_columns, fetch_rows, row_class
+from db_pool import ConnectionPool, PoolExhaustedError
+from entity_cache import EntityCache
+from storage_engines import DB_ERRORS, ERRNO_COURSE_FULL, create_engine
+
+# --- 存储引擎 ---
+# 'mysql': 使用下面的 DB_CONFIG 连接 MySQL 服务器
+# 'sqlite': 内嵌 SQLite 数据库文件，无需数据库服务器 (也可用环境变量 SCS_DB_ENGINE 指定)
+DB_ENGINE = os.environ.get('SCS_DB_ENGINE', 'mysql')
 
 # --- 数据库连接配置 ---
 DB_CONFIG = {
@@ -9,92 +25,322 @@ DB_CONFIG = {
     'database': 'student_course_system' # 你创建的数据库名
 }
 
-def get_db_connection():
-    """获取数据库连接和游标"""
+SQLITE_CONFIG = {
+    'path': os.environ.get('SCS_SQLITE_PATH',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'student_course_system.db')),
+    'pragmas': None,  # 覆盖 SQLiteEngine.DEFAULT_PRAGMAS 中的项，如 {'synchronous': 'FULL'}
+}
+
+# --- 连接池配置 ---
+POOL_CONFIG = {
+    'min_size': 2,           # 常驻连接数
+    'max_size': 10,          # 最大连接数
+    'max_uses': 1000,        # 单个连接借出次数上限，超过后回收重建
+    'idle_timeout': 300,     # 空闲超过该秒数的连接在借出前回收
+    'checkout_timeout': 10,  # 借连接的最长等待秒数
+}
+
+_engine = None
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_engine():
+    """获取(必要时创建)当前存储引擎，首次调用时读取 DB_ENGINE 和对应配置"""
+    global _engine
+    if _engine is None:
+        with _pool_lock:
+            if _engine is None:
+                _engine = create_engine(DB_ENGINE, DB_CONFIG, SQLITE_CONFIG)
+    return _engine
+
+def get_pool():
+    """获取(必要时创建)全局连接池，首次调用时读取 POOL_CONFIG"""
+    global _pool
+    if _pool is None:
+        engine = get_engine()
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(engine.connect, validate=engine.validate, **POOL_CONFIG)
+    return _pool
+
+def close_pool():
+    """关闭全局连接池 (修改 DB_CONFIG/POOL_CONFIG 后可调用以重建)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def use_engine(name, **sqlite_config):
+    """切换存储引擎 ('mysql' / 'sqlite')：关闭现有连接池并清空缓存，下次访问时按新配置连接
+
+    SQLite 不能使用 ':memory:'，连接池里的每个连接会各自打开一个独立的内存库。
+    """
+    global DB_ENGINE, _engine
+    close_pool()
+    with _pool_lock:
+        DB_ENGINE = name
+        SQLITE_CONFIG.update(sqlite_config)
+        _engine = None
+    clear_caches()
+
+def get_pool_stats():
+    """连接池统计：借出次数、等待次数/时长、创建数、回收数等"""
+    return get_pool().stats()
+
+# --- 实体缓存配置 (get_student_by_id / get_course_by_id 读穿透，写操作失效) ---
+CACHE_CONFIG = {
+    'enabled': True,   # 调试时可设为 False 或调用 set_cache_enabled(False)
+    'max_size': 4096,  # 每类实体最多缓存条数 (LRU 淘汰)
+    'ttl': 30,         # 缓存条目过期秒数
+}
+
+_student_cache = EntityCache('students', **CACHE_CONFIG)
+_course_cache = EntityCache('courses', **CACHE_CONFIG)
+
+def _cache_key(entity_id):
+    """界面传入的 ID 可能是字符串，统一成 int 作为缓存键"""
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True) # dictionary=True 使查询结果为字典形式
+        return int(entity_id)
+    except (TypeError, ValueError):
+        return entity_id
+
+def set_cache_enabled(enabled):
+    """打开/关闭实体缓存；关闭时同时清空"""
+    CACHE_CONFIG['enabled'] = enabled
+    for cache in (_student_cache, _course_cache):
+        cache.enabled = enabled
+        cache.clear()
+
+def clear_caches():
+    _student_cache.clear()
+    _course_cache.clear()
+
+def get_cache_stats():
+    """缓存命中/未命中/淘汰/失效计数"""
+    return {'students': _student_cache.stats(), 'courses': _course_cache.stats()}
+
+# --- 日志 ---
+# 各函数的成功/失败提示默认打印到标准输出；批量任务、基准测试或服务端使用时可以关闭
+# (set_logging(False) 或环境变量 SCS_LOG=0)。耗时统计见 metrics.py。
+LOG_CONFIG = {'enabled': os.environ.get('SCS_LOG', '1') != '0'}
+
+def set_logging(enabled):
+    LOG_CONFIG['enabled'] = enabled
+
+def log(message):
+    """按 LOG_CONFIG 输出提示；async_backend、analytics 等模块也通过它输出，受同一开关控制"""
+    if LOG_CONFIG['enabled']:
+        print(message)
+
+def get_db_connection(row_format=ROW_DICT):
+    """从连接池借出连接并创建游标；conn.close() 会把连接归还连接池
+
+    row_format 为 ROW_DICT 时是字典游标，否则为元组游标，结果用 compact_rows.fetch_rows 转换。
+    """
+    try:
+        conn = get_pool().get_connection()
+        cursor = conn.cursor(dictionary=True) if row_format == ROW_DICT else conn.cursor() # dictionary=True 使查询结果为字典形式
         return conn, cursor
-    except mysql.connector.Error as err:
-        print(f"数据库连接错误: {err}")
+    except DB_ERRORS + (PoolExhaustedError, ImportError) as err:
+        log(f"数据库连接错误: {err}")
         return None, None
 
-# --- 学生管理 ---
-def add_student(name, gender, enrollment_year, email):
-    """添加新学生"""
-    conn, cursor = get_db_connection()
+class QueryInterrupted(Exception):
+    """iter_query(..., raise_errors=True) 没有读完结果：无法连接数据库或查询中途出错"""
+
+def iter_query(sql, params=(), chunk_size=1000, error_label="查询", row_format=ROW_DICT, raise_errors=False):
+    """在无缓冲(流式)游标上执行查询，每次 fetchmany(chunk_size) 并逐行产出
+
+    生成器存续期间会一直占用一个连接池连接；提前停止迭代时该连接直接丢弃，
+    避免为了归还连接而把剩余结果集全部读完。
+    row_format 为 ROW_TUPLE 时逐行产出紧凑的 Row (见 compact_rows.py)；流式查询不支持 ROW_COLUMNS。
+    默认出错时只记录日志并结束迭代，调用方无法区分"没有更多行"和"读取失败"；
+    raise_errors 为 True 时改为抛出 QueryInterrupted，需要完整结果的调用方 (导出、归档) 应使用。
+    """
+    if row_format not in (ROW_DICT, ROW_TUPLE):
+        raise ValueError(f"流式查询不支持行格式: {row_format}")
+    conn, cursor = get_db_connection(row_format)
     if not conn:
-        return False
+        if raise_errors:
+            raise QueryInterrupted(f"{error_label}失败: 无法连接数据库")
+        return
+    finished = False
     try:
-        sql = "INSERT INTO students (student_name, student_gender, enrollment_year, email) VALUES (%s, %s, %s, %s)"
-        cursor.execute(sql, (name, gender, enrollment_year, email))
-        conn.commit()
-        print(f"学生 '{name}' 添加成功！ID: {cursor.lastrowid}")
-        return True
-    except mysql.connector.Error as err:
-        print(f"添加学生失败: {err}")
-        return False
+        cursor.execute(sql, params)
+        make = row_class(cursor_columns(cursor))._make if row_format == ROW_TUPLE else None
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if make:
+                rows = map(make, rows)
+            for row in rows:
+                yield row
+        finished = True
+    except DB_ERRORS as err:
+        log(f"{error_label}失败: {err}")
+        if raise_errors:
+            raise QueryInterrupted(f"{error_label}失败: {err}") from err
     finally:
-        if conn:
+        if finished:
             cursor.close()
-            conn.close()
+        else:
+            conn.invalidate()
+        conn.close()
 
-def get_student_by_id(student_id):
-    """根据ID查询学生"""
-    conn, cursor = get_db_connection()
+# --- 操作步骤 (同步接口和 async_backend 共用) ---
+# 单条查询类的操作写成 *_steps 生成器：每一步 yield 一个 (动作, sql, params)，由驱动函数在连接上执行后
+# 把结果 send 回去，数据库错误 (带 errno 的 DB_ERRORS) 用 throw 送回生成器；生成器 return 操作的结果。
+# 同步接口用 run_steps 驱动，async_backend 在 aiomysql 连接上驱动同一个生成器，SQL、错误码处理、
+# 缓存失效和提示信息只写一份。
+STEP_FETCH_ONE = 'fetch_one'    # 返回一行 (dict) 或 None
+STEP_FETCH_ALL = 'fetch_all'    # 返回 fetch_rows(cursor, row_format)
+STEP_FETCH_EACH = 'fetch_each'  # sql 为 [(sql, params), ...]，返回各条查询的结果列表；异步驱动并发执行
+STEP_EXECUTE = 'execute'        # 返回 (rowcount, lastrowid)
+STEP_BEGIN = ('begin', None, None)  # 后续语句放进一个事务 (同步连接本来就不自动提交，只对异步连接有效)
+STEP_COMMIT = ('commit', None, None)
+STEP_ROLLBACK = ('rollback', None, None)
+
+def run_steps(steps, failed, row_format=ROW_DICT):
+    """在一个连接池连接上依次执行 steps 产出的各步，返回生成器的结果；无法连接时返回 failed
+
+    出错时先回滚再把错误送回生成器；生成器在第一步之前就返回 (如缓存命中) 时不借用连接。
+    """
+    try:
+        step = next(steps)
+    except StopIteration as stop:
+        return stop.value
+    conn, cursor = get_db_connection(row_format)
     if not conn:
-        return None
+        steps.close()
+        return failed
     try:
-        cursor.execute("SELECT * FROM students WHERE student_id = %s", (student_id,))
-        student = cursor.fetchone()
-        return student
-    except mysql.connector.Error as err:
-        print(f"查询学生失败: {err}")
-        return None
+        while True:
+            action, sql, params = step
+            try:
+                if action == STEP_FETCH_ONE:
+                    cursor.execute(sql, params)
+                    result = cursor.fetchone()
+                elif action == STEP_FETCH_ALL:
+                    cursor.execute(sql, params)
+                    result = fetch_rows(cursor, row_format)
+                elif action == STEP_FETCH_EACH:
+                    result = []
+                    for query, query_params in sql:
+                        cursor.execute(query, query_params)
+                        result.append(fetch_rows(cursor, row_format))
+                elif action == STEP_EXECUTE:
+                    cursor.execute(sql, params)
+                    result = cursor.rowcount, cursor.lastrowid
+                else:
+                    if step == STEP_COMMIT:
+                        conn.commit()
+                    elif step == STEP_ROLLBACK:
+                        conn.rollback()
+                    result = None
+            except DB_ERRORS as err:
+                conn.rollback()
+                step = steps.throw(err)
+            else:
+                step = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
     finally:
-        if conn:
-            cursor.close()
-            conn.close()
+        cursor.close()
+        conn.close()
 
-def get_all_students():
-    """查询所有学生"""
-    conn, cursor = get_db_connection()
-    if not conn:
+# --- 学生管理 ---
+# 同步接口和 async_backend 共用的 SQL
+SQL_INSERT_STUDENT = "INSERT INTO students (student_name, student_gender, enrollment_year, email) VALUES (%s, %s, %s, %s)"
+SQL_STUDENT_BY_ID = "SELECT * FROM students WHERE student_id = %s"
+SQL_ALL_STUDENTS = "SELECT * FROM students"
+SQL_ALL_STUDENTS_ORDERED = "SELECT * FROM students ORDER BY student_id"
+SQL_STUDENTS_PAGE = "SELECT * FROM students WHERE student_id > %s ORDER BY student_id LIMIT %s"
+SQL_UPDATE_STUDENT_EMAIL = "UPDATE students SET email = %s WHERE student_id = %s"
+SQL_DELETE_STUDENT = "DELETE FROM students WHERE student_id = %s"
+
+def add_student_steps(name, gender, enrollment_year, email):
+    try:
+        _, student_id = yield (STEP_EXECUTE, SQL_INSERT_STUDENT, (name, gender, enrollment_year, email))
+        yield STEP_COMMIT
+    except DB_ERRORS as err:
+        log(f"添加学生失败: {err}")
+        return False
+    _student_cache.invalidate(student_id)
+    log(f"学生 '{name}' 添加成功！ID: {student_id}")
+    return True
+
+def add_student(name, gender, enrollment_year, email):
+    """添加新学生"""
+    return run_steps(add_student_steps(name, gender, enrollment_year, email), False)
+
+def get_student_by_id_steps(student_id):
+    key = _cache_key(student_id)
+    generation = _student_cache.generation()
+    cached = _student_cache.get(key)
+    if cached is not EntityCache.MISSING:
+        return dict(cached)  # 返回副本，调用方修改不会污染缓存
+    try:
+        student = yield (STEP_FETCH_ONE, SQL_STUDENT_BY_ID, (student_id,))
+    except DB_ERRORS as err:
+        log(f"查询学生失败: {err}")
+        return None
+    if student:
+        _student_cache.put(key, dict(student), generation)
+    return student
+
+def get_student_by_id(student_id):
+    """根据ID查询学生 (优先读缓存)"""
+    return run_steps(get_student_by_id_steps(student_id), None)
+
+def get_all_students_steps():
+    try:
+        return (yield (STEP_FETCH_ALL, SQL_ALL_STUDENTS, ()))
+    except DB_ERRORS as err:
+        log(f"查询所有学生失败: {err}")
         return []
+
+def get_all_students(row_format=ROW_DICT):
+    """查询所有学生；学生很多时可用 row_format=ROW_TUPLE / ROW_COLUMNS 减少内存 (见 compact_rows.py)"""
+    return run_steps(get_all_students_steps(), [], row_format)
+
+def iter_all_students(chunk_size=1000, row_format=ROW_DICT):
+    """流式查询所有学生，按 student_id 顺序逐行产出，内存占用与表大小无关"""
+    return iter_query(SQL_ALL_STUDENTS_ORDERED, (), chunk_size, "流式查询学生", row_format)
+
+def get_students_page_steps(after_id, limit):
     try:
-        cursor.execute("SELECT * FROM students")
-        students = cursor.fetchall()
-        return students
-    except mysql.connector.Error as err:
-        print(f"查询所有学生失败: {err}")
+        return (yield (STEP_FETCH_ALL, SQL_STUDENTS_PAGE, (after_id, limit)))
+    except DB_ERRORS as err:
+        log(f"分页查询学生失败: {err}")
         return []
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
 
-def update_student_email(student_id, new_email):
-    """更新学生邮箱"""
-    conn, cursor = get_db_connection()
-    if not conn:
-        return False
+def get_students_page(after_id=0, limit=100):
+    """键集分页查询学生：返回 student_id > after_id 的前 limit 条
+
+    下一页传入本页最后一条的 student_id，每页代价与翻到第几页无关。
+    """
+    return run_steps(get_students_page_steps(after_id, limit), [])
+
+def update_student_email_steps(student_id, new_email):
     try:
-        sql = "UPDATE students SET email = %s WHERE student_id = %s"
-        cursor.execute(sql, (new_email, student_id))
-        conn.commit()
-        if cursor.rowcount > 0:
-            print(f"学生ID {student_id} 的邮箱更新成功！")
-            return True
-        else:
-            print(f"未找到学生ID {student_id} 或邮箱未改变。")
-            return False
-    except mysql.connector.Error as err:
-        print(f"更新学生邮箱失败: {err}")
+        rowcount, _ = yield (STEP_EXECUTE, SQL_UPDATE_STUDENT_EMAIL, (new_email, student_id))
+        yield STEP_COMMIT
+    except DB_ERRORS as err:
+        log(f"更新学生邮箱失败: {err}")
+        return False
+    _student_cache.invalidate(_cache_key(student_id))
+    if rowcount > 0:
+        log(f"学生ID {student_id} 的邮箱更新成功！")
+        return True
+    else:
+        log(f"未找到学生ID {student_id} 或邮箱未改变。")
         return False
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
+
+def update_student_email(student_id, new_email):
+    """更新学生邮箱"""
+    return run_steps(update_student_email_steps(student_id, new_email), False)
 
 def delete_student(student_id):
     """删除学生"""
@@ -103,17 +349,24 @@ def delete_student(student_id):
         return False
     try:
         # 注意：由于设置了外键的 ON DELETE CASCADE，相关的选课记录也会被删除
-        sql = "DELETE FROM students WHERE student_id = %s"
-        cursor.execute(sql, (student_id,))
+        cursor.execute("SELECT course_id FROM selections WHERE student_id = %s", (student_id,))
+        freed_courses = [row['course_id'] for row in cursor.fetchall()]
+        cursor.execute(SQL_DELETE_STUDENT, (student_id,))
+        deleted = cursor.rowcount
+        for course_id in freed_courses:
+            _promote_waitlist(cursor, course_id)  # 空出的名额补给候补学生
         conn.commit()
-        if cursor.rowcount > 0:
-            print(f"学生ID {student_id} 删除成功！")
+        _student_cache.invalidate(_cache_key(student_id))
+        _course_cache.clear()  # 级联删除选课记录会改变相关课程的选课人数
+        if deleted > 0:
+            log(f"学生ID {student_id} 删除成功！")
             return True
         else:
-            print(f"未找到学生ID {student_id}。")
+            log(f"未找到学生ID {student_id}。")
             return False
-    except mysql.connector.Error as err:
-        print(f"删除学生失败: {err}")
+    except DB_ERRORS as err:
+        conn.rollback()
+        log(f"删除学生失败: {err}")
         return False
     finally:
         if conn:
@@ -121,116 +374,281 @@ def delete_student(student_id):
             conn.close()
 
 # --- 课程管理 ---
-def add_course(course_name, teacher_name, credits, department):
-    """添加新课程"""
-    conn, cursor = get_db_connection()
-    if not conn:
-        return False
+SQL_INSERT_COURSE = ("INSERT INTO courses (course_name, teacher_name, credits, department, capacity) "
+                     "VALUES (%s, %s, %s, %s, %s)")
+SQL_COURSE_BY_ID = "SELECT * FROM courses WHERE course_id = %s"
+SQL_ALL_COURSES = "SELECT * FROM courses"
+SQL_ALL_COURSES_ORDERED = "SELECT * FROM courses ORDER BY course_id"
+SQL_COURSES_PAGE = "SELECT * FROM courses WHERE course_id > %s ORDER BY course_id LIMIT %s"
+SQL_DELETE_COURSE = "DELETE FROM courses WHERE course_id = %s"
+SQL_SET_COURSE_CAPACITY = "UPDATE courses SET capacity = %s WHERE course_id = %s"
+
+def add_course_steps(course_name, teacher_name, credits, department, capacity=None):
     try:
-        sql = "INSERT INTO courses (course_name, teacher_name, credits, department) VALUES (%s, %s, %s, %s)"
-        cursor.execute(sql, (course_name, teacher_name, credits, department))
-        conn.commit()
-        print(f"课程 '{course_name}' 添加成功！ID: {cursor.lastrowid}")
-        return True
-    except mysql.connector.Error as err:
-        print(f"添加课程失败: {err}")
+        _, course_id = yield (STEP_EXECUTE, SQL_INSERT_COURSE, (course_name, teacher_name, credits, department, capacity))
+        yield STEP_COMMIT
+    except DB_ERRORS as err:
+        log(f"添加课程失败: {err}")
         return False
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
+    _course_cache.invalidate(course_id)
+    log(f"课程 '{course_name}' 添加成功！ID: {course_id}")
+    return True
 
-def get_course_by_id(course_id):
-    """根据ID查询课程"""
-    conn, cursor = get_db_connection()
-    if not conn:
-        return None
+def add_course(course_name, teacher_name, credits, department, capacity=None):
+    """添加新课程；capacity 为选课人数上限，None 表示不限"""
+    return run_steps(add_course_steps(course_name, teacher_name, credits, department, capacity), False)
+
+def get_course_by_id_steps(course_id):
+    key = _cache_key(course_id)
+    generation = _course_cache.generation()
+    cached = _course_cache.get(key)
+    if cached is not EntityCache.MISSING:
+        return dict(cached)
     try:
-        cursor.execute("SELECT * FROM courses WHERE course_id = %s", (course_id,))
-        course = cursor.fetchone()
-        return course
-    except mysql.connector.Error as err:
-        print(f"查询课程失败: {err}")
+        course = yield (STEP_FETCH_ONE, SQL_COURSE_BY_ID, (course_id,))
+    except DB_ERRORS as err:
+        log(f"查询课程失败: {err}")
         return None
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
+    if course:
+        _course_cache.put(key, dict(course), generation)
+    return course
 
-def get_all_courses():
-    """查询所有课程"""
-    conn, cursor = get_db_connection()
-    if not conn:
+def get_course_by_id(course_id):
+    """根据ID查询课程 (优先读缓存)"""
+    return run_steps(get_course_by_id_steps(course_id), None)
+
+def get_all_courses_steps():
+    try:
+        return (yield (STEP_FETCH_ALL, SQL_ALL_COURSES, ()))
+    except DB_ERRORS as err:
+        log(f"查询所有课程失败: {err}")
         return []
+
+def get_all_courses(row_format=ROW_DICT):
+    """查询所有课程 (row_format 同 get_all_students)"""
+    return run_steps(get_all_courses_steps(), [], row_format)
+
+def iter_all_courses(chunk_size=1000, row_format=ROW_DICT):
+    """流式查询所有课程，按 course_id 顺序逐行产出"""
+    return iter_query(SQL_ALL_COURSES_ORDERED, (), chunk_size, "流式查询课程", row_format)
+
+def get_courses_page_steps(after_id, limit):
     try:
-        cursor.execute("SELECT * FROM courses")
-        courses = cursor.fetchall()
-        return courses
-    except mysql.connector.Error as err:
-        print(f"查询所有课程失败: {err}")
+        return (yield (STEP_FETCH_ALL, SQL_COURSES_PAGE, (after_id, limit)))
+    except DB_ERRORS as err:
+        log(f"分页查询课程失败: {err}")
         return []
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
+
+def get_courses_page(after_id=0, limit=100):
+    """键集分页查询课程：返回 course_id > after_id 的前 limit 条"""
+    return run_steps(get_courses_page_steps(after_id, limit), [])
+
+def delete_course_steps(course_id):
+    try:
+        # 注意：由于设置了外键的 ON DELETE CASCADE，相关的选课记录也会被删除
+        rowcount, _ = yield (STEP_EXECUTE, SQL_DELETE_COURSE, (course_id,))
+        yield STEP_COMMIT
+    except DB_ERRORS as err:
+        log(f"删除课程失败: {err}")
+        return False
+    _course_cache.invalidate(_cache_key(course_id))
+    if rowcount > 0:
+        log(f"课程ID {course_id} 删除成功！")
+        return True
+    else:
+        log(f"未找到课程ID {course_id}。")
+        return False
 
 def delete_course(course_id):
     """删除课程"""
+    return run_steps(delete_course_steps(course_id), False)
+
+def set_course_capacity(course_id, capacity):
+    """设置课程容量 (None 表示不限)；容量小于当前人数时不会退掉已选的学生，只是不再接受新的选课"""
     conn, cursor = get_db_connection()
     if not conn:
         return False
     try:
-        # 注意：由于设置了外键的 ON DELETE CASCADE，相关的选课记录也会被删除
-        sql = "DELETE FROM courses WHERE course_id = %s"
-        cursor.execute(sql, (course_id,))
+        cursor.execute(SQL_SET_COURSE_CAPACITY, (capacity, course_id))
+        updated = cursor.rowcount
+        promoted = _promote_waitlist(cursor, course_id) if updated else []  # 扩容时按批录取候补学生
         conn.commit()
-        if cursor.rowcount > 0:
-            print(f"课程ID {course_id} 删除成功！")
+        _course_cache.invalidate(_cache_key(course_id))
+        if updated > 0:
+            log(f"课程ID {course_id} 的容量设置为 {'不限' if capacity is None else capacity}。")
+            if promoted:
+                log(f"{len(promoted)} 名候补学生已自动选入课程ID {course_id}。")
             return True
         else:
-            print(f"未找到课程ID {course_id}。")
+            log(f"未找到课程ID {course_id}。")
             return False
-    except mysql.connector.Error as err:
-        print(f"删除课程失败: {err}")
+    except DB_ERRORS as err:
+        conn.rollback()
+        log(f"设置课程容量失败: {err}")
         return False
     finally:
-        if conn:
-            cursor.close()
-            conn.close()
+        cursor.close()
+        conn.close()
 
 # --- 选课管理 ---
-def select_course(student_id, course_id):
-    """学生选课"""
-    conn, cursor = get_db_connection()
-    if not conn:
-        return False
+# 一次往返同时确认学生和课程存在
+SQL_CHECK_STUDENT_AND_COURSE = """
+    SELECT EXISTS(SELECT 1 FROM students WHERE student_id = %s) AS student_exists,
+           EXISTS(SELECT 1 FROM courses WHERE course_id = %s) AS course_exists
+"""
+SQL_INSERT_SELECTION = "INSERT INTO selections (student_id, course_id, selection_date) VALUES (%s, %s, %s)"
+SQL_DELETE_SELECTION = "DELETE FROM selections WHERE student_id = %s AND course_id = %s"
+SQL_UPDATE_GRADE = "UPDATE selections SET grade = %s WHERE student_id = %s AND course_id = %s"
+
+def select_course_steps(student_id, course_id):
     try:
-        # 检查学生和课程是否存在
-        student = get_student_by_id(student_id)
-        course = get_course_by_id(course_id)
-        if not student:
-            print(f"错误：学生ID {student_id} 不存在。")
+        # 在同一连接、同一事务内用一条查询同时检查学生和课程是否存在
+        yield STEP_BEGIN
+        exists = yield (STEP_FETCH_ONE, SQL_CHECK_STUDENT_AND_COURSE, (student_id, course_id))
+        if not exists['student_exists']:
+            log(f"错误：学生ID {student_id} 不存在。")
+            yield STEP_ROLLBACK
             return False
-        if not course:
-            print(f"错误：课程ID {course_id} 不存在。")
+        if not exists['course_exists']:
+            log(f"错误：课程ID {course_id} 不存在。")
+            yield STEP_ROLLBACK
             return False
 
-        sql = "INSERT INTO selections (student_id, course_id, selection_date) VALUES (%s, %s, %s)"
         current_time = datetime.now()
-        cursor.execute(sql, (student_id, course_id, current_time))
-        conn.commit()
-        print(f"学生ID {student_id} 选修课程ID {course_id} 成功！")
-        return True
-    except mysql.connector.Error as err:
+        yield (STEP_EXECUTE, SQL_INSERT_SELECTION, (student_id, course_id, current_time))
+        yield STEP_COMMIT
+    except DB_ERRORS as err:
         if err.errno == 1062: # Duplicate entry
-             print(f"选课失败: 学生ID {student_id} 已选修课程ID {course_id}。")
+             log(f"选课失败: 学生ID {student_id} 已选修课程ID {course_id}。")
+        elif err.errno == ERRNO_COURSE_FULL: # 触发器占座失败
+            log(f"选课失败: 课程ID {course_id} 已满。")
+        elif err.errno == 1452: # 外键约束失败：检查之后学生或课程被并发删除
+            log(f"选课失败: 学生ID {student_id} 或课程ID {course_id} 不存在。")
         else:
-            print(f"选课失败: {err}")
+            log(f"选课失败: {err}")
         return False
+    _course_cache.invalidate(_cache_key(course_id))  # 触发器已修改 enrollment_count
+    log(f"学生ID {student_id} 选修课程ID {course_id} 成功！")
+    return True
+
+def select_course(student_id, course_id):
+    """学生选课"""
+    return run_steps(select_course_steps(student_id, course_id), False)
+
+# bulk_select_courses 返回的单条选课结果
+ENROLL_OK = 'ok'
+ENROLL_DUPLICATE = 'duplicate'             # 已选过 (1062) 或本次输入内重复
+ENROLL_MISSING_STUDENT = 'missing_student'
+ENROLL_MISSING_COURSE = 'missing_course'
+ENROLL_COURSE_FULL = 'course_full'
+ENROLL_INVALID = 'invalid'                 # student_id 或 course_id 不是整数
+ENROLL_ERROR = 'error'
+
+# bulk_select_courses 每批的集合式校验
+SQL_EXISTING_STUDENTS = "SELECT student_id FROM students WHERE student_id IN ({ids})"
+SQL_EXISTING_COURSES = "SELECT course_id FROM courses WHERE course_id IN ({ids})"
+SQL_EXISTING_SELECTIONS = "SELECT student_id, course_id FROM selections WHERE student_id IN ({students}) AND course_id IN ({courses})"
+
+def _placeholders(n):
+    """生成 IN 列表用的 '%s, %s, ...'"""
+    return ', '.join(['%s'] * n)
+
+def bulk_select_courses(pairs, batch_size=1000):
+    """批量选课：按批校验并插入 (student_id, course_id)，每批提交一次
+
+    返回与 pairs 顺序一致的 [(student_id, course_id, 状态)]，单条失败不影响同批其他记录；
+    ID 不是整数的记录为 ENROLL_INVALID (按原值返回)，不参与校验和插入。
+    """
+    parsed, outcomes = [], []
+    for student_id, course_id in pairs:
+        try:
+            parsed.append((int(student_id), int(course_id)))
+            outcomes.append(ENROLL_ERROR)
+        except (TypeError, ValueError):
+            parsed.append((student_id, course_id))
+            outcomes.append(ENROLL_INVALID)
+    pairs = parsed
+    valid = [i for i, outcome in enumerate(outcomes) if outcome != ENROLL_INVALID]
+    if not valid:
+        return [(s, c, outcome) for (s, c), outcome in zip(pairs, outcomes)]
+    conn, cursor = get_db_connection()
+    if not conn:
+        return [(s, c, outcome) for (s, c), outcome in zip(pairs, outcomes)]
+    seen = set()
+    insert_sql = SQL_INSERT_SELECTION
+    try:
+        for start in range(0, len(valid), batch_size):
+            batch = [(i, pairs[i]) for i in valid[start:start + batch_size]]
+            student_ids = sorted({s for _, (s, _c) in batch})
+            course_ids = sorted({c for _, (_s, c) in batch})
+
+            # 集合式校验：每批三条查询代替逐条 get_student_by_id / get_course_by_id
+            cursor.execute(SQL_EXISTING_STUDENTS.format(ids=_placeholders(len(student_ids))), tuple(student_ids))
+            found_students = {row['student_id'] for row in cursor.fetchall()}
+            cursor.execute(SQL_EXISTING_COURSES.format(ids=_placeholders(len(course_ids))), tuple(course_ids))
+            found_courses = {row['course_id'] for row in cursor.fetchall()}
+            cursor.execute(SQL_EXISTING_SELECTIONS.format(students=_placeholders(len(student_ids)),
+                                                          courses=_placeholders(len(course_ids))),
+                           tuple(student_ids) + tuple(course_ids))
+            existing = {(row['student_id'], row['course_id']) for row in cursor.fetchall()}
+
+            to_insert = []
+            for index, pair in batch:
+                student_id, course_id = pair
+                if student_id not in found_students:
+                    outcomes[index] = ENROLL_MISSING_STUDENT
+                elif course_id not in found_courses:
+                    outcomes[index] = ENROLL_MISSING_COURSE
+                elif pair in existing or pair in seen:
+                    outcomes[index] = ENROLL_DUPLICATE
+                else:
+                    seen.add(pair)
+                    to_insert.append(index)
+            if not to_insert:
+                conn.commit()
+                continue
+
+            now = datetime.now()
+            rows = [pairs[i] + (now,) for i in to_insert]
+            try:
+                # mysql.connector 会把 INSERT 的 executemany 改写成一条多行 INSERT；SQLite 在同一事务内逐行执行
+                cursor.executemany(insert_sql, rows)
+                conn.commit()
+                for i in to_insert:
+                    outcomes[i] = ENROLL_OK
+            except DB_ERRORS as err:
+                conn.rollback()
+                if err.errno not in (1062, 1452, ERRNO_COURSE_FULL):
+                    log(f"批量选课失败 (第 {batch[0][0] + 1} 条起的一批): {err}")
+                    continue
+                # 课程已满，或校验后被并发修改：本批退回逐条插入，失败的语句单独回滚，其余照常提交
+                for i, row in zip(to_insert, rows):
+                    try:
+                        cursor.execute(insert_sql, row)
+                        outcomes[i] = ENROLL_OK
+                    except DB_ERRORS as row_err:
+                        if row_err.errno == 1062:
+                            outcomes[i] = ENROLL_DUPLICATE
+                        elif row_err.errno == ERRNO_COURSE_FULL:
+                            outcomes[i] = ENROLL_COURSE_FULL
+                        elif row_err.errno == 1452:
+                            cursor.execute(SQL_CHECK_STUDENT_AND_COURSE, pairs[i])
+                            exists = cursor.fetchone()
+                            outcomes[i] = ENROLL_MISSING_COURSE if exists['student_exists'] else ENROLL_MISSING_STUDENT
+                        else:
+                            log(f"批量选课第 {i + 1} 条失败: {row_err}")
+                conn.commit()
+    except DB_ERRORS as err:
+        conn.rollback()
+        log(f"批量选课失败: {err}")
     finally:
-        if conn: # conn 可能因为 get_student_by_id 中的错误而为 None
-            cursor.close()
-            conn.close()
+        cursor.close()
+        conn.close()
+    for course_id in {c for (_s, c), outcome in zip(pairs, outcomes) if outcome == ENROLL_OK}:
+        _course_cache.invalidate(course_id)
+    ok_count = outcomes.count(ENROLL_OK)
+    log(f"批量选课完成：成功 {ok_count} 条，失败 {len(pairs) - ok_count} 条。")
+    return [(s, c, outcome) for (s, c), outcome in zip(pairs, outcomes)]
 
 
 def drop_course(student_id, course_id):
@@ -239,93 +657,716 @@ def drop_course(student_id, course_id):
     if not conn:
         return False
     try:
-        sql = "DELETE FROM selections WHERE student_id = %s AND course_id = %s"
-        cursor.execute(sql, (student_id, course_id))
+        cursor.execute(SQL_DELETE_SELECTION, (student_id, course_id))
+        dropped = cursor.rowcount
+        # 在同一事务中把空出的名额补给候补队列的第一位，不会出现名额先被别人抢走的空档
+        promoted = _promote_waitlist(cursor, course_id) if dropped else []
         conn.commit()
-        if cursor.rowcount > 0:
-            print(f"学生ID {student_id} 退选课程ID {course_id} 成功！")
+        _course_cache.invalidate(_cache_key(course_id))
+        if dropped > 0:
+            log(f"学生ID {student_id} 退选课程ID {course_id} 成功！")
+            for promoted_id in promoted:
+                log(f"候补学生ID {promoted_id} 已自动选入课程ID {course_id}。")
             return True
         else:
-            print(f"未找到学生ID {student_id} 对课程ID {course_id} 的选课记录。")
+            log(f"未找到学生ID {student_id} 对课程ID {course_id} 的选课记录。")
             return False
-    except mysql.connector.Error as err:
-        print(f"退课失败: {err}")
+    except DB_ERRORS as err:
+        conn.rollback()
+        log(f"退课失败: {err}")
         return False
     finally:
         if conn:
             cursor.close()
             conn.close()
 
-def get_student_selected_courses(student_id):
-    """查询某学生已选的所有课程"""
+# --- 候补队列 ---
+# 每批录取的候补人数：扩容或大量退课时一次 SELECT + 一条多行 INSERT + 一次 DELETE 处理一批
+PROMOTION_BATCH_SIZE = 500
+
+# 锁住课程行：同一课程的入队、出队、录取互相串行，不同课程互不影响
+SQL_LOCK_COURSE_SEATS = "SELECT capacity, enrollment_count FROM courses WHERE course_id = %s FOR UPDATE"
+# 队首尚未选上这门课的候补学生 (已通过 select_course 直接选上的跳过，随本批一起出队)
+SQL_WAITLIST_HEAD = """
+    SELECT w.student_id, w.seq
+    FROM waitlist w
+    WHERE w.course_id = %s
+      AND NOT EXISTS (SELECT 1 FROM selections s WHERE s.student_id = w.student_id AND s.course_id = w.course_id)
+    ORDER BY w.seq
+    LIMIT %s
+"""
+SQL_WAITLIST_POP = "DELETE FROM waitlist WHERE course_id = %s AND seq <= %s"
+# 新序号在同一条语句中计算，SQLite 下也不会和其他连接的入队冲突
+SQL_WAITLIST_PUSH = """
+    INSERT INTO waitlist (course_id, student_id, seq)
+    SELECT %s, %s, COALESCE(MAX(seq), 0) + 1 FROM waitlist WHERE course_id = %s
+"""
+SQL_WAITLIST_POSITION = """
+    SELECT w.seq - (SELECT MIN(h.seq) FROM waitlist h WHERE h.course_id = w.course_id) + 1 AS position
+    FROM waitlist w
+    WHERE w.student_id = %s AND w.course_id = %s
+"""
+SQL_COURSE_WAITLIST = """
+    SELECT w.student_id, st.student_name, w.seq, w.joined_at
+    FROM waitlist w
+    JOIN students st ON st.student_id = w.student_id
+    WHERE w.course_id = %s
+    ORDER BY w.seq
+    LIMIT %s
+"""
+
+def _promote_waitlist(cursor, course_id, batch_size=PROMOTION_BATCH_SIZE):
+    """在调用方的事务中按空余名额录取候补队列头部的学生，返回被录取的 student_id 列表"""
+    promoted = []
+    while True:
+        cursor.execute(SQL_LOCK_COURSE_SEATS, (course_id,))
+        course = cursor.fetchone()
+        if not course:
+            break
+        free = batch_size
+        if course['capacity'] is not None:
+            free = min(batch_size, course['capacity'] - course['enrollment_count'])
+        if free <= 0:
+            break
+        cursor.execute(SQL_WAITLIST_HEAD, (course_id, free))
+        head = cursor.fetchall()
+        if not head:
+            break
+        cursor.execute(SQL_WAITLIST_POP, (course_id, head[-1]['seq']))
+        now = datetime.now()
+        cursor.executemany(SQL_INSERT_SELECTION, [(row['student_id'], course_id, now) for row in head])
+        promoted.extend(row['student_id'] for row in head)
+        if len(head) < free:
+            break
+    return promoted
+
+def join_waitlist(student_id, course_id):
+    """加入课程候补队列，返回排队位置 (从 1 开始)；失败返回 None"""
     conn, cursor = get_db_connection()
     if not conn:
-        return []
+        return None
     try:
-        # 使用 JOIN 查询课程名等详细信息
-        sql = """
-            SELECT c.course_id, c.course_name, c.teacher_name, c.credits, s.selection_date, s.grade
-            FROM courses c
-            JOIN selections s ON c.course_id = s.course_id
-            WHERE s.student_id = %s
-        """
-        cursor.execute(sql, (student_id,))
-        selected_courses = cursor.fetchall()
-        return selected_courses
-    except mysql.connector.Error as err:
-        print(f"查询学生已选课程失败: {err}")
-        return []
+        cursor.execute(SQL_CHECK_STUDENT_AND_COURSE, (student_id, course_id))
+        exists = cursor.fetchone()
+        if not exists['student_exists'] or not exists['course_exists']:
+            log(f"加入候补失败: 学生ID {student_id} 或课程ID {course_id} 不存在。")
+            return None
+        cursor.execute("SELECT 1 FROM selections WHERE student_id = %s AND course_id = %s", (student_id, course_id))
+        if cursor.fetchone():
+            log(f"加入候补失败: 学生ID {student_id} 已选修课程ID {course_id}。")
+            return None
+        cursor.execute(SQL_LOCK_COURSE_SEATS, (course_id,))
+        course = cursor.fetchone()
+        if course['capacity'] is None or course['enrollment_count'] < course['capacity']:
+            conn.rollback()
+            log(f"课程ID {course_id} 尚有名额，请直接选课。")
+            return None
+        cursor.execute(SQL_WAITLIST_PUSH, (course_id, student_id, course_id))
+        cursor.execute(SQL_WAITLIST_POSITION, (student_id, course_id))
+        position = cursor.fetchone()['position']
+        conn.commit()
+        log(f"学生ID {student_id} 已加入课程ID {course_id} 的候补队列，当前第 {position} 位。")
+        return position
+    except DB_ERRORS as err:
+        conn.rollback()
+        if err.errno == 1062:
+            log(f"加入候补失败: 学生ID {student_id} 已在课程ID {course_id} 的候补队列中。")
+        else:
+            log(f"加入候补失败: {err}")
+        return None
     finally:
-        if conn:
-            cursor.close()
-            conn.close()
+        cursor.close()
+        conn.close()
 
-def get_course_enrolled_students(course_id):
-    """查询某课程的所有选课学生"""
+def leave_waitlist(student_id, course_id):
+    """退出候补队列，排在后面的学生位置各前移一位"""
+    conn, cursor = get_db_connection()
+    if not conn:
+        return False
+    try:
+        cursor.execute(SQL_LOCK_COURSE_SEATS, (course_id,))
+        cursor.fetchall()
+        cursor.execute("SELECT seq FROM waitlist WHERE student_id = %s AND course_id = %s", (student_id, course_id))
+        row = cursor.fetchone()
+        if not row:
+            conn.rollback()
+            log(f"学生ID {student_id} 不在课程ID {course_id} 的候补队列中。")
+            return False
+        cursor.execute("DELETE FROM waitlist WHERE student_id = %s AND course_id = %s", (student_id, course_id))
+        # 保持序号连续，位置查询才能用 seq - MIN(seq) 直接算出；退出队列远比查询位置少见
+        cursor.execute("UPDATE waitlist SET seq = seq - 1 WHERE course_id = %s AND seq > %s", (course_id, row['seq']))
+        conn.commit()
+        log(f"学生ID {student_id} 已退出课程ID {course_id} 的候补队列。")
+        return True
+    except DB_ERRORS as err:
+        conn.rollback()
+        log(f"退出候补失败: {err}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_waitlist_position_steps(student_id, course_id):
+    try:
+        row = yield (STEP_FETCH_ONE, SQL_WAITLIST_POSITION, (student_id, course_id))
+    except DB_ERRORS as err:
+        log(f"查询候补位置失败: {err}")
+        return None
+    return row['position'] if row else None
+
+def get_waitlist_position(student_id, course_id):
+    """查询候补排队位置 (从 1 开始)，不在队列中返回 None"""
+    return run_steps(get_waitlist_position_steps(student_id, course_id), None)
+
+def get_course_waitlist(course_id, limit=100):
+    """按排队顺序返回课程候补队列的前 limit 名，附带 position"""
     conn, cursor = get_db_connection()
     if not conn:
         return []
     try:
-        # 使用 JOIN 查询学生名等详细信息
-        sql = """
-            SELECT st.student_id, st.student_name, st.email, s.selection_date, s.grade
-            FROM students st
-            JOIN selections s ON st.student_id = s.student_id
-            WHERE s.course_id = %s
-        """
-        cursor.execute(sql, (course_id,))
-        enrolled_students = cursor.fetchall()
-        return enrolled_students
-    except mysql.connector.Error as err:
-        print(f"查询课程选课学生失败: {err}")
+        cursor.execute(SQL_COURSE_WAITLIST, (course_id, limit))
+        rows = cursor.fetchall()
+        if rows:
+            head = rows[0]['seq']
+            for row in rows:
+                row['position'] = row['seq'] - head + 1
+        return rows
+    except DB_ERRORS as err:
+        log(f"查询候补队列失败: {err}")
         return []
     finally:
-        if conn:
-            cursor.close()
-            conn.close()
+        cursor.close()
+        conn.close()
+
+# 使用 JOIN 查询课程名等详细信息
+SQL_STUDENT_SELECTED_COURSES = """
+    SELECT c.course_id, c.course_name, c.teacher_name, c.credits, s.selection_date, s.grade
+    FROM courses c
+    JOIN selections s ON c.course_id = s.course_id
+    WHERE s.student_id = %s
+"""
+
+def get_student_selected_courses_steps(student_id):
+    try:
+        return (yield (STEP_FETCH_ALL, SQL_STUDENT_SELECTED_COURSES, (student_id,)))
+    except DB_ERRORS as err:
+        log(f"查询学生已选课程失败: {err}")
+        return []
+
+def get_student_selected_courses(student_id):
+    """查询某学生已选的所有课程"""
+    return run_steps(get_student_selected_courses_steps(student_id), [])
+
+# 使用 JOIN 查询学生名等详细信息；selections(course_id, ...) 覆盖索引见 migrations/001
+SQL_COURSE_ENROLLED_STUDENTS = """
+    SELECT st.student_id, st.student_name, st.email, s.selection_date, s.grade
+    FROM students st
+    JOIN selections s ON st.student_id = s.student_id
+    WHERE s.course_id = %s
+"""
+
+def get_course_enrolled_students_steps(course_id):
+    try:
+        return (yield (STEP_FETCH_ALL, SQL_COURSE_ENROLLED_STUDENTS, (course_id,)))
+    except DB_ERRORS as err:
+        log(f"查询课程选课学生失败: {err}")
+        return []
+
+def get_course_enrolled_students(course_id, row_format=ROW_DICT):
+    """查询某课程的所有选课学生 (row_format 同 get_all_students)"""
+    return run_steps(get_course_enrolled_students_steps(course_id), [], row_format)
+
+# --- 批量名单：一次查询多门课程 / 多个学生，避免逐个 ID 查询 (N+1) ---
+ROSTER_ID_CHUNK = 1000  # 每条查询 IN 列表中的 ID 数上限，ID 更多时自动分成多条查询
+
+# 按 (course_id, student_id) 排序，沿 idx_selections_course_cover 顺序读取，结果已按课程分组
+SQL_ENROLLED_STUDENTS_BY_COURSE = """
+    SELECT s.course_id, st.student_id, st.student_name, st.email, s.selection_date, s.grade
+    FROM selections s
+    JOIN students st ON st.student_id = s.student_id
+    WHERE s.course_id IN ({ids})
+    ORDER BY s.course_id, s.student_id
+"""
+# 按 (student_id, course_id) 唯一键顺序读取
+SQL_SELECTED_COURSES_BY_STUDENT = """
+    SELECT s.student_id, c.course_id, c.course_name, c.teacher_name, c.credits, s.selection_date, s.grade
+    FROM selections s
+    JOIN courses c ON c.course_id = s.course_id
+    WHERE s.student_id IN ({ids})
+    ORDER BY s.student_id, s.course_id
+"""
+
+def id_chunks(ids, chunk_size=ROSTER_ID_CHUNK):
+    """去重排序后的 ID 按 chunk_size 分段，返回 [[id, ...], ...]"""
+    ids = sorted({int(i) for i in ids})
+    return [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+def _iter_grouped(sql, key, ids, id_chunk, row_format, error_label):
+    """按 ID 分段执行 sql，流式产出 (ID, [行])；每个请求的 ID 都会产出一次 (没有行时为空列表)
+
+    sql 按 key 排序，所以同一 ID 的行是连续的，用 groupby 逐组产出，不必先读完整个结果集。
+    查询出错时抛出 QueryInterrupted，不能把没读到的名单当作空列表或只产出一部分。
+    """
+    get_key = itemgetter(key)
+    for chunk in id_chunks(ids, id_chunk):
+        rows = iter_query(sql.format(ids=_placeholders(len(chunk))), tuple(chunk), 1000, error_label, row_format,
+                          raise_errors=True)
+        pending = iter(chunk)
+        for group_id, group in groupby(rows, key=get_key):
+            for requested in pending:
+                if requested == group_id:
+                    break
+                yield requested, []
+            yield group_id, list(group)
+        for requested in pending:
+            yield requested, []
+
+def group_rows(ids, rows, key):
+    """把行按 row[key] 分组为 {ID: [行]}，ids 中没有行的 ID 对应空列表"""
+    grouped = {int(i): [] for i in ids}
+    for row in rows:
+        grouped.setdefault(row[key], []).append(row)
+    return grouped
+
+def _grouped_rows_steps(sql, key, ids, id_chunk, row_format, error_label):
+    """各段 IN 列表查询作为一步取回 (异步驱动并发执行)，合并为 {ID: [行]}；出错时返回 None"""
+    if row_format not in (ROW_DICT, ROW_TUPLE):
+        raise ValueError(f"按 ID 分组的名单不支持行格式: {row_format}")
+    chunks = id_chunks(ids, id_chunk)
+    try:
+        pages = yield (STEP_FETCH_EACH, [(sql.format(ids=_placeholders(len(chunk))), tuple(chunk))
+                                         for chunk in chunks], None)
+    except DB_ERRORS as err:
+        log(f"{error_label}失败: {err}")
+        return None
+    return group_rows((i for chunk in chunks for i in chunk), (row for page in pages for row in page), key)
+
+def get_enrolled_students_by_course_steps(course_ids, id_chunk=ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    return _grouped_rows_steps(SQL_ENROLLED_STUDENTS_BY_COURSE, 'course_id', course_ids, id_chunk, row_format,
+                               "批量查询课程选课学生")
+
+def get_selected_courses_by_student_steps(student_ids, id_chunk=ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    return _grouped_rows_steps(SQL_SELECTED_COURSES_BY_STUDENT, 'student_id', student_ids, id_chunk, row_format,
+                               "批量查询学生已选课程")
+
+def iter_enrolled_students_by_course(course_ids, id_chunk=ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    """按 course_id 升序逐门产出 (course_id, 选课学生列表)，行格式同 get_course_enrolled_students 并多一列 course_id
+
+    数据库出错时抛出 QueryInterrupted (此前已产出的课程名单是完整的)。
+    """
+    return _iter_grouped(SQL_ENROLLED_STUDENTS_BY_COURSE, 'course_id', course_ids, id_chunk, row_format,
+                         "批量查询课程选课学生")
+
+def get_enrolled_students_by_course(course_ids, id_chunk=ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    """{course_id: 选课学生列表}，一次查询代替逐门调用 get_course_enrolled_students；出错时返回 None"""
+    return run_steps(get_enrolled_students_by_course_steps(course_ids, id_chunk, row_format), None, row_format)
+
+def iter_selected_courses_by_student(student_ids, id_chunk=ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    """按 student_id 升序逐个产出 (student_id, 已选课程列表)，行格式同 get_student_selected_courses 并多一列 student_id
+
+    数据库出错时抛出 QueryInterrupted (此前已产出的课表是完整的)。
+    """
+    return _iter_grouped(SQL_SELECTED_COURSES_BY_STUDENT, 'student_id', student_ids, id_chunk, row_format,
+                         "批量查询学生已选课程")
+
+def get_selected_courses_by_student(student_ids, id_chunk=ROSTER_ID_CHUNK, row_format=ROW_DICT):
+    """{student_id: 已选课程列表}，一次查询代替逐个调用 get_student_selected_courses；出错时返回 None"""
+    return run_steps(get_selected_courses_by_student_steps(student_ids, id_chunk, row_format), None, row_format)
+
+def record_grade_steps(student_id, course_id, grade):
+    try:
+        rowcount, _ = yield (STEP_EXECUTE, SQL_UPDATE_GRADE, (grade, student_id, course_id))
+        yield STEP_COMMIT
+    except DB_ERRORS as err:
+        log(f"录入成绩失败: {err}")
+        return False
+    if rowcount > 0:
+        log(f"学生ID {student_id} 的课程ID {course_id} 成绩录入为 {grade} 成功！")
+        return True
+    else:
+        log(f"未找到学生ID {student_id} 对课程ID {course_id} 的选课记录，或成绩未改变。")
+        return False
 
 def record_grade(student_id, course_id, grade):
     """为学生的某门已选课程记录成绩"""
+    return run_steps(record_grade_steps(student_id, course_id, grade), False)
+
+# record_grades 返回的单个学生结果
+GRADE_OK = 'ok'
+GRADE_UNCHANGED = 'unchanged'        # 与已有成绩相同，不执行 UPDATE，也不产生审计日志
+GRADE_NOT_ENROLLED = 'not_enrolled'  # 该学生未选这门课
+GRADE_INVALID = 'invalid'            # 不是 0-100 之间的数字
+GRADE_ERROR = 'error'
+GRADE_RANGE = (Decimal('0'), Decimal('100'))
+
+SQL_LOCK_COURSE_GRADES = "SELECT student_id, grade FROM selections WHERE course_id = %s AND student_id IN ({}) FOR UPDATE"
+# 一条 UPDATE 写入一批成绩：CASE 按 student_id 取各自的新成绩
+SQL_UPDATE_GRADES_CASE = "UPDATE selections SET grade = CASE student_id {cases} END WHERE course_id = %s AND student_id IN ({ids})"
+
+def _parse_grade(grade):
+    """把输入的成绩规范为两位小数的 Decimal；None/空串表示清除成绩；无效时返回 GRADE_INVALID"""
+    if grade is None or grade == '':
+        return None
+    try:
+        value = Decimal(str(grade).strip()).quantize(Decimal('0.01'))
+    except (ArithmeticError, ValueError):
+        return GRADE_INVALID
+    if not value.is_finite() or not GRADE_RANGE[0] <= value <= GRADE_RANGE[1]:
+        return GRADE_INVALID
+    return value
+
+def record_grades(course_id, grades, batch_size=500):
+    """在一个事务中为一门课录入一批成绩 {student_id: grade}，grade 为 None 表示清除
+
+    先锁定这些学生的选课行并读出原成绩，只对成绩确有变化的行执行按批的 CASE UPDATE，
+    全部成功后提交一次。返回 {student_id: 结果}；数据库出错时整批回滚，结果均为 GRADE_ERROR。
+    student_id 不是整数的项以原来的键报告为 GRADE_INVALID。
+    """
+    outcomes, parsed = {}, {}
+    for key, grade in grades.items():
+        value = _parse_grade(grade)
+        try:
+            student_id = int(key)
+        except (TypeError, ValueError):
+            student_id, value = key, GRADE_INVALID
+        if value == GRADE_INVALID:
+            outcomes[student_id] = GRADE_INVALID
+        else:
+            parsed[student_id] = value
+    if not parsed:
+        return outcomes
     conn, cursor = get_db_connection()
     if not conn:
-        return False
+        return dict(outcomes, **{student_id: GRADE_ERROR for student_id in parsed})
     try:
-        sql = "UPDATE selections SET grade = %s WHERE student_id = %s AND course_id = %s"
-        cursor.execute(sql, (grade, student_id, course_id))
+        student_ids = sorted(parsed)
+        changed = []
+        for start in range(0, len(student_ids), batch_size):
+            batch = student_ids[start:start + batch_size]
+            cursor.execute(SQL_LOCK_COURSE_GRADES.format(_placeholders(len(batch))), (course_id, *batch))
+            current = {row['student_id']: row['grade'] for row in cursor.fetchall()}
+            for student_id in batch:
+                if student_id not in current:
+                    outcomes[student_id] = GRADE_NOT_ENROLLED
+                elif current[student_id] == parsed[student_id]:
+                    outcomes[student_id] = GRADE_UNCHANGED
+                else:
+                    changed.append(student_id)
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            params = []
+            for student_id in batch:
+                params += [student_id, parsed[student_id]]
+            cursor.execute(SQL_UPDATE_GRADES_CASE.format(cases="WHEN %s THEN %s " * len(batch),
+                                                         ids=_placeholders(len(batch))),
+                           (*params, course_id, *batch))
         conn.commit()
-        if cursor.rowcount > 0:
-            print(f"学生ID {student_id} 的课程ID {course_id} 成绩录入为 {grade} 成功！")
-            return True
+        outcomes.update((student_id, GRADE_OK) for student_id in changed)
+    except DB_ERRORS as err:
+        conn.rollback()
+        log(f"批量录入成绩失败，已全部回滚: {err}")
+        outcomes.update((student_id, GRADE_ERROR) for student_id in parsed)
+        return outcomes
+    finally:
+        cursor.close()
+        conn.close()
+    counts = {}
+    for outcome in outcomes.values():
+        counts[outcome] = counts.get(outcome, 0) + 1
+    log(f"课程ID {course_id} 成绩录入完成：" + "，".join(f"{name} {n} 条" for name, n in sorted(counts.items())))
+    return outcomes
+
+# --- 搜索 (界面下拉框在内存索引 search_index.py 尚未就绪时的数据库端兜底) ---
+SEARCH_LIMIT = 20
+# 全文索引 (迁移 008) 能处理的最短输入：MySQL ngram_token_size 默认为 2，SQLite FTS5 trigram 为 3；更短时用 LIKE
+FULLTEXT_MIN_LENGTH = {'mysql': 2, 'sqlite': 3}
+SEARCH_TARGETS = {
+    'students': {
+        'key': 'student_id',
+        'columns': "t.student_id, t.student_name, t.email",
+        'like': ('student_name', 'email'),
+        'mysql': "MATCH (t.student_name, t.email) AGAINST (%s IN BOOLEAN MODE)",
+        'sqlite': "t.student_id IN (SELECT rowid FROM students_fts WHERE students_fts MATCH %s)",
+    },
+    'courses': {
+        'key': 'course_id',
+        'columns': "t.course_id, t.course_name, t.teacher_name",
+        'like': ('course_name',),
+        'mysql': "MATCH (t.course_name) AGAINST (%s IN BOOLEAN MODE)",
+        'sqlite': "t.course_id IN (SELECT rowid FROM courses_fts WHERE courses_fts MATCH %s)",
+    },
+}
+SQL_SEARCH_BY_KEY = "SELECT {columns} FROM {table} t WHERE t.{key} = %s"
+SQL_SEARCH = "SELECT {columns} FROM {table} t WHERE {condition} LIMIT %s"
+
+def _search(table, query, limit, error_label):
+    """纯数字先按主键精确匹配，再按全文索引 (短输入用 LIKE) 做子串匹配，返回最多 limit 行"""
+    spec = SEARCH_TARGETS[table]
+    text = (query or '').strip()
+    if not text or limit <= 0:
+        return []
+    engine = get_engine().name
+    if len(text) >= FULLTEXT_MIN_LENGTH[engine]:
+        # 整体作为短语匹配；短语中的双引号 MySQL 直接去掉，FTS5 写成两个
+        phrase = text.replace('"', '""') if engine == 'sqlite' else text.replace('"', ' ')
+        condition, params = spec[engine], ['"' + phrase + '"']
+    else:
+        pattern = '%' + text.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+        condition = " OR ".join(f"t.{column} LIKE %s ESCAPE '!'" for column in spec['like'])
+        params = [pattern] * len(spec['like'])
+    conn, cursor = get_db_connection()
+    if not conn:
+        return []
+    try:
+        rows = []
+        if text.isdigit():
+            # 单独查询：与 MATCH 用 OR 连接时 MySQL 无法使用全文索引
+            cursor.execute(SQL_SEARCH_BY_KEY.format(columns=spec['columns'], table=table, key=spec['key']), (int(text),))
+            rows.extend(cursor.fetchall())
+        cursor.execute(SQL_SEARCH.format(columns=spec['columns'], table=table, condition=condition), (*params, limit))
+        found = {row[spec['key']] for row in rows}
+        rows.extend(row for row in cursor.fetchall() if row[spec['key']] not in found)
+        return rows[:limit]
+    except DB_ERRORS as err:
+        log(f"{error_label}失败: {err}")
+        return []
+    finally:
+        cursor.close()
+        conn.close()
+
+def search_students(query, limit=SEARCH_LIMIT):
+    """按学号、姓名或邮箱中的片段搜索学生，返回 [{'student_id', 'student_name', 'email'}]"""
+    return _search('students', query, limit, "搜索学生")
+
+def search_courses(query, limit=SEARCH_LIMIT):
+    """按课程号或课程名中的片段搜索课程，返回 [{'course_id', 'course_name', 'teacher_name'}]"""
+    return _search('courses', query, limit, "搜索课程")
+
+# --- 变更日志：界面按版本号增量刷新 (change_log 由触发器维护，见 migrations/*/009) ---
+CHANGE_LOG_LIMIT = 5000     # get_changes_since 一次最多返回的变更数
+CHANGE_LOG_KEEP = 100000    # prune_change_log 默认保留的最近变更数
+
+# 分成两个子查询：SQLite 只有单独的 MIN() / MAX() 才直接读索引的一端，写在一起会扫描全表
+SQL_CHANGE_BOUNDS = ("SELECT (SELECT MIN(change_id) FROM change_log) AS oldest, "
+                     "(SELECT MAX(change_id) FROM change_log) AS latest")
+SQL_TABLE_VERSION = "SELECT MAX(change_id) AS version FROM change_log WHERE table_name = %s"
+SQL_CHANGES_SINCE = """
+    SELECT change_id, table_name, row_id, ref_id, op
+    FROM change_log
+    WHERE change_id > %s{tables}
+    ORDER BY change_id
+    LIMIT %s
+"""
+SQL_PRUNE_CHANGE_LOG = "DELETE FROM change_log WHERE change_id <= %s"
+SQL_STUDENTS_BY_IDS = "SELECT * FROM students WHERE student_id IN ({ids}) ORDER BY student_id"
+SQL_COURSES_BY_IDS = "SELECT * FROM courses WHERE course_id IN ({ids}) ORDER BY course_id"
+# 行格式同 get_student_selected_courses
+SQL_STUDENT_SELECTIONS_FOR_COURSES = """
+    SELECT c.course_id, c.course_name, c.teacher_name, c.credits, s.selection_date, s.grade
+    FROM courses c
+    JOIN selections s ON c.course_id = s.course_id
+    WHERE s.student_id = %s AND s.course_id IN ({ids})
+"""
+
+def get_change_version(table_name=None):
+    """当前版本号：change_log 中最大的 change_id (指定 table_name 时为该表的版本)，没有变更时为 0，出错返回 None"""
+    conn, cursor = get_db_connection()
+    if not conn:
+        return None
+    try:
+        if table_name is None:
+            cursor.execute(SQL_CHANGE_BOUNDS)
+            version = cursor.fetchone()['latest']
         else:
-            print(f"未找到学生ID {student_id} 对课程ID {course_id} 的选课记录，或成绩未改变。")
-            return False
-    except mysql.connector.Error as err:
-        print(f"录入成绩失败: {err}")
-        return False
+            cursor.execute(SQL_TABLE_VERSION, (table_name,))
+            version = cursor.fetchone()['version']
+        return version or 0
+    except DB_ERRORS as err:
+        log(f"查询变更版本失败: {err}")
+        return None
     finally:
-        if conn:
-            cursor.close()
-            conn.close()
+        cursor.close()
+        conn.close()
+
+def get_changes_since(version, limit=CHANGE_LOG_LIMIT, tables=None):
+    """版本号 version 之后的变更，按 change_id 升序最多 limit 条，可用 tables 只取部分表
+
+    返回 {'oldest', 'latest', 'changes'}：oldest / latest 为日志中最小/最大的 change_id (日志为空时为 None)，
+    changes 为 [{'change_id', 'table_name', 'row_id', 'ref_id', 'op'}]。version < oldest - 1 说明中间的
+    变更已被 prune_change_log 清理，调用方应整体重新加载。没有新变更时只执行一次取最值的查询。出错返回 None。
+    """
+    conn, cursor = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cursor.execute(SQL_CHANGE_BOUNDS)
+        bounds = cursor.fetchone()
+        changes = []
+        if bounds['latest'] is not None and bounds['latest'] > version:
+            table_filter = f" AND table_name IN ({_placeholders(len(tables))})" if tables else ""
+            cursor.execute(SQL_CHANGES_SINCE.format(tables=table_filter), (version, *(tables or ()), limit))
+            changes = cursor.fetchall()
+            # 顺带让其他进程修改过的实体缓存失效 (选课变化会改变课程的 enrollment_count)
+            for change in changes:
+                if change['table_name'] == 'students':
+                    _student_cache.invalidate(change['row_id'])
+                elif change['table_name'] == 'courses':
+                    _course_cache.invalidate(change['row_id'])
+                elif change['table_name'] == 'selections':
+                    _course_cache.invalidate(change['ref_id'])
+        return {'oldest': bounds['oldest'], 'latest': bounds['latest'], 'changes': changes}
+    except DB_ERRORS as err:
+        log(f"查询变更日志失败: {err}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def prune_change_log(keep=CHANGE_LOG_KEEP):
+    """只保留最近 keep 条变更，返回删除的条数；落后更多的界面会整体重新加载。出错返回 None"""
+    conn, cursor = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cursor.execute(SQL_CHANGE_BOUNDS)
+        latest = cursor.fetchone()['latest']
+        if latest is None or latest <= keep:
+            return 0
+        cursor.execute(SQL_PRUNE_CHANGE_LOG, (latest - keep,))
+        conn.commit()
+        log(f"变更日志已清理 {cursor.rowcount} 条")
+        return cursor.rowcount
+    except DB_ERRORS as err:
+        log(f"清理变更日志失败: {err}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def _rows_by_ids(sql, ids, row_format, error_label, params=()):
+    """按 ID 分段执行 sql ({ids} 为 IN 列表)，返回全部行；任一段出错返回 None
+
+    与 iter_query 不同，出错时不能返回部分结果：调用方会把查不到的 ID 当作已删除。
+    """
+    conn, cursor = get_db_connection(row_format)
+    if not conn:
+        return None
+    try:
+        rows = []
+        for chunk in id_chunks(ids):
+            cursor.execute(sql.format(ids=_placeholders(len(chunk))), (*params, *chunk))
+            rows.extend(fetch_rows(cursor, row_format))
+        return rows
+    except DB_ERRORS as err:
+        log(f"{error_label}失败: {err}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+def get_students_by_ids(student_ids, row_format=ROW_DICT):
+    """按学号批量读取学生 (按学号排序)，不存在的学号没有对应行；出错返回 None"""
+    return _rows_by_ids(SQL_STUDENTS_BY_IDS, student_ids, row_format, "批量查询学生")
+
+def get_courses_by_ids(course_ids, row_format=ROW_DICT):
+    """按课程号批量读取课程 (按课程号排序)，不存在的课程号没有对应行；出错返回 None"""
+    return _rows_by_ids(SQL_COURSES_BY_IDS, course_ids, row_format, "批量查询课程")
+
+def get_student_selections_for_courses(student_id, course_ids):
+    """某学生在指定课程中的选课记录 (行格式同 get_student_selected_courses)；出错返回 None"""
+    return _rows_by_ids(SQL_STUDENT_SELECTIONS_FOR_COURSES, course_ids, ROW_DICT, "查询学生选课记录",
+                        params=(student_id,))
+
+# --- 学分/成绩汇总 (student_summary 由触发器增量维护，见 migrations/*/005) ---
+SQL_STUDENT_SUMMARY = "SELECT * FROM student_summary WHERE student_id = %s"
+# 从选课明细重新计算的汇总，用于一致性检查和重建
+SQL_COMPUTE_STUDENT_SUMMARY = """
+    SELECT st.student_id,
+           COUNT(s.selection_id) AS course_count,
+           COALESCE(SUM(COALESCE(c.credits, 0)), 0) AS total_credits,
+           COALESCE(SUM(CASE WHEN s.grade IS NULL THEN 0 ELSE COALESCE(c.credits, 0) END), 0) AS graded_credits,
+           COALESCE(SUM(COALESCE(s.grade, 0) * COALESCE(c.credits, 0)), 0) AS weighted_grade_sum
+    FROM students st
+    LEFT JOIN selections s ON s.student_id = st.student_id
+    LEFT JOIN courses c ON c.course_id = s.course_id
+    GROUP BY st.student_id
+    ORDER BY st.student_id
+"""
+SUMMARY_FIELDS = ('course_count', 'total_credits', 'graded_credits', 'weighted_grade_sum')
+
+def _with_average(summary):
+    """补充 average_grade = weighted_grade_sum / graded_credits (没有成绩时为 None)"""
+    graded = summary['graded_credits']
+    summary['average_grade'] = (Decimal(summary['weighted_grade_sum']) / graded).quantize(Decimal('0.01')) if graded else None
+    return summary
+
+def get_student_summary_steps(student_id):
+    try:
+        summary = yield (STEP_FETCH_ONE, SQL_STUDENT_SUMMARY, (student_id,))
+    except DB_ERRORS as err:
+        log(f"查询学生汇总失败: {err}")
+        return None
+    return _with_average(summary) if summary else None
+
+def get_student_summary(student_id):
+    """按主键读取学生的选课数、总学分、已评分学分、加权成绩和与平均分"""
+    return run_steps(get_student_summary_steps(student_id), None)
+
+def _summary_value(value):
+    """按两位小数比较汇总值：SQLite 的 SUM 对 REAL 求和，会带有二进制浮点误差"""
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+def check_student_summary(repair=False, chunk_size=5000):
+    """从明细重新计算所有学生的汇总并与 student_summary 比较
+
+    返回 [(student_id, 字段, 汇总表中的值, 重新计算的值)]；repair=True 时用重新计算的结果
+    覆盖有偏差的行 (包括缺失的行)。
+    """
+    conn, cursor = get_db_connection()
+    if not conn:
+        return None
+    drift = []
+    try:
+        stored = {}
+        cursor.execute("SELECT * FROM student_summary")
+        for row in cursor.fetchall():
+            stored[row['student_id']] = row
+        cursor.execute(SQL_COMPUTE_STUDENT_SUMMARY)
+        fixes = []
+        for expected in cursor.fetchall():
+            actual = stored.pop(expected['student_id'], None)
+            row_drift = [(expected['student_id'], field, actual[field] if actual else None, expected[field])
+                         for field in SUMMARY_FIELDS
+                         if actual is None or _summary_value(actual[field]) != _summary_value(expected[field])]
+            if row_drift:
+                drift.extend(row_drift)
+                fixes.append(expected)
+        # 汇总表中多出来的学生 (外键级联本应删除)
+        for student_id in stored:
+            drift.append((student_id, 'student_id', student_id, None))
+        if repair and (fixes or stored):
+            if stored:
+                cursor.execute(f"DELETE FROM student_summary WHERE student_id IN ({_placeholders(len(stored))})",
+                               tuple(stored))
+            rows = [(r['student_id'],) + tuple(r[field] for field in SUMMARY_FIELDS) for r in fixes]
+            for start in range(0, len(rows), chunk_size):
+                batch = rows[start:start + chunk_size]
+                cursor.execute(f"DELETE FROM student_summary WHERE student_id IN ({_placeholders(len(batch))})",
+                               tuple(r[0] for r in batch))
+                cursor.executemany(
+                    "INSERT INTO student_summary (student_id, course_count, total_credits, graded_credits, "
+                    "weighted_grade_sum) VALUES (%s, %s, %s, %s, %s)", batch)
+            conn.commit()
+            log(f"已修复 {len(fixes) + len(stored)} 名学生的汇总。")
+        return drift
+    except DB_ERRORS as err:
+        conn.rollback()
+        log(f"检查学生汇总失败: {err}")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
 
 def print_courses(courses):
     if not courses:
@@ -344,33 +1385,92 @@ def print_courses(courses):
 
 # (添加到之前的 Python 代码中)
 
-def get_grade_audit_logs(limit=20):
-    """查询最近的成绩变更日志"""
-    conn, cursor = get_db_connection()
-    if not conn:
-        return []
+# 查询时可以 JOIN students 和 courses 表来获取更详细的姓名和课程名
+SQL_GRADE_AUDIT_PAGE = """
+    SELECT gal.log_id, gal.selection_id, gal.student_id, gal.course_id,
+           s.student_name, c.course_name,
+           gal.old_grade, gal.new_grade, gal.changed_by, gal.change_timestamp
+    FROM {table} gal
+    LEFT JOIN students s ON gal.student_id = s.student_id
+    LEFT JOIN courses c ON gal.course_id = c.course_id
+    {where}
+    ORDER BY gal.change_timestamp DESC, gal.log_id DESC
+    LIMIT %s
+"""
+SQL_GRADE_AUDIT_LOGS = SQL_GRADE_AUDIT_PAGE.format(table='grade_audit_log', where='')
+
+# 热表和归档表 (迁移 007，由 audit_archive.py 按月归档)；两表结构和索引相同
+AUDIT_TABLE = 'grade_audit_log'
+AUDIT_ARCHIVE_TABLE = 'grade_audit_log_archive'
+
+# 审计日志筛选条件；每个等值条件都有 (列, change_timestamp, log_id) 复合索引 (迁移 006)，
+# 按索引顺序反向扫描即可取到一页，不需要排序
+AUDIT_FILTERS = {
+    'student_id': "gal.student_id = %s",
+    'course_id': "gal.course_id = %s",
+    'changed_by': "gal.changed_by = %s",
+    'since': "gal.change_timestamp >= %s",  # 含
+    'until': "gal.change_timestamp < %s",   # 不含
+}
+# 键集分页：严格排在游标 (change_timestamp, log_id) 之后 (更早) 的记录。
+# 写成 "ts <= ? AND (ts < ? OR id < ?)" 而不是行构造器比较，MySQL 和 SQLite 都能据此确定索引扫描范围
+SQL_AUDIT_AFTER_CURSOR = "gal.change_timestamp <= %s AND (gal.change_timestamp < %s OR gal.log_id < %s)"
+
+def audit_cursor(log):
+    """一条审计日志对应的分页游标，作为下一页的 after 参数"""
+    return (log['change_timestamp'], log['log_id'])
+
+def build_grade_audit_query(after=None, limit=100, table=AUDIT_TABLE, **filters):
+    """拼出 table 上的审计日志分页查询，返回 (sql, params)；值为 None 的筛选条件忽略"""
+    conditions, params = [], []
+    for name, value in filters.items():
+        if name not in AUDIT_FILTERS:
+            raise ValueError(f"未知的审计日志筛选条件: {name}")
+        if value is not None and value != '':
+            conditions.append(AUDIT_FILTERS[name])
+            params.append(value)
+    if after is not None:
+        timestamp, log_id = after
+        conditions.append(SQL_AUDIT_AFTER_CURSOR)
+        params.extend((timestamp, timestamp, log_id))
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return SQL_GRADE_AUDIT_PAGE.format(table=table, where=where), tuple(params) + (limit,)
+
+def merge_audit_pages(hot, archived, limit):
+    """合并热表和归档表各自按 (change_timestamp, log_id) 倒序的一页，取前 limit 条"""
+    if not archived:
+        return hot[:limit]
+    return sorted(hot + archived, key=audit_cursor, reverse=True)[:limit]
+
+def get_grade_audit_page_steps(after=None, limit=100, student_id=None, course_id=None, changed_by=None,
+                               since=None, until=None, include_archive=True, row_format=ROW_DICT):
+    if row_format not in (ROW_DICT, ROW_TUPLE):
+        raise ValueError(f"审计日志分页不支持行格式: {row_format}")
+    filters = dict(student_id=student_id, course_id=course_id, changed_by=changed_by, since=since, until=until)
+    tables = (AUDIT_TABLE, AUDIT_ARCHIVE_TABLE) if include_archive else (AUDIT_TABLE,)
     try:
-        # 查询时可以 JOIN students 和 courses 表来获取更详细的姓名和课程名
-        sql = """
-            SELECT gal.log_id, gal.selection_id,
-                   s.student_name, c.course_name,
-                   gal.old_grade, gal.new_grade, gal.change_timestamp
-            FROM grade_audit_log gal
-            LEFT JOIN students s ON gal.student_id = s.student_id
-            LEFT JOIN courses c ON gal.course_id = c.course_id
-            ORDER BY gal.change_timestamp DESC
-            LIMIT %s
-        """
-        cursor.execute(sql, (limit,))
-        logs = cursor.fetchall()
-        return logs
-    except mysql.connector.Error as err:
-        print(f"查询成绩审计日志失败: {err}")
+        pages = yield (STEP_FETCH_EACH, [build_grade_audit_query(after, limit, table=table, **filters)
+                                         for table in tables], None)
+    except DB_ERRORS as err:
+        log(f"查询成绩审计日志失败: {err}")
         return []
-    finally:
-        if conn:
-            cursor.close()
-            conn.close()
+    return merge_audit_pages(pages[0], pages[1] if len(pages) > 1 else [], limit)
+
+def get_grade_audit_page(after=None, limit=100, student_id=None, course_id=None, changed_by=None,
+                         since=None, until=None, include_archive=True, row_format=ROW_DICT):
+    """键集分页查询成绩变更日志 (按变更时间从新到旧)
+
+    after 为上一页最后一条的 audit_cursor(log)，None 表示第一页；可按学生、课程、操作者和
+    时间范围 [since, until) 筛选。每页只扫描索引上的 limit 条，代价与翻到第几页无关。
+    include_archive 为 True 时同时查询归档表，两边各取一页后合并，调用方不必关心日志是否已归档。
+    row_format 可为 ROW_DICT 或 ROW_TUPLE (两页合并需要按行排序，不支持 ROW_COLUMNS)。
+    """
+    return run_steps(get_grade_audit_page_steps(after, limit, student_id, course_id, changed_by, since, until,
+                                                include_archive, row_format), [], row_format)
+
+def get_grade_audit_logs(limit=20, row_format=ROW_DICT):
+    """查询最近的成绩变更日志"""
+    return get_grade_audit_page(limit=limit, row_format=row_format)
 
 def print_grade_audit_logs(logs):
     if not logs:
@@ -393,4 +1493,8 @@ def print_grade_audit_logs(logs):
 # elif choice == '4': # 假设 '4' 是查看审计日志
 #     logs = get_grade_audit_logs()
 #     print_grade_audit_logs(logs)
-# ...
\ No newline at end of file
+# ...
+
+# 设置环境变量 SCS_METRICS=1 时，导入后即对本模块的公开函数启用耗时统计和慢查询记录 (见 metrics.py)
+if os.environ.get('SCS_METRICS') == '1':
+    metrics.enable(sys.modules[__name__], slow_threshold=float(os.environ.get('SCS_SLOW_QUERY_MS', '200')) / 1000)
@@ -0,0 +1,705 @@
+"""性能基准测试脚本
+
+用法示例:
+    python data_generator.py --scale 100k               # 先生成基准数据集
+    python benchmark.py suite --count 2000 --output run.json
+    python benchmark.py suite --baseline run.json       # 与之前某次提交的结果对比
+    python benchmark.py enroll --count 2000
+    python benchmark.py concurrent-enroll --count 2000 --concurrency 1,10,100,1000
+    python benchmark.py capacity-stress --clients 500 --capacity 100   # 发现超卖时以状态 1 退出
+    python benchmark.py roster-grades --roster-size 300 # 逐条录入与一次事务录入全班成绩的对比
+    python benchmark.py csv-io --count 1000000 --batch-size 5000   # data_io 导入/导出 100 万行 CSV 的行/秒
+    python benchmark.py analytics                       # 成绩统计：一次列式读取 + 向量化分组 (建议 --scale 1m)
+    python benchmark.py row-memory --memory-rows 500000 # dict / 元组行 / 列式三种行格式读取 50 万行的内存占用
+    python benchmark.py batch-rosters --count 200       # 一个院系各课程名单及其学生课表：逐个 ID 查询与批量接口对比
+    python benchmark.py search --search-rows 500000     # 下拉框搜索：内存索引 (50 万合成学生) 与数据库全文检索的延迟
+    python benchmark.py change-feed --count 1000        # 界面同步一批写入：整表重新加载与按变更日志增量读取对比
+    python benchmark.py suite --engine sqlite --sqlite-path /tmp/bench.db   # 进程内 SQLite，无网络往返
+结果以 JSON 打印到标准输出，便于在不同提交之间比较。
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import gc
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import analytics
+import async_backend
+import backend
+import data_io
+import data_generator
+from change_feed import group_changes
+from compact_rows import ROW_DICT, ROW_FORMATS, fetch_rows
+import metrics
+from search_index import SearchIndex
+
+
+# --- 统计工具 ---
+def percentile(sorted_values, pct):
+    """对已排序的列表取百分位数 (最近秩法)"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+def summarize(latencies, elapsed, errors=0):
+    """把单次调用耗时(秒)汇总成吞吐量和 p50/p95/p99 (毫秒)"""
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_per_s': round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+async def run_concurrent(func, args_list, concurrency):
+    """用 concurrency 个协程并发执行 await func(*args)，返回汇总结果"""
+    pending = iter(args_list)  # 协程在同一线程内切换，共享迭代器是安全的
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for args in pending:
+            t0 = time.perf_counter()
+            ok = await func(*args)
+            latencies.append(time.perf_counter() - t0)
+            if ok is False or ok is None:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(args_list))))))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+def run_timed(func, args_list):
+    """依次执行 func(*args)，返回汇总结果；返回 False/None 计为错误"""
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        ok = func(*args)
+        latencies.append(time.perf_counter() - t0)
+        if ok is False or ok is None:
+            errors += 1
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+def timed(func, *args):
+    """执行一次 func(*args)，返回 (结果, 耗时秒数)"""
+    start = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - start
+
+
+# --- 测试数据 ---
+@contextlib.contextmanager
+def bench_fixture(n_students, n_courses, tag='bench'):
+    """创建临时学生和课程，结束后删除 (级联删除相关选课记录)"""
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    prefix = f"__{tag}_{stamp}"
+    try:
+        cursor.executemany(
+            "INSERT INTO students (student_name, student_gender, enrollment_year, email) VALUES (%s, %s, %s, %s)",
+            [(f"{prefix}_s{i}", '其他', 2024, f"{prefix}_s{i}@bench.invalid") for i in range(n_students)])
+        cursor.executemany(
+            "INSERT INTO courses (course_name, teacher_name, credits, department) VALUES (%s, %s, %s, %s)",
+            [(f"{prefix}_c{i}", 'bench', 3, 'bench') for i in range(n_courses)])
+        conn.commit()
+        cursor.execute("SELECT student_id FROM students WHERE student_name LIKE %s ORDER BY student_id", (prefix + '_s%',))
+        student_ids = [r['student_id'] for r in cursor.fetchall()]
+        cursor.execute("SELECT course_id FROM courses WHERE course_name LIKE %s ORDER BY course_id", (prefix + '_c%',))
+        course_ids = [r['course_id'] for r in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+    try:
+        yield student_ids, course_ids
+    finally:
+        conn, cursor = backend.get_db_connection()
+        try:
+            cursor.execute("DELETE FROM courses WHERE course_name LIKE %s", (prefix + '_c%',))
+            cursor.execute("DELETE FROM students WHERE student_name LIKE %s", (prefix + '_s%',))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+def enrollment_pairs(student_ids, course_ids, count):
+    """生成 count 个互不重复的 (student_id, course_id)"""
+    pairs = []
+    for course_id in course_ids:
+        for student_id in student_ids:
+            pairs.append((student_id, course_id))
+            if len(pairs) >= count:
+                return pairs
+    return pairs
+
+
+# --- 场景: 选课 ---
+def legacy_select_course(student_id, course_id):
+    """旧版选课路径：两次嵌套查询各自借连接，再在第三个连接上 INSERT"""
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        return False
+    try:
+        if not backend.get_student_by_id(student_id) or not backend.get_course_by_id(course_id):
+            return False
+        cursor.execute("INSERT INTO selections (student_id, course_id, selection_date) VALUES (%s, %s, %s)",
+                       (student_id, course_id, datetime.now()))
+        conn.commit()
+        return True
+    except Exception:
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+def bench_enroll(args):
+    """比较旧版(嵌套连接)与单连接单事务选课的 enrollments/sec"""
+    n_courses = 2
+    n_students = (args.count + n_courses - 1) // n_courses
+    results = {}
+    for label, func in (('legacy_nested', legacy_select_course), ('single_transaction', backend.select_course)):
+        with bench_fixture(n_students, n_courses) as (student_ids, course_ids):
+            pairs = enrollment_pairs(student_ids, course_ids, args.count)
+            results[label] = run_timed(func, pairs)
+    base = results['legacy_nested']['throughput_per_s']
+    if base:
+        results['speedup'] = round(results['single_transaction']['throughput_per_s'] / base, 2)
+    return results
+
+def bench_bulk_enroll(args):
+    """比较逐条 select_course 与 bulk_select_courses 的导入速度"""
+    n_courses = 4
+    n_students = (args.count + n_courses - 1) // n_courses
+    results = {}
+    with bench_fixture(n_students, n_courses) as (student_ids, course_ids):
+        pairs = enrollment_pairs(student_ids, course_ids, args.count)
+        results['per_row'] = run_timed(backend.select_course, pairs)
+    with bench_fixture(n_students, n_courses) as (student_ids, course_ids):
+        pairs = enrollment_pairs(student_ids, course_ids, args.count)
+        start = time.perf_counter()
+        outcomes = backend.bulk_select_courses(pairs, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        ok = sum(1 for _, _, status in outcomes if status == backend.ENROLL_OK)
+        results['bulk'] = {
+            'count': len(pairs),
+            'ok': ok,
+            'batch_size': args.batch_size,
+            'elapsed_s': round(elapsed, 4),
+            'throughput_per_s': round(len(pairs) / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+    return results
+
+async def _concurrent_enroll(levels, count):
+    results = {'driver': 'aiomysql' if async_backend.uses_aiomysql() else 'thread_pool'}
+    n_courses = 4
+    try:
+        for level in levels:
+            total = max(count, level)
+            with bench_fixture((total + n_courses - 1) // n_courses, n_courses, tag='async') as (student_ids, course_ids):
+                pairs = enrollment_pairs(student_ids, course_ids, total)
+                summary = await run_concurrent(async_backend.select_course, pairs, level)
+                results[f'concurrency_{level}'] = dict(summary, concurrency=level)
+    finally:
+        await async_backend.close_async_pool()
+    return results
+
+def bench_concurrent_enroll(args):
+    """不同并发数下 async_backend.select_course 的 enrollments/sec 和延迟分布"""
+    levels = [int(level) for level in args.concurrency.split(',')]
+    return asyncio.run(_concurrent_enroll(levels, args.count))
+
+# --- 场景: 容量压力测试 ---
+def row_lock_stats():
+    """MySQL 的累计行锁等待次数和等待毫秒数；SQLite 没有对应的统计，返回 None"""
+    if backend.get_engine().name != 'mysql':
+        return None
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        return None
+    try:
+        cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN ('Innodb_row_lock_waits', 'Innodb_row_lock_time')")
+        return {row['Variable_name']: int(row['Value']) for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+def course_enrollment(course_id):
+    """(实际选课记录数, courses.enrollment_count)"""
+    conn, cursor = backend.get_db_connection()
+    try:
+        cursor.execute("SELECT COUNT(*) AS n FROM selections WHERE course_id = %s", (course_id,))
+        rows = cursor.fetchone()['n']
+        cursor.execute("SELECT enrollment_count FROM courses WHERE course_id = %s", (course_id,))
+        return rows, cursor.fetchone()['enrollment_count']
+    finally:
+        cursor.close()
+        conn.close()
+
+async def _capacity_stress(clients, capacity):
+    results = {'driver': 'aiomysql' if async_backend.uses_aiomysql() else 'thread_pool',
+               'clients': clients, 'capacity': capacity}
+    try:
+        with bench_fixture(clients, 1, tag='stress') as (student_ids, course_ids):
+            course_id = course_ids[0]
+            backend.set_course_capacity(course_id, capacity)
+            locks_before = row_lock_stats()
+            summary = await run_concurrent(async_backend.select_course,
+                                           [(student_id, course_id) for student_id in student_ids], clients)
+            locks_after = row_lock_stats()
+            rows, counter = course_enrollment(course_id)
+    finally:
+        await async_backend.close_async_pool()
+    results['select_course'] = summary
+    results.update({
+        'accepted': summary['count'] - summary['errors'],
+        'rejected': summary['errors'],
+        'selection_rows': rows,
+        'enrollment_count': counter,
+        'oversold': max(0, rows - capacity),
+        'counter_consistent': rows == counter,
+    })
+    if locks_before is not None:
+        results['row_lock_waits'] = locks_after['Innodb_row_lock_waits'] - locks_before['Innodb_row_lock_waits']
+        results['row_lock_time_ms'] = locks_after['Innodb_row_lock_time'] - locks_before['Innodb_row_lock_time']
+    return results
+
+def bench_capacity_stress(args):
+    """--clients 个并发客户端同时抢一门容量为 --capacity 的课程，检查是否超卖"""
+    return asyncio.run(_capacity_stress(args.clients, args.capacity))
+
+# --- 场景: 按课程批量录入成绩 ---
+def bench_roster_grades(args):
+    """一门 --roster-size 人的课程：逐条 record_grade 与一次 record_grades 录入全班成绩的对比"""
+    rng = random.Random(args.seed)
+    results = {'roster_size': args.roster_size}
+    with bench_fixture(args.roster_size, 1, tag='roster') as (student_ids, course_ids):
+        course_id = course_ids[0]
+        backend.bulk_select_courses([(student_id, course_id) for student_id in student_ids])
+        first = {student_id: round(rng.uniform(50, 100), 2) for student_id in student_ids}
+        results['per_row_record_grade'] = run_timed(
+            backend.record_grade, [(student_id, course_id, grade) for student_id, grade in first.items()])
+        # 第二轮换一批成绩，保证每一行都真的被更新 (触发器照常写审计日志)
+        second = {student_id: round(grade - 10 if grade > 60 else grade + 10, 2) for student_id, grade in first.items()}
+        outcomes, elapsed = timed(backend.record_grades, course_id, second)
+        results['record_grades'] = {
+            'count': len(second),
+            'ok': sum(1 for outcome in outcomes.values() if outcome == backend.GRADE_OK),
+            'elapsed_s': round(elapsed, 4),
+            'throughput_per_s': round(len(second) / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+    per_row = results['per_row_record_grade']['elapsed_s']
+    if elapsed > 0:
+        results['speedup'] = round(per_row / elapsed, 2)
+    return results
+
+# --- 场景: CSV 导入导出 ---
+def bench_csv_io(args):
+    """生成 --count 行学生 CSV (约千分之一为无效行)，测量 data_io 导入和导出的行/秒，结束后删除导入的数据"""
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    directory = tempfile.mkdtemp(prefix='scs_csv_')
+    source = os.path.join(directory, 'students.csv')
+    with open(source, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(('student_name', 'student_gender', 'enrollment_year', 'email'))
+        for i in range(args.count):
+            gender = '未知' if i % 1000 == 999 else ('男', '女', '其他')[i % 3]
+            writer.writerow((f"__csv_{stamp}_{i}", gender, 2020 + i % 6, f"csv{stamp}_{i}@bench.invalid"))
+    try:
+        results = {'import': data_io.import_file('students', source, args.batch_size,
+                                                 os.path.join(directory, 'rejects.csv'))}
+        results['export'] = data_io.export_query(
+            "SELECT student_id, student_name, student_gender, enrollment_year, email FROM students "
+            "WHERE student_name LIKE %s ORDER BY student_id", (f"__csv_{stamp}_%",),
+            data_io.EXPORT_QUERIES['students'], os.path.join(directory, 'export.csv'), args.batch_size)
+    finally:
+        conn, cursor = backend.get_db_connection()
+        try:
+            cursor.execute("DELETE FROM students WHERE student_name LIKE %s", (f"__csv_{stamp}_%",))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+# --- 场景: 成绩统计分析 ---
+def bench_analytics(args):
+    """一次列式读取全部成绩后做各类分组统计，与数据库端逐课程 GROUP BY 对比"""
+    data, load_s = timed(analytics.load_grades)
+    if data is None:
+        raise SystemExit("读取成绩数据失败，请检查数据库连接")
+    results = {
+        'graded_selections': len(data),
+        'load_grades': {'elapsed_s': round(load_s, 4),
+                        'rows_per_s': round(len(data) / load_s, 2) if load_s > 0 else 0.0},
+    }
+    for name, func in (('course_stats', analytics.course_stats), ('department_stats', analytics.department_stats),
+                       ('enrollment_year_stats', analytics.enrollment_year_stats)):
+        rows, elapsed = timed(func, data)
+        results[name] = {'groups': len(rows), 'elapsed_s': round(elapsed, 4)}
+
+    # 对比：数据库端只能直接算出人数/均值/最值，中位数和分数段还需要再逐课程取明细
+    def sql_course_means():
+        conn, cursor = backend.get_db_connection()
+        try:
+            cursor.execute("SELECT course_id, COUNT(*) AS n, AVG(grade) AS mean, MIN(grade) AS lo, MAX(grade) AS hi "
+                           "FROM selections WHERE grade IS NOT NULL GROUP BY course_id")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+    rows, elapsed = timed(sql_course_means)
+    results['sql_group_by_mean_only'] = {'groups': len(rows), 'elapsed_s': round(elapsed, 4)}
+    return results
+
+# --- 场景: 行格式内存占用 ---
+SQL_ROW_MEMORY = """
+    SELECT s.selection_id, s.student_id, st.student_name, st.email, s.course_id, s.selection_date, s.grade
+    FROM selections s
+    JOIN students st ON st.student_id = s.student_id
+    ORDER BY s.selection_id
+    LIMIT %s
+"""
+
+def bench_row_memory(args):
+    """同一结果集分别以 dict / 元组行 / 列式读取：耗时，以及 tracemalloc 统计的结果占用和峰值内存"""
+    def load(row_format):
+        conn, cursor = backend.get_db_connection(row_format)
+        if not conn:
+            raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+        try:
+            cursor.execute(SQL_ROW_MEMORY, (args.memory_rows,))
+            return fetch_rows(cursor, row_format)
+        finally:
+            cursor.close()
+            conn.close()
+
+    results = {'requested_rows': args.memory_rows}
+    for row_format in ROW_FORMATS:
+        gc.collect()
+        rows, elapsed = timed(load, row_format)
+        count = len(rows)
+        del rows
+        gc.collect()
+        # 单独再读一次测内存：tracemalloc 会让分配变慢，不能与计时混在一起
+        tracemalloc.start()
+        rows = load(row_format)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del rows
+        results[row_format] = {
+            'rows': count,
+            'elapsed_s': round(elapsed, 4),
+            'rows_per_s': round(count / elapsed, 2) if elapsed > 0 else 0.0,
+            'retained_mb': round(retained / 2**20, 2),
+            'peak_mb': round(peak / 2**20, 2),
+            'bytes_per_row': round(retained / count, 1) if count else 0.0,
+        }
+    baseline = results[ROW_DICT]['retained_mb']
+    for row_format in ROW_FORMATS:
+        results[row_format]['retained_vs_dict'] = round(results[row_format]['retained_mb'] / baseline, 3) if baseline else None
+    return results
+
+# --- 场景: 批量名单 ---
+def bench_batch_rosters(args):
+    """选课最多的院系中最多 --count 门课程的名单，及名单中最多 --count 个学生的课表：逐个 ID 查询 (N+1) 与批量接口对比"""
+    courses = backend.get_all_courses()
+    if not courses:
+        raise SystemExit("courses 表为空，请先运行 data_generator.py 生成数据")
+    by_department = {}
+    for course in courses:
+        by_department.setdefault(course['department'], []).append(course['course_id'])
+    department, course_ids = max(by_department.items(), key=lambda item: len(item[1]))
+    course_ids = sorted(course_ids)[:args.count]
+
+    per_course, per_course_s = timed(lambda: {cid: backend.get_course_enrolled_students(cid) for cid in course_ids})
+    batch_course, batch_course_s = timed(backend.get_enrolled_students_by_course, course_ids)
+    if batch_course is None:
+        raise SystemExit("批量读取选课名单失败，请检查数据库连接")
+    student_ids = sorted({row['student_id'] for rows in batch_course.values() for row in rows})[:args.count]
+    per_student, per_student_s = timed(lambda: {sid: backend.get_student_selected_courses(sid) for sid in student_ids})
+    batch_student, batch_student_s = timed(backend.get_selected_courses_by_student, student_ids)
+    if batch_student is None:
+        raise SystemExit("批量读取学生课表失败，请检查数据库连接")
+
+    def entry(elapsed, result, queries):
+        return {'elapsed_s': round(elapsed, 4), 'queries': queries, 'rows': sum(len(rows) for rows in result.values())}
+    chunks = len(backend.id_chunks(course_ids)), len(backend.id_chunks(student_ids))
+    return {
+        'department': department,
+        'courses': len(course_ids),
+        'students': len(student_ids),
+        'course_rosters': {'per_id': entry(per_course_s, per_course, len(course_ids)),
+                           'batch': entry(batch_course_s, batch_course, chunks[0]),
+                           'speedup': round(per_course_s / batch_course_s, 2) if batch_course_s > 0 else None},
+        'student_schedules': {'per_id': entry(per_student_s, per_student, len(student_ids)),
+                              'batch': entry(batch_student_s, batch_student, chunks[1]),
+                              'speedup': round(per_student_s / batch_student_s, 2) if batch_student_s > 0 else None},
+        'consistent': (sum(map(len, per_course.values())) == sum(map(len, batch_course.values()))
+                       and sum(map(len, per_student.values())) == sum(map(len, batch_student.values()))),
+    }
+
+# --- 场景: 下拉框搜索 ---
+SEARCH_LIMIT = 50  # 与 gui_app 的 TYPE_AHEAD_LIMIT 一致
+
+def bench_search(args):
+    """--search-rows 个合成学生上构建 SearchIndex 的耗时/内存及各类输入的搜索延迟，再对比数据库搜索 (backend.search_students)"""
+    rng = random.Random(args.seed)
+    rows = [{'student_id': i,
+             'student_name': rng.choice(data_generator.SURNAMES)
+                             + ''.join(rng.choice(data_generator.GIVEN_CHARS) for _ in range(rng.randint(1, 2))),
+             'email': f"bench_{i}@{data_generator.EMAIL_DOMAIN}"}
+            for i in range(1, args.search_rows + 1)]
+    def build():
+        index = SearchIndex('student_id', ('student_name', 'email'), gram_fields=('student_name',),
+                            label=lambda row: f"{row['student_id']} - {row['student_name']}")
+        index.sync(rows)
+        return index
+
+    gc.collect()
+    # 与 row-memory 相同，内存单独再构建一次测量，tracemalloc 不影响计时
+    tracemalloc.start()
+    index = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del index
+    gc.collect()
+    index, build_s = timed(build)
+
+    # 典型输入：学号、姓、姓名前两字、名中间的字、邮箱前缀，以及不存在的名字
+    names = [rows[rng.randrange(len(rows))]['student_name'] for _ in range(args.count)]
+    queries = {
+        'student_id': [(str(rng.randint(1, args.search_rows)),) for _ in range(args.count)],
+        'surname': [(name[0],) for name in names],
+        'name_prefix': [(name[:2],) for name in names],
+        'name_substring': [(name[1:],) for name in names],
+        'email_prefix': [(f"bench_{rng.randint(1, args.search_rows)}",) for _ in range(args.count)],
+        'no_match': [("不存在的名字",)] * args.count,
+    }
+    results = {
+        'rows': len(rows),
+        'build_s': round(build_s, 3),
+        'index_mb': round(retained / 2**20, 2),
+        'index': {kind: run_timed(lambda q: index.search(q, SEARCH_LIMIT), args_list)
+                  for kind, args_list in queries.items()},
+    }
+    # 快照未加载时的退路：在真实 students 表上检索 (迁移 008 的 FULLTEXT / FTS5，短输入为 LIKE)
+    db_names = [row['student_name'] for row in backend.get_all_students(row_format=backend.ROW_TUPLE)[:args.count]]
+    if db_names:
+        results['database'] = {
+            'name_prefix': run_timed(lambda q: backend.search_students(q, SEARCH_LIMIT) is not None,
+                                     [(name[:2],) for name in db_names]),
+            'full_name': run_timed(lambda q: backend.search_students(q, SEARCH_LIMIT) is not None,
+                                   [(name,) for name in db_names]),
+        }
+    return results
+
+# --- 场景: 变更日志增量刷新 ---
+def bench_change_feed(args):
+    """一批写入 (临时学生、课程及其选课) 后界面同步的代价：整表重新加载学生/课程与按变更日志只读取受影响的行对比，
+    以及没有新变更时一次轮询 (--count 次) 的延迟"""
+    version = backend.get_change_version()
+    if version is None:
+        raise SystemExit("变更日志不可用，请先执行 migrate.py (迁移 009)")
+
+    def incremental(since):
+        feed = backend.get_changes_since(since)
+        grouped = group_changes(feed['changes'])
+        students = backend.get_students_by_ids(grouped['students'], row_format=backend.ROW_TUPLE) if grouped['students'] else []
+        courses = backend.get_courses_by_ids(grouped['courses'], row_format=backend.ROW_TUPLE) if grouped['courses'] else []
+        return len(feed['changes']), len(students) + len(courses)
+
+    def full_reload():
+        return (len(list(backend.iter_all_students(row_format=backend.ROW_TUPLE)))
+                + len(list(backend.iter_all_courses(row_format=backend.ROW_TUPLE))))
+
+    with bench_fixture(50, 2, tag='feed') as (student_ids, course_ids):
+        for student_id, course_id in enrollment_pairs(student_ids, course_ids, 100):
+            backend.select_course(student_id, course_id)
+        (changes, patched_rows), incremental_s = timed(incremental, version)
+        reloaded_rows, full_s = timed(full_reload)
+        latest = backend.get_change_version()
+        empty_poll = run_timed(lambda: backend.get_changes_since(latest), [()] * args.count)
+    return {
+        'changes': changes,
+        'incremental': {'rows': patched_rows, 'elapsed_ms': round(incremental_s * 1000, 3)},
+        'full_reload': {'rows': reloaded_rows, 'elapsed_ms': round(full_s * 1000, 3)},
+        'speedup': round(full_s / incremental_s, 1) if incremental_s > 0 else None,
+        'empty_poll': empty_poll,
+    }
+
+# --- 场景: 综合基准 ---
+def sample_ids(column, table, count, rng):
+    """在已有主键范围内随机取 count 个真实存在的 ID"""
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+    try:
+        cursor.execute(f"SELECT MIN({column}) AS lo, MAX({column}) AS hi FROM {table}")
+        bounds = cursor.fetchone()
+        if bounds['lo'] is None:
+            raise SystemExit(f"表 {table} 为空，请先运行 data_generator.py 生成数据")
+        ids = []
+        while len(ids) < count:
+            probe = rng.randint(bounds['lo'], bounds['hi'])
+            cursor.execute(f"SELECT {column} FROM {table} WHERE {column} >= %s ORDER BY {column} LIMIT 1", (probe,))
+            ids.append(cursor.fetchone()[column])
+        return ids
+    finally:
+        cursor.close()
+        conn.close()
+
+def bench_suite(args):
+    """在当前数据集上依次测量各类 backend 操作的延迟分布和吞吐量"""
+    rng = random.Random(args.seed)
+    count = args.count
+    student_ids = sample_ids('student_id', 'students', count, rng)
+    course_ids = sample_ids('course_id', 'courses', min(count, 200), rng)
+    results = {}
+
+    backend.set_cache_enabled(False)
+    results['get_student_by_id'] = run_timed(backend.get_student_by_id, [(i,) for i in student_ids])
+    results['get_course_by_id'] = run_timed(backend.get_course_by_id, [(i,) for i in course_ids])
+    backend.set_cache_enabled(True)
+    results['get_student_by_id_cached'] = run_timed(backend.get_student_by_id, [(i,) for i in student_ids])
+
+    # 选课/成绩/退课在临时课程上进行，结束后连同选课记录一起删除，不影响数据集
+    with bench_fixture(0, 2, tag='suite') as (_, bench_courses):
+        pairs = [(student_id, bench_courses[i % 2]) for i, student_id in enumerate(dict.fromkeys(student_ids))]
+        results['select_course'] = run_timed(backend.select_course, pairs)
+        results['record_grade'] = run_timed(
+            backend.record_grade, [(s, c, round(rng.uniform(50, 100), 2)) for s, c in pairs])
+        results['drop_course'] = run_timed(backend.drop_course, pairs)
+
+    results['get_course_enrolled_students'] = run_timed(
+        lambda cid: backend.get_course_enrolled_students(cid) is not None, [(i,) for i in course_ids])
+    results['get_student_selected_courses'] = run_timed(
+        lambda sid: backend.get_student_selected_courses(sid) is not None, [(i,) for i in student_ids[:200]])
+    results['get_grade_audit_logs'] = run_timed(
+        lambda: backend.get_grade_audit_logs(20) is not None, [()] * min(count, 500))
+
+    # 沿游标连续向后翻页：键集分页每页耗时应与翻到第几页无关
+    state = {'after': None}
+    def next_audit_page():
+        page = backend.get_grade_audit_page(state['after'], 100)
+        state['after'] = backend.audit_cursor(page[-1]) if page else None
+        return page is not None
+    results['get_grade_audit_page'] = run_timed(next_audit_page, [()] * min(count, 500))
+    return results
+
+def compare_with_baseline(report, baseline_path):
+    """与之前保存的 JSON 结果对比吞吐量和 p95 变化 (百分比)"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    deltas = {}
+    for name, current in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not isinstance(current, dict) or not isinstance(before, dict):
+            continue
+        delta = {}
+        for metric in ('throughput_per_s', 'p95_ms'):
+            if before.get(metric) and metric in current:
+                delta[metric + '_change_pct'] = round((current[metric] - before[metric]) / before[metric] * 100, 1)
+        if delta:
+            deltas[name] = delta
+    return {'baseline_commit': baseline.get('commit'), 'changes': deltas}
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+SCENARIOS = {
+    'suite': bench_suite,
+    'enroll': bench_enroll,
+    'bulk-enroll': bench_bulk_enroll,
+    'concurrent-enroll': bench_concurrent_enroll,
+    'capacity-stress': bench_capacity_stress,
+    'analytics': bench_analytics,
+    'roster-grades': bench_roster_grades,
+    'csv-io': bench_csv_io,
+    'row-memory': bench_row_memory,
+    'batch-rosters': bench_batch_rosters,
+    'search': bench_search,
+    'change-feed': bench_change_feed,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="学生选课系统性能基准测试")
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('--count', type=int, default=1000, help="每个场景执行的操作次数")
+    parser.add_argument('--batch-size', type=int, default=1000, help="批量接口每批的记录数")
+    parser.add_argument('--concurrency', default='1,10,100,1000', help="concurrent-enroll 的并发数列表，逗号分隔")
+    parser.add_argument('--clients', type=int, default=500, help="capacity-stress 的并发客户端数")
+    parser.add_argument('--capacity', type=int, default=100, help="capacity-stress 中课程的容量")
+    parser.add_argument('--roster-size', type=int, default=300, help="roster-grades 中课程的选课人数")
+    parser.add_argument('--memory-rows', type=int, default=500000, help="row-memory 读取的行数")
+    parser.add_argument('--search-rows', type=int, default=500000, help="search 构建内存索引的合成学生数")
+    parser.add_argument('--seed', type=int, default=42, help="随机抽样种子")
+    parser.add_argument('--output', help="把 JSON 结果另存到文件")
+    parser.add_argument('--baseline', help="与之前保存的 JSON 结果对比")
+    parser.add_argument('--engine', choices=('mysql', 'sqlite'), default=backend.DB_ENGINE, help="存储引擎")
+    parser.add_argument('--sqlite-path', help="SQLite 数据库文件 (默认 backend.SQLITE_CONFIG['path'])")
+    parser.add_argument('--metrics', action='store_true', help="启用 metrics.py，把各函数耗时分布和慢查询附在结果中")
+    parser.add_argument('--slow-ms', type=float, default=200, help="--metrics 的慢查询阈值 (毫秒)")
+    parser.add_argument('--prometheus', help="把 metrics 另存为 Prometheus 文本格式")
+    args = parser.parse_args(argv)
+    if args.engine != backend.DB_ENGINE or args.sqlite_path:
+        backend.use_engine(args.engine, **({'path': args.sqlite_path} if args.sqlite_path else {}))
+    if args.metrics or args.prometheus:
+        metrics.enable(backend, slow_threshold=args.slow_ms / 1000)
+
+    # 基准测试期间关闭 backend 中逐条的提示输出 (其他模块的 print 一并屏蔽)
+    backend.set_logging(False)
+    with contextlib.redirect_stdout(None):
+        result = SCENARIOS[args.scenario](args)
+    report = {
+        'scenario': args.scenario,
+        'engine': args.engine,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': current_commit(),
+        'results': result,
+        'pool': backend.get_pool_stats(),
+        'cache': backend.get_cache_stats(),
+    }
+    if metrics.is_enabled():
+        report['metrics'] = metrics.snapshot()
+        if args.prometheus:
+            with open(args.prometheus, 'w', encoding='utf-8') as f:
+                f.write(metrics.to_prometheus())
+    if args.baseline:
+        report['comparison'] = compare_with_baseline(report, args.baseline)
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+    if result.get('oversold') or result.get('counter_consistent') is False:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""变更日志 (change_log，迁移 009) 的读取位置
+
+界面定期调用 backend.get_changes_since(cursor.since())，cursor.accept(changes) 返回其中尚未处理的变更，
+group_changes 按表归并后只重新读取受影响的行，就地更新快照和 Treeview，而不是重新加载整张表。
+
+MySQL 的自增 change_id 按分配顺序而不是提交顺序出现：较小的 ID 可能在较大的 ID 之后才提交。
+accept 把跳过的 ID 记为空洞，之后从最小的空洞开始读取，空洞超过 gap_timeout 秒仍未出现
+(事务回滚用掉的 ID 永远不会出现) 就不再等待。SQLite 的写事务是串行的，不会产生空洞。
+
+用法:
+    cursor = ChangeCursor(backend.get_change_version())
+    feed = backend.get_changes_since(cursor.since())
+    grouped = group_changes(cursor.accept(feed['changes']))   # {'students': {id}, 'courses': {id}, ...}
+"""
+import time
+
+CHANGE_GAP_TIMEOUT = 30     # 空洞最多等待的秒数
+MAX_TRACKED_GAPS = 1000     # 一次跳过的 ID 超过这个数时不再逐个等待 (例如大批量事务回滚)
+
+
+class ChangeCursor:
+    """已处理到的版本号及其之前尚未出现的 change_id；只应在一个线程中使用"""
+
+    def __init__(self, version=0, gap_timeout=CHANGE_GAP_TIMEOUT, clock=time.monotonic):
+        self.version = version
+        self.gap_timeout = gap_timeout
+        self.clock = clock
+        self.gaps = {}  # change_id -> 放弃等待的时刻
+
+    def reset(self, version):
+        """整体重新加载后从 version 继续"""
+        self.version = version
+        self.gaps.clear()
+
+    def since(self):
+        """下一次读取的起点 (读取 change_id > since 的变更)"""
+        return min(self.gaps, default=self.version + 1) - 1
+
+    def accept(self, changes):
+        """changes (按 change_id 升序) 中尚未处理过的变更；同时前移版本号、记录和清理空洞"""
+        now = self.clock()
+        fresh = []
+        for change in changes:
+            change_id = change['change_id']
+            if change_id > self.version:
+                if change_id - self.version - 1 <= MAX_TRACKED_GAPS:
+                    for missing in range(self.version + 1, change_id):
+                        self.gaps[missing] = now + self.gap_timeout
+                self.version = change_id
+                fresh.append(change)
+            elif self.gaps.pop(change_id, None) is not None:
+                fresh.append(change)
+        expired = [change_id for change_id, deadline in self.gaps.items() if deadline <= now]
+        for change_id in expired:
+            del self.gaps[change_id]
+        return fresh
+
+
+def group_changes(changes):
+    """按表归并变更的主键：{'students': {student_id}, 'courses': {course_id}, 'selections': {(student_id, course_id)}}
+
+    选课记录的变化也改变了课程的 enrollment_count (courses 的触发器不记录人数变化)，对应课程同样要重新读取。
+    """
+    grouped = {'students': set(), 'courses': set(), 'selections': set()}
+    for change in changes:
+        table = change['table_name']
+        if table == 'selections':
+            grouped['selections'].add((change['row_id'], change['ref_id']))
+            grouped['courses'].add(change['ref_id'])
+        elif table in grouped:
+            grouped[table].add(change['row_id'])
+    return grouped
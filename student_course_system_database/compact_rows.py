@@ -0,0 +1,165 @@
+"""大结果集的紧凑行格式
+
+get_db_connection() 默认的字典游标为每一行建一个 dict，每行都重复保存全部列名的哈希表，
+全表读取时内存是数据本身的数倍。查询函数的 row_format 参数可以改用:
+
+    ROW_DICT     默认，每行一个 dict
+    ROW_TUPLE    每行一个 Row (tuple 子类，__slots__ 为空)，列名到下标的映射由同一查询的所有行共享。
+                 支持 row['列名']、row.get('列名')、row.列名、dict(row)，现有按列名取值的代码不用修改；
+                 注意 'x' in row 判断的是值而不是列名，json.dumps(row) 得到的是数组
+    ROW_COLUMNS  按列存放的 ColumnSet：每列一个 list，整数/浮点列用 array.array 存放原始值，
+                 可零拷贝转为 numpy 数组 (numpy.asarray(columns['grade']))
+
+用法:
+    conn, cursor = backend.get_db_connection(ROW_TUPLE)   # 非 ROW_DICT 时为元组游标
+    cursor.execute(sql, params)
+    rows = fetch_rows(cursor, ROW_TUPLE)
+"""
+from array import array
+from functools import lru_cache
+
+ROW_DICT = 'dict'
+ROW_TUPLE = 'tuple'
+ROW_COLUMNS = 'columns'
+ROW_FORMATS = (ROW_DICT, ROW_TUPLE, ROW_COLUMNS)
+
+
+class Row(tuple):
+    """按列名取值的元组行；_fields / _index 由 row_class 生成的子类提供"""
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    @classmethod
+    def _make(cls, values):
+        return tuple.__new__(cls, values)
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name):
+        try:
+            return tuple.__getitem__(self, self._index[name])
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._fields
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def _asdict(self):
+        return dict(zip(self._fields, self))
+
+    def __repr__(self):
+        return "Row(" + ", ".join(f"{name}={value!r}" for name, value in zip(self._fields, self)) + ")"
+
+
+@lru_cache(maxsize=128)
+def row_class(columns):
+    """列名元组对应的 Row 子类 (同一组列名复用同一个类)"""
+    return type('Row', (Row,), {'__slots__': (), '_fields': columns,
+                                '_index': {name: i for i, name in enumerate(columns)}})
+
+
+def _typed_column(values):
+    """整数列用 array('q')、浮点列用 array('d')，其余 (含 None、Decimal、字符串) 用 list"""
+    if values and all(type(v) is int for v in values):
+        try:
+            return array('q', values)
+        except OverflowError:
+            return list(values)
+    if values and all(type(v) is float for v in values):
+        return array('d', values)
+    return list(values)
+
+
+class ColumnSet:
+    """按列存放的查询结果：columns['列名'] 为该列的全部值，len() 为行数"""
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.data = {name: None for name in self.columns}
+        self._length = 0
+
+    def extend(self, rows):
+        """追加一批元组行；某列出现不符合 array 类型的值时该列转为 list"""
+        if not rows:
+            return
+        for name, values in zip(self.columns, zip(*rows)):  # 按列转置
+            column = self.data[name]
+            if column is None:
+                self.data[name] = _typed_column(values)
+            elif isinstance(column, array):
+                try:
+                    column.extend(values)
+                except (TypeError, OverflowError):
+                    # array.extend 失败前已经逐个追加了前面的值，只保留本批之前的部分
+                    self.data[name] = list(column[:self._length])
+                    self.data[name].extend(values)
+            else:
+                column.extend(values)
+        self._length += len(rows)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name):
+        column = self.data[name]
+        return [] if column is None else column
+
+    def row(self, i):
+        """第 i 行 (dict)"""
+        return {name: self[name][i] for name in self.columns}
+
+    def __iter__(self):
+        """逐行产出 Row，供需要按行处理的调用方使用"""
+        make = row_class(self.columns)._make
+        return map(make, zip(*(self[name] for name in self.columns)))
+
+
+def convert_rows(columns, rows, row_format):
+    """把元组游标读出的一批行转成 row_format (ROW_TUPLE 或 ROW_COLUMNS)"""
+    if row_format == ROW_TUPLE:
+        return list(map(row_class(tuple(columns))._make, rows))
+    if row_format == ROW_COLUMNS:
+        result = ColumnSet(columns)
+        result.extend(rows)
+        return result
+    raise ValueError(f"未知的行格式: {row_format}")
+
+
+def cursor_columns(cursor):
+    return tuple(column[0] for column in cursor.description or ())
+
+
+def fetch_rows(cursor, row_format=ROW_DICT, chunk_size=5000):
+    """读出已执行查询的全部结果
+
+    ROW_DICT 要求字典游标，直接 fetchall；其余格式要求元组游标，按 chunk_size 分批转换，
+    不会同时持有全部原始元组和转换后的结果。
+    """
+    if row_format == ROW_DICT:
+        return cursor.fetchall()
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"未知的行格式: {row_format}")
+    columns = cursor_columns(cursor)
+    if row_format == ROW_COLUMNS:
+        result = ColumnSet(columns)
+        add = result.extend
+    else:
+        result = []
+        make = row_class(columns)._make
+        add = lambda chunk: result.extend(map(make, chunk))
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            return result
+        add(chunk)
@@ -0,0 +1,209 @@
+"""合成数据生成脚本
+
+按规模向 students / courses / selections / grade_audit_log 批量写入可复现的测试数据
+(同一 --seed 生成的数据完全相同)，供基准测试和 explain_check.py 使用。
+
+用法:
+    python data_generator.py --scale 10k
+    python data_generator.py --scale 1m --seed 7 --batch-size 10000
+    python data_generator.py --clean          # 删除之前生成的数据
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import backend
+
+# 规模名 -> 选课记录数；学生数、课程数、审计日志数按比例推算
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+COURSES_PER_STUDENT = 8      # 平均每个学生的选课数
+STUDENTS_PER_COURSE = 200    # 平均每门课的选课人数
+GRADED_RATIO = 0.7           # 已录入成绩的选课比例
+AUDIT_PER_SELECTION = 0.5    # 平均每条选课的成绩变更日志数
+
+EMAIL_DOMAIN = 'gen.example.com'  # 生成的学生邮箱域名，用于识别和清理
+COURSE_PREFIX = 'GEN-'            # 生成的课程名前缀
+
+SURNAMES = "赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张孔曹严华金魏陶姜"
+GIVEN_CHARS = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰飞鹏宇浩然子涵欣怡"
+DEPARTMENTS = ['计算机系', '数学系', '物理系', '化学系', '外语系', '经济系', '管理系', '机械系']
+GENDERS = ['男', '女', '其他']
+
+
+def plan_for_scale(selections):
+    students = max(10, selections // COURSES_PER_STUDENT)
+    courses = max(COURSES_PER_STUDENT * 2, selections // STUDENTS_PER_COURSE)
+    return {
+        'students': students,
+        'courses': courses,
+        'selections': selections,
+        'audit_logs': int(selections * AUDIT_PER_SELECTION),
+    }
+
+
+def insert_batches(conn, cursor, sql, rows, batch_size, label):
+    """executemany 分批写入 (mysql.connector 会改写成多行 INSERT，SQLite 在一个事务内逐行插入)，每批提交一次"""
+    start = time.perf_counter()
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {total} 行, {elapsed:.1f} 秒 ({total / elapsed if elapsed else 0:.0f} 行/秒)")
+    return total
+
+
+def fetch_ids(cursor, column, sql, params=()):
+    cursor.execute(sql, params)
+    return [row[column] for row in cursor.fetchall()]
+
+
+def generate(scale, seed=42, batch_size=5000):
+    selections_target = SCALES[scale] if scale in SCALES else int(scale)
+    plan = plan_for_scale(selections_target)
+    rng = random.Random(seed)
+    tag = f"s{seed}"
+    print(f"生成数据 (scale={scale}, seed={seed}): {plan}")
+
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+    try:
+        is_mysql = backend.get_engine().name == 'mysql'
+        if is_mysql:
+            # 只在本会话关闭唯一性/外键检查以加速批量写入；数据由本脚本保证一致
+            cursor.execute("SET unique_checks = 0")
+            cursor.execute("SET foreign_key_checks = 0")
+
+        students = (
+            (rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_CHARS) for _ in range(rng.randint(1, 2))),
+             rng.choice(GENDERS), rng.randint(2018, 2025), f"{tag}_{i}@{EMAIL_DOMAIN}")
+            for i in range(plan['students']))
+        insert_batches(conn, cursor,
+                       "INSERT INTO students (student_name, student_gender, enrollment_year, email) VALUES (%s, %s, %s, %s)",
+                       students, batch_size, "students")
+
+        courses = (
+            (f"{COURSE_PREFIX}{tag}-{i:06d}", f"{rng.choice(SURNAMES)}老师", rng.choice((1, 2, 2, 3, 3, 4, 5)),
+             rng.choice(DEPARTMENTS))
+            for i in range(plan['courses']))
+        insert_batches(conn, cursor,
+                       "INSERT INTO courses (course_name, teacher_name, credits, department) VALUES (%s, %s, %s, %s)",
+                       courses, batch_size, "courses")
+
+        # 用 ! 作为转义字符：MySQL 和 SQLite 对反斜杠转义的处理不同
+        student_ids = fetch_ids(cursor, 'student_id',
+                                "SELECT student_id FROM students WHERE email LIKE %s ESCAPE '!' ORDER BY student_id",
+                                (f"{tag}!_%@{EMAIL_DOMAIN}",))
+        course_ids = fetch_ids(cursor, 'course_id', "SELECT course_id FROM courses WHERE course_name LIKE %s ORDER BY course_id",
+                               (f"{COURSE_PREFIX}{tag}-%",))
+
+        base_date = datetime(2024, 9, 1)
+        graded = []  # 已录入成绩的选课，用于生成审计日志
+
+        def selection_rows():
+            remaining = plan['selections']
+            for index, student_id in enumerate(student_ids):
+                if remaining <= 0:
+                    break
+                # 把剩余的选课数平均分给剩余的学生，保证总数正好等于目标
+                k = min(remaining, len(course_ids), max(1, round(remaining / (len(student_ids) - index))))
+                for course_id in rng.sample(course_ids, k):
+                    grade = None
+                    if rng.random() < GRADED_RATIO:
+                        grade = round(min(100.0, max(0.0, rng.gauss(78, 10))), 2)
+                        graded.append((student_id, course_id, grade))
+                    yield (student_id, course_id, base_date + timedelta(minutes=rng.randint(0, 60 * 24 * 14)), grade)
+                remaining -= k
+
+        # 选课插入时 trg_after_selection_insert 会同步维护 courses.enrollment_count
+        insert_batches(conn, cursor,
+                       "INSERT INTO selections (student_id, course_id, selection_date, grade) VALUES (%s, %s, %s, %s)",
+                       selection_rows(), batch_size, "selections")
+
+        selection_ids = {}
+        if graded:
+            for row in backend.iter_query(
+                    "SELECT selection_id, student_id, course_id FROM selections WHERE student_id BETWEEN %s AND %s",
+                    (student_ids[0], student_ids[-1]), chunk_size=10000):
+                selection_ids[(row['student_id'], row['course_id'])] = row['selection_id']
+
+        def audit_rows():
+            if not graded:
+                return
+            start = datetime(2022, 1, 1)
+            span_minutes = int((datetime(2025, 12, 31) - start).total_seconds() // 60)
+            for _ in range(plan['audit_logs']):
+                student_id, course_id, grade = rng.choice(graded)
+                old_grade = None if rng.random() < 0.6 else round(min(100.0, max(0.0, grade + rng.uniform(-15, 15))), 2)
+                yield (selection_ids.get((student_id, course_id)), student_id, course_id, old_grade, grade,
+                       rng.choice(('DB_TRIGGER', 'DB_TRIGGER', 'teacher', 'registrar')),
+                       start + timedelta(minutes=rng.randint(0, span_minutes)))
+
+        insert_batches(conn, cursor,
+                       "INSERT INTO grade_audit_log (selection_id, student_id, course_id, old_grade, new_grade, "
+                       "changed_by, change_timestamp) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                       audit_rows(), batch_size, "grade_audit_log")
+
+        if is_mysql:
+            cursor.execute("SET unique_checks = 1")
+            cursor.execute("SET foreign_key_checks = 1")
+            cursor.execute("ANALYZE TABLE students, courses, selections, grade_audit_log")
+            cursor.fetchall()
+        else:
+            cursor.execute("ANALYZE")
+            conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    backend.clear_caches()
+
+
+def clean():
+    """删除本脚本生成的数据 (级联删除其选课记录)"""
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+    try:
+        cursor.execute("DELETE FROM grade_audit_log WHERE student_id IN "
+                       "(SELECT student_id FROM students WHERE email LIKE %s)", (f"%@{EMAIL_DOMAIN}",))
+        cursor.execute("DELETE FROM grade_audit_log_archive WHERE student_id IN "
+                       "(SELECT student_id FROM students WHERE email LIKE %s)", (f"%@{EMAIL_DOMAIN}",))
+        cursor.execute("DELETE FROM courses WHERE course_name LIKE %s", (f"{COURSE_PREFIX}%",))
+        cursor.execute("DELETE FROM students WHERE email LIKE %s", (f"%@{EMAIL_DOMAIN}",))
+        conn.commit()
+        print("已删除生成的数据。")
+    finally:
+        cursor.close()
+        conn.close()
+    backend.clear_caches()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成学生选课系统的合成测试数据")
+    parser.add_argument('--scale', default='10k', help=f"选课记录规模: {', '.join(SCALES)} 或具体条数")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子，相同种子生成相同数据")
+    parser.add_argument('--batch-size', type=int, default=5000, help="每条多行 INSERT 的行数")
+    parser.add_argument('--clean', action='store_true', help="删除之前生成的数据后退出")
+    args = parser.parse_args(argv)
+    if args.clean:
+        clean()
+    else:
+        generate(args.scale, args.seed, args.batch_size)
+
+if __name__ == "__main__":
+    main()
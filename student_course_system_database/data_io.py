@@ -0,0 +1,435 @@
+"""CSV / Excel 批量导入导出
+
+导入：按 --batch-size 分块流式读取文件 (CSV 用 csv 模块逐行读，.xlsx 用 openpyxl 只读模式)，
+逐行校验后按批多行 INSERT；一批被数据库拒绝 (重复、学生/课程不存在、课程已满等) 时退回逐条
+插入，找出具体是哪几行，其余行照常提交。被拒绝的行连同行号和原因写入 --rejects 文件。
+MySQL 下可加 --load-data，把校验通过的行写入临时文件后用 LOAD DATA LOCAL INFILE 一次装载
+(服务器需开启 local_infile；数据库层面被 IGNORE 跳过的行只统计条数)。
+
+导出：在流式游标上逐块读取查询结果并写入 CSV / .xlsx，不在内存中保存整个结果集。
+
+文件第一行为列名，列名与表的列名相同；多余的列忽略 (导出的文件可以直接再导入)。
+
+用法:
+    python data_io.py import students students.csv --rejects rejects.csv
+    python data_io.py import selections selections.xlsx --batch-size 10000
+    python data_io.py import students students.csv --load-data          # 仅 MySQL
+    python data_io.py export selections selections.csv
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+try:
+    import openpyxl
+except ImportError:  # 只有读写 .xlsx 文件时需要
+    openpyxl = None
+
+import backend
+from storage_engines import MySQLEngine
+
+
+class RowError(ValueError):
+    """单行数据校验失败"""
+
+
+# --- 字段校验：每个函数把文件中的原始值转换为写入数据库的值，无效时抛出 RowError ---
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def text(max_length, required=False):
+    def convert(value):
+        if _blank(value):
+            if required:
+                raise RowError("不能为空")
+            return None
+        value = str(value).strip()
+        if len(value) > max_length:
+            raise RowError(f"超过 {max_length} 个字符")
+        return value
+    return convert
+
+def integer(low=None, high=None, required=False, default=None):
+    def convert(value):
+        if _blank(value):
+            if required:
+                raise RowError("不能为空")
+            return default
+        try:
+            number = Decimal(str(value).strip())
+            if number != number.to_integral_value():
+                raise RowError(f"不是整数: {value}")
+            number = int(number)
+        except InvalidOperation:
+            raise RowError(f"不是整数: {value}")
+        if (low is not None and number < low) or (high is not None and number > high):
+            raise RowError(f"超出范围 [{low}, {high}]: {number}")
+        return number
+    return convert
+
+def decimal(low, high):
+    def convert(value):
+        if _blank(value):
+            return None
+        try:
+            number = Decimal(str(value).strip()).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise RowError(f"不是数字: {value}")
+        if not low <= number <= high:
+            raise RowError(f"超出范围 [{low}, {high}]: {number}")
+        return number
+    return convert
+
+def choice(options, default):
+    def convert(value):
+        if _blank(value):
+            return default
+        value = str(value).strip()
+        if value not in options:
+            raise RowError(f"只能是 {'/'.join(options)}: {value}")
+        return value
+    return convert
+
+def timestamp(value):
+    if _blank(value):
+        return datetime.now()
+    if isinstance(value, datetime):
+        return value
+    value = str(value).strip()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise RowError(f"无法识别的时间: {value}")
+
+def email(value):
+    value = text(100)(value)
+    if value is not None and '@' not in value:
+        raise RowError(f"邮箱格式不正确: {value}")
+    return value
+
+
+# 表 -> ((列名, 校验函数), ...)；列的顺序即 INSERT 的列顺序
+IMPORT_SPECS = {
+    'students': (
+        ('student_name', text(100, required=True)),
+        ('student_gender', choice(('男', '女', '其他'), '其他')),
+        ('enrollment_year', integer(1901, 2155)),  # MySQL YEAR 类型的范围
+        ('email', email),
+    ),
+    'courses': (
+        ('course_name', text(100, required=True)),
+        ('teacher_name', text(100)),
+        ('credits', integer(0, 100, default=0)),
+        ('department', text(100)),
+        ('capacity', integer(0)),
+    ),
+    'selections': (
+        ('student_id', integer(1, required=True)),
+        ('course_id', integer(1, required=True)),
+        ('selection_date', timestamp),
+        ('grade', decimal(Decimal('0'), Decimal('100'))),
+    ),
+}
+# 文件中必须有的列；其余列缺失时按空值处理 (使用默认值)
+REQUIRED_COLUMNS = {
+    'students': ('student_name',),
+    'courses': ('course_name',),
+    'selections': ('student_id', 'course_id'),
+}
+# 逐条重试时可以归到某一行的数据库错误 -> 原因；其他错误 (连接断开等) 直接中止导入
+ROW_ERRNO_REASONS = {
+    1062: "重复 (唯一键冲突)",
+    1452: "学生或课程不存在",
+    backend.ERRNO_COURSE_FULL: "课程已满",
+    1048: "必填列为空",
+    1264: "数值超出范围",
+    1366: "数值格式不正确",
+    1406: "内容过长",
+    3819: "不满足检查约束",
+}
+
+EXPORT_QUERIES = {
+    'students': ('student_id', 'student_name', 'student_gender', 'enrollment_year', 'email'),
+    'courses': ('course_id', 'course_name', 'teacher_name', 'credits', 'department', 'enrollment_count', 'capacity'),
+    'selections': ('selection_id', 'student_id', 'course_id', 'selection_date', 'grade'),
+    'grade_audit_log': ('log_id', 'selection_id', 'student_id', 'course_id', 'old_grade', 'new_grade',
+                        'changed_by', 'change_timestamp'),
+}
+ORDER_KEYS = {'students': 'student_id', 'courses': 'course_id', 'selections': 'selection_id', 'grade_audit_log': 'log_id'}
+
+
+def _is_excel(path):
+    return path.lower().endswith(('.xlsx', '.xlsm'))
+
+def _require_openpyxl():
+    if openpyxl is None:
+        raise ImportError("读写 .xlsx 文件需要安装 openpyxl (pip install openpyxl)")
+
+
+# --- 读取 ---
+def read_rows(path, sheet=None):
+    """逐行读取 CSV / .xlsx，先产出列名列表，之后产出 (行号, 值列表)"""
+    if _is_excel(path):
+        _require_openpyxl()
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.active
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            yield [str(name).strip() if name is not None else '' for name in header]
+            for line, values in enumerate(rows, 2):
+                if any(value is not None for value in values):
+                    yield line, list(values)
+        finally:
+            workbook.close()
+        return
+    with open(path, newline='', encoding='utf-8-sig') as f:  # 兼容 Excel 另存的带 BOM 的 UTF-8
+        reader = csv.reader(f)
+        yield [name.strip() for name in next(reader, [])]
+        for values in reader:
+            if values:
+                yield reader.line_num, values
+
+
+class RejectWriter:
+    """把被拒绝的行写入 CSV：行号、原因，再加上原始的各列；第一次写入时才创建文件"""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line, reason, values):
+        self.count += 1
+        if not self.path:
+            return
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8-sig')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(['line', 'reason'] + list(self.header))
+        self._writer.writerow([line, reason] + ['' if value is None else value for value in values])
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def _validate(spec, positions, values):
+    """按列校验一行，返回写入用的元组；第一个无效的列抛出 RowError"""
+    converted = []
+    for name, convert in spec:
+        index = positions.get(name)
+        raw = values[index] if index is not None and index < len(values) else None
+        try:
+            converted.append(convert(raw))
+        except RowError as err:
+            raise RowError(f"{name}: {err}")
+    return tuple(converted)
+
+
+# --- 装载 ---
+def _insert_batch(conn, cursor, sql, batch, rejects):
+    """多行 INSERT 一批；被拒绝时退回逐条插入，返回插入的行数"""
+    try:
+        cursor.executemany(sql, [row for _line, _raw, row in batch])
+        conn.commit()
+        return len(batch)
+    except backend.DB_ERRORS as err:
+        conn.rollback()
+        if err.errno not in ROW_ERRNO_REASONS:
+            raise
+    inserted = 0
+    for line, raw, row in batch:
+        try:
+            cursor.execute(sql, row)
+            inserted += 1
+        except backend.DB_ERRORS as err:
+            if err.errno not in ROW_ERRNO_REASONS:
+                raise
+            rejects.write(line, ROW_ERRNO_REASONS[err.errno], raw)
+    conn.commit()
+    return inserted
+
+
+def _load_data_value(value):
+    """LOAD DATA 默认格式：制表符分隔，\\N 表示 NULL，反斜杠转义"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _load_data(table, columns, data_path):
+    """用独立连接 (开启 allow_local_infile) 执行 LOAD DATA LOCAL INFILE，返回 (装载行数, 警告列表)"""
+    conn = MySQLEngine(dict(backend.DB_CONFIG, allow_local_infile=True)).connect()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {table} CHARACTER SET utf8mb4 "
+                       f"({', '.join(columns)})", (data_path,))
+        loaded = cursor.rowcount
+        cursor.execute("SHOW WARNINGS LIMIT 20")
+        warnings = [row[2] for row in cursor.fetchall()]
+        conn.commit()
+        return loaded, warnings
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def import_file(table, path, batch_size=5000, rejects_path=None, load_data=False, sheet=None):
+    """把 CSV / .xlsx 文件导入 table，返回统计结果 dict；导入中止时 dict 中带 'error'"""
+    spec = IMPORT_SPECS[table]
+    columns = [name for name, _ in spec]
+    if load_data and backend.get_engine().name != 'mysql':
+        print("LOAD DATA 仅支持 MySQL，改用多行 INSERT。")
+        load_data = False
+    start = time.perf_counter()
+    rows = read_rows(path, sheet)
+    header = next(rows)
+    positions = {name: index for index, name in enumerate(header)}
+    missing = [name for name in REQUIRED_COLUMNS[table] if name not in positions]
+    if missing:
+        return {'table': table, 'error': f"文件缺少必需的列: {', '.join(missing)}"}
+
+    report = {'table': table, 'read': 0, 'inserted': 0, 'rejected': 0, 'batch_size': batch_size}
+    rejects = RejectWriter(rejects_path, header)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    conn = cursor = data_file = None
+    try:
+        if load_data:
+            data_file = tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8', newline='')
+        else:
+            conn, cursor = backend.get_db_connection()
+            if not conn:
+                return dict(report, error="无法连接数据库")
+        while True:
+            chunk = list(itertools.islice(rows, batch_size))
+            if not chunk:
+                break
+            report['read'] += len(chunk)
+            batch = []
+            for line, values in chunk:
+                try:
+                    batch.append((line, values, _validate(spec, positions, values)))
+                except RowError as err:
+                    rejects.write(line, str(err), values)
+            if not batch:
+                continue
+            if load_data:
+                data_file.writelines('\t'.join(_load_data_value(v) for v in row) + '\n' for _l, _r, row in batch)
+                report['inserted'] += len(batch)
+            else:
+                report['inserted'] += _insert_batch(conn, cursor, sql, batch, rejects)
+        if load_data:
+            data_file.close()
+            validated = report['inserted']
+            report['inserted'], warnings = _load_data(table, columns, data_file.name)
+            report['skipped_by_database'] = validated - report['inserted']
+            if warnings:
+                report['warnings'] = warnings
+    except backend.DB_ERRORS as err:
+        report['error'] = f"数据库错误，已中止 (此前的批次已提交): {err}"
+    finally:
+        rejects.close()
+        if cursor:
+            cursor.close()
+            conn.close()
+        if data_file:
+            data_file.close()
+            os.remove(data_file.name)
+        backend.clear_caches()
+    report['rejected'] = rejects.count
+    elapsed = time.perf_counter() - start
+    report['elapsed_s'] = round(elapsed, 3)
+    report['rows_per_s'] = round(report['read'] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
+
+
+# --- 导出 ---
+def export_table(table, path, chunk_size=5000, sheet=None):
+    """把整张表按主键顺序流式写入 CSV / .xlsx，返回统计结果 dict"""
+    columns = EXPORT_QUERIES[table]
+    sql = f"SELECT {', '.join(columns)} FROM {table} ORDER BY {ORDER_KEYS[table]}"
+    return export_query(sql, (), columns, path, chunk_size, sheet)
+
+
+def export_query(sql, params, columns, path, chunk_size=5000, sheet=None):
+    """把任意查询的结果流式写入 CSV / .xlsx (openpyxl 只写模式)，返回统计结果 dict
+
+    无法连接数据库或读取中途出错时 dict 中带 'error'：.xlsx 不会生成，CSV 只含出错前的行。
+    """
+    start = time.perf_counter()
+    count = 0
+    report = {'path': path}
+    rows = backend.iter_query(sql, params, chunk_size, "导出查询", raise_errors=True)
+    try:
+        if _is_excel(path):
+            _require_openpyxl()
+            workbook = openpyxl.Workbook(write_only=True)
+            worksheet = workbook.create_sheet(sheet or 'Sheet1')
+            worksheet.append(list(columns))
+            for row in rows:
+                worksheet.append([float(v) if isinstance(v, Decimal) else v for v in (row[c] for c in columns)])
+                count += 1
+            workbook.save(path)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow(['' if row[c] is None else row[c] for c in columns])
+                    count += 1
+    except backend.QueryInterrupted as err:
+        report['error'] = f"导出中止，文件不完整: {err}"
+    elapsed = time.perf_counter() - start
+    report.update(rows=count, elapsed_s=round(elapsed, 3), rows_per_s=round(count / elapsed, 1) if elapsed > 0 else 0.0)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="学生/课程/选课数据的 CSV、Excel 批量导入导出")
+    sub = parser.add_subparsers(dest='command', required=True)
+    importer = sub.add_parser('import', help="从 CSV / .xlsx 导入")
+    importer.add_argument('table', choices=sorted(IMPORT_SPECS))
+    importer.add_argument('path')
+    importer.add_argument('--batch-size', type=int, default=5000, help="每批读取、校验和插入的行数")
+    importer.add_argument('--rejects', help="被拒绝的行写入此 CSV 文件")
+    importer.add_argument('--load-data', action='store_true', help="使用 LOAD DATA LOCAL INFILE (仅 MySQL)")
+    importer.add_argument('--sheet', help=".xlsx 的工作表名，默认第一个")
+    exporter = sub.add_parser('export', help="导出到 CSV / .xlsx")
+    exporter.add_argument('table', choices=sorted(EXPORT_QUERIES))
+    exporter.add_argument('path')
+    exporter.add_argument('--chunk-size', type=int, default=5000, help="每次从数据库读取的行数")
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        report = import_file(args.table, args.path, args.batch_size, args.rejects, args.load_data, args.sheet)
+        if 'error' in report:
+            print(report['error'])
+        print(f"读取 {report.get('read', 0)} 行，导入 {report.get('inserted', 0)} 行，"
+              f"拒绝 {report.get('rejected', 0)} 行，耗时 {report.get('elapsed_s', 0)} 秒 "
+              f"({report.get('rows_per_s', 0)} 行/秒)")
+        if report.get('skipped_by_database'):
+            print(f"LOAD DATA 跳过 {report['skipped_by_database']} 行 (重复或外键不存在): {report.get('warnings', [])[:5]}")
+        if report.get('rejected') and args.rejects:
+            print(f"被拒绝的行已写入 {args.rejects}")
+        sys.exit(2 if 'error' in report else 0)
+    report = export_table(args.table, args.path, args.chunk_size)
+    if 'error' in report:
+        print(report['error'])
+    print(f"导出 {report['rows']} 行到 {report['path']}，耗时 {report['elapsed_s']} 秒 ({report['rows_per_s']} 行/秒)")
+    sys.exit(2 if 'error' in report else 0)
+
+if __name__ == "__main__":
+    main()
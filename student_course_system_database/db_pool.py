@@ -0,0 +1,212 @@
+import threading
+import time
+
+
+class PoolExhaustedError(Exception):
+    """在等待超时后仍无法从连接池借到连接"""
+
+
+class PooledConnection:
+    """借出的连接代理：close() 时归还连接池而不是真正断开"""
+
+    def __init__(self, pool, raw_conn, record):
+        self._pool = pool
+        self._raw = raw_conn
+        self._record = record
+        self._returned = False
+
+    def close(self):
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._release(self._raw, self._record)
+
+    def invalidate(self):
+        """标记连接不可复用（例如结果集未读完），归还时直接关闭"""
+        self._record['invalid'] = True
+
+    @property
+    def raw_connection(self):
+        return self._raw
+
+    def __getattr__(self, name):
+        # 其余属性 (cursor, commit, rollback, lastrowid...) 全部转发给真实连接
+        return getattr(self._raw, name)
+
+
+class ConnectionPool:
+    """线程安全的数据库连接池
+
+    - min_size: 预先建立并常驻的连接数
+    - max_size: 同时存在的最大连接数，借满后调用方会等待
+    - max_uses: 一个连接被借出多少次后回收重建 (None 表示不限)
+    - idle_timeout: 空闲超过多少秒的连接在下次借出前回收 (None 表示不限)
+    - checkout_timeout: 借连接时最长等待秒数
+    - validate: 借出前的健康检查函数，返回 False 或抛异常表示连接已失效
+    """
+
+    def __init__(self, factory, min_size=1, max_size=10, max_uses=None,
+                 idle_timeout=None, checkout_timeout=10, validate=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("连接池大小配置无效: 需要 0 <= min_size <= max_size 且 max_size >= 1")
+        self._factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self._validate = validate or _default_validate
+        self._cond = threading.Condition()
+        self._idle = []          # [(raw_conn, record)]，后进先出，热连接优先复用
+        self._total = 0          # 当前存在的连接数 (空闲 + 借出)
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'closed': 0,
+            'recycled_max_uses': 0,
+            'recycled_idle': 0,
+            'health_check_failures': 0,
+        }
+        for _ in range(min_size):
+            raw, record = self._create()
+            self._idle.append((raw, record))
+
+    # --- 内部工具 ---
+    def _create(self):
+        raw = self._factory()
+        now = time.monotonic()
+        with self._cond:
+            self._total += 1
+            self._stats['created'] += 1
+        return raw, {'created_at': now, 'last_used': now, 'uses': 0, 'invalid': False}
+
+    def _destroy(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+
+    def _is_expired(self, record, now):
+        if self.max_uses is not None and record['uses'] >= self.max_uses:
+            self._stats['recycled_max_uses'] += 1
+            return True
+        if self.idle_timeout is not None and now - record['last_used'] > self.idle_timeout:
+            self._stats['recycled_idle'] += 1
+            return True
+        return False
+
+    def _take_idle_or_reserve(self, deadline):
+        """在锁内取出一个空闲连接；没有空闲但未满时预留一个新建名额"""
+        waited = False
+        wait_start = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolExhaustedError("连接池已关闭")
+                if self._idle:
+                    raw, record = self._idle.pop()
+                    break
+                if self._total < self.max_size:
+                    self._total += 1  # 预留名额，连接在锁外创建
+                    raw, record = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolExhaustedError(
+                        f"等待 {self.checkout_timeout} 秒后仍无可用连接 (max_size={self.max_size})")
+                if not waited:
+                    waited = True
+                    wait_start = time.monotonic()
+                    self._stats['waits'] += 1
+                self._cond.wait(remaining)
+            if waited:
+                self._stats['wait_time'] += time.monotonic() - wait_start
+        return raw, record
+
+    # --- 对外接口 ---
+    def get_connection(self):
+        """借出一个健康的连接，用完后调用其 close() 归还"""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            raw, record = self._take_idle_or_reserve(deadline)
+            if raw is None:
+                try:
+                    raw = self._factory()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                now = time.monotonic()
+                record = {'created_at': now, 'last_used': now, 'uses': 0, 'invalid': False}
+                with self._cond:
+                    self._stats['created'] += 1
+            else:
+                with self._cond:
+                    expired = self._is_expired(record, time.monotonic())
+                if expired:
+                    self._destroy(raw)
+                    continue
+                try:
+                    healthy = self._validate(raw)
+                except Exception:
+                    healthy = False
+                if not healthy:
+                    with self._cond:
+                        self._stats['health_check_failures'] += 1
+                    self._destroy(raw)
+                    continue
+            record['uses'] += 1
+            with self._cond:
+                self._stats['checkouts'] += 1
+            return PooledConnection(self, raw, record)
+
+    def _release(self, raw, record):
+        if not record['invalid']:
+            try:
+                # 丢弃调用方未提交的事务，保证下一个借用者拿到干净的会话
+                raw.rollback()
+            except Exception:
+                record['invalid'] = True
+        if record['invalid'] or self._closed:
+            self._destroy(raw)
+            return
+        record['last_used'] = time.monotonic()
+        with self._cond:
+            self._idle.append((raw, record))
+            self._cond.notify()
+
+    def close(self):
+        """关闭连接池及所有空闲连接；借出中的连接归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for raw, _ in idle:
+            self._destroy(raw)
+
+    def stats(self):
+        """返回连接池统计信息，用于调整池大小"""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot['size'] = self._total
+            snapshot['idle'] = len(self._idle)
+            snapshot['in_use'] = self._total - len(self._idle)
+            snapshot['min_size'] = self.min_size
+            snapshot['max_size'] = self.max_size
+        return snapshot
+
+
+def _default_validate(raw_conn):
+    """默认健康检查：对 mysql.connector 连接执行不自动重连的 ping"""
+    raw_conn.ping(reconnect=False)
+    return True
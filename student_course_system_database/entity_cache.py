@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class EntityCache:
+    """有容量上限 (LRU) 和过期时间 (TTL) 的实体缓存，线程安全
+
+    读穿透用法:
+        generation = cache.generation()
+        value = cache.get(key)
+        if value is MISSING:
+            value = 查询数据库(key)
+            cache.put(key, value, generation)
+
+    put 时若在查询期间发生过失效 (generation 变化)，结果不会写入缓存，
+    避免把并发写入之前读到的旧数据放回缓存。
+    """
+
+    MISSING = object()
+
+    def __init__(self, name, max_size=4096, ttl=30, enabled=True):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self._data = OrderedDict()  # key -> (过期时间, value)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        if not self.enabled:
+            return self.MISSING
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return self.MISSING
+            expires_at, value = entry
+            if self.ttl is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return self.MISSING
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def put(self, key, value, generation=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._stats['invalidations'] += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['size'] = len(self._data)
+            snapshot['max_size'] = self.max_size
+            snapshot['enabled'] = self.enabled
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_rate'] = round(snapshot['hits'] / lookups, 4) if lookups else 0.0
+        return snapshot
@@ -0,0 +1,231 @@
+"""查询计划检查脚本
+
+对 backend.py 中的查询执行 EXPLAIN (MySQL) 或 EXPLAIN QUERY PLAN (SQLite)，发现大表上的全表扫描
+(type=ALL)、没有被 LIMIT 截断的全索引扫描 (type=index) 或不应出现的 filesort 时以非零状态退出，
+可在导入基准数据集后放进 CI。检查用的 SQL 直接取自 backend / audit_archive 中的常量，查询改动后计划随之更新。
+
+用法:
+    python explain_check.py              # 检查所有查询
+    python explain_check.py --min-rows 0 # 即使表很小也检查 (小表上优化器可能合理地选择全表扫描)
+"""
+import argparse
+import re
+import sys
+
+import audit_archive
+import backend
+
+# 允许全表读取的查询 (本来就要返回整张表)
+FULL_SCAN_ALLOWED = {'get_all_students', 'get_all_courses', 'iter_all_students', 'iter_all_courses',
+                     'check_student_summary'}
+
+# FROM/JOIN/UPDATE/INTO 后的表名及其别名；EXPLAIN 的 table 列显示的是别名
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+_NOT_ALIAS = {'WHERE', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'CROSS', 'ON', 'ORDER', 'GROUP', 'LIMIT', 'SET',
+              'FOR', 'USING', 'VALUES', 'SELECT', 'HAVING', 'UNION'}
+_LIMIT = re.compile(r'\bLIMIT\b', re.I)
+# SQLite 的计划行: "SCAN s USING COVERING INDEX idx (...)"、"SEARCH st USING INTEGER PRIMARY KEY (rowid=?)"
+_SQLITE_STEP = re.compile(r'^(SCAN|SEARCH) (\S+)(?: USING (?:COVERING )?INDEX (\S+))?')
+
+
+def build_checks(sample, engine):
+    """(名称, SQL, 参数, 是否禁止 filesort)；参数取自数据库中真实存在的行"""
+    sid, cid = sample['student_id'], sample['course_id']
+    wait_sid, wait_cid = sample['waitlist_student_id'], sample['waitlist_course_id']
+    cursor_at = (sample['change_timestamp'], sample['log_id'])
+    archive = backend.AUDIT_ARCHIVE_TABLE
+    checks = [
+        ('get_student_by_id', backend.SQL_STUDENT_BY_ID, (sid,), True),
+        ('get_course_by_id', backend.SQL_COURSE_BY_ID, (cid,), True),
+        ('get_all_students', backend.SQL_ALL_STUDENTS, (), False),
+        ('get_all_courses', backend.SQL_ALL_COURSES, (), False),
+        ('iter_all_students', backend.SQL_ALL_STUDENTS_ORDERED, (), True),
+        ('iter_all_courses', backend.SQL_ALL_COURSES_ORDERED, (), True),
+        ('get_students_page', backend.SQL_STUDENTS_PAGE, (sid, 100), True),
+        ('get_courses_page', backend.SQL_COURSES_PAGE, (cid, 100), True),
+        ('update_student_email', backend.SQL_UPDATE_STUDENT_EMAIL, ('x@example.com', sid), True),
+        ('set_course_capacity', backend.SQL_SET_COURSE_CAPACITY, (None, cid), True),
+        ('select_course.check', backend.SQL_CHECK_STUDENT_AND_COURSE, (sid, cid), True),
+        ('bulk_select_courses.students', backend.SQL_EXISTING_STUDENTS.format(ids="%s, %s"), (sid, sid + 1), True),
+        ('bulk_select_courses.courses', backend.SQL_EXISTING_COURSES.format(ids="%s, %s"), (cid, cid + 1), True),
+        ('bulk_select_courses.existing', backend.SQL_EXISTING_SELECTIONS.format(students="%s", courses="%s"),
+         (sid, cid), True),
+        ('drop_course', backend.SQL_DELETE_SELECTION, (sid, cid), True),
+        ('record_grade', backend.SQL_UPDATE_GRADE, (None, sid, cid), True),
+        ('record_grades.lock', backend.SQL_LOCK_COURSE_GRADES.format("%s, %s"), (cid, sid, sid + 1), True),
+        ('record_grades.update', backend.SQL_UPDATE_GRADES_CASE.format(cases="WHEN %s THEN %s ", ids="%s"),
+         (sid, None, cid, sid), True),
+        ('get_student_selected_courses', backend.SQL_STUDENT_SELECTED_COURSES, (sid,), True),
+        ('get_course_enrolled_students', backend.SQL_COURSE_ENROLLED_STUDENTS, (cid,), True),
+        ('get_enrolled_students_by_course', backend.SQL_ENROLLED_STUDENTS_BY_COURSE.format(ids="%s, %s"),
+         (cid, cid + 1), True),
+        ('get_selected_courses_by_student', backend.SQL_SELECTED_COURSES_BY_STUDENT.format(ids="%s, %s"),
+         (sid, sid + 1), True),
+        # 候补队列: 入队、排队位置、名单，以及退课/扩容时的录取
+        ('join_waitlist', backend.SQL_WAITLIST_PUSH, (wait_cid, wait_sid, wait_cid), True),
+        ('get_waitlist_position', backend.SQL_WAITLIST_POSITION, (wait_sid, wait_cid), True),
+        ('get_course_waitlist', backend.SQL_COURSE_WAITLIST, (wait_cid, 100), True),
+        ('promote_waitlist.lock', backend.SQL_LOCK_COURSE_SEATS, (wait_cid,), True),
+        ('promote_waitlist.head', backend.SQL_WAITLIST_HEAD, (wait_cid, backend.PROMOTION_BATCH_SIZE), True),
+        ('promote_waitlist.pop', backend.SQL_WAITLIST_POP, (wait_cid, 1), True),
+        ('get_student_summary', backend.SQL_STUDENT_SUMMARY, (sid,), True),
+        ('check_student_summary', backend.SQL_COMPUTE_STUDENT_SUMMARY, (), False),
+        ('get_change_version', backend.SQL_CHANGE_BOUNDS, (), True),
+        ('get_change_version.table', backend.SQL_TABLE_VERSION, ('students',), True),
+        ('get_changes_since', backend.SQL_CHANGES_SINCE.format(tables=''), (0, backend.CHANGE_LOG_LIMIT), True),
+        ('prune_change_log', backend.SQL_PRUNE_CHANGE_LOG, (0,), True),
+        ('get_students_by_ids', backend.SQL_STUDENTS_BY_IDS.format(ids="%s, %s"), (sid, sid + 1), True),
+        ('get_courses_by_ids', backend.SQL_COURSES_BY_IDS.format(ids="%s, %s"), (cid, cid + 1), True),
+        ('get_student_selections_for_courses', backend.SQL_STUDENT_SELECTIONS_FOR_COURSES.format(ids="%s, %s"),
+         (sid, cid, cid + 1), True),
+        ('get_grade_audit_logs', backend.SQL_GRADE_AUDIT_LOGS, (20,), True),
+        ('archive_audit_logs', audit_archive.SQL_OLDEST_BEFORE.format(table=backend.AUDIT_TABLE),
+         (sample['change_timestamp'], 5000), True),
+        ('export_archive_month', audit_archive.SQL_ARCHIVE_MONTH,
+         (sample['change_timestamp'], sample['change_timestamp']), True),
+    ]
+    # 审计日志分页：热表和归档表上的各种筛选条件
+    for table in (backend.AUDIT_TABLE, archive):
+        suffix = '.archive' if table == archive else ''
+        checks += [
+            (f'get_grade_audit_page{suffix}.first',
+             *backend.build_grade_audit_query(None, 100, table=table), True),
+            (f'get_grade_audit_page{suffix}.student',
+             *backend.build_grade_audit_query(cursor_at, 100, table=table, student_id=sid), True),
+            (f'get_grade_audit_page{suffix}.course',
+             *backend.build_grade_audit_query(cursor_at, 100, table=table, course_id=cid), True),
+            (f'get_grade_audit_page{suffix}.changed_by',
+             *backend.build_grade_audit_query(None, 100, table=table, changed_by='DB_TRIGGER',
+                                              since=sample['change_timestamp']), True),
+        ]
+    # 搜索：纯数字按主键，较长的输入走全文索引 (短输入的 LIKE 本来就要扫描，不检查)
+    for table, spec in backend.SEARCH_TARGETS.items():
+        checks += [
+            (f'search_{table}.key', backend.SQL_SEARCH_BY_KEY.format(columns=spec['columns'], table=table,
+                                                                      key=spec['key']), (sid,), True),
+            (f'search_{table}.fulltext', backend.SQL_SEARCH.format(columns=spec['columns'], table=table,
+                                                                    condition=spec[engine]), ('"abc"', 20), True),
+        ]
+    return checks
+
+
+def table_aliases(sql):
+    """{别名或表名: 表名}"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in _NOT_ALIAS:
+            aliases[alias] = table
+    return aliases
+
+
+def table_row_counts(cursor, engine):
+    if engine == 'sqlite':
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")
+        counts = {}
+        for name in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute(f"SELECT COUNT(*) AS row_count FROM {name}")
+            counts[name] = cursor.fetchone()['row_count']
+        return counts
+    cursor.execute("""
+        SELECT table_name AS name, table_rows AS row_count
+        FROM information_schema.tables
+        WHERE table_schema = DATABASE()
+    """)
+    return {row['name']: row['row_count'] or 0 for row in cursor.fetchall()}
+
+
+def explain(cursor, engine, sql, params):
+    """执行计划的各步 [(表或别名, type, key, rows, Extra)]；SQLite 的计划按 MySQL 的列含义转换，rows 为 None"""
+    if engine != 'sqlite':
+        cursor.execute("EXPLAIN " + sql, params)
+        return [(step.get('table') or '', step.get('type') or '', step.get('key'), step.get('rows'),
+                 step.get('Extra') or '') for step in cursor.fetchall()]
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+    steps = []
+    for row in cursor.fetchall():
+        detail = row['detail']
+        match = _SQLITE_STEP.match(detail)
+        if match and not detail.startswith('SCAN CONSTANT ROW'):
+            op, table, index = match.groups()
+            if 'VIRTUAL TABLE' in detail:
+                access = 'fulltext'
+            elif op == 'SEARCH':
+                access = 'ref'
+            else:
+                access = 'index' if index else 'ALL'
+            key = index or ('PRIMARY' if 'PRIMARY KEY' in detail else None)
+            steps.append([table, access, key, None, ''])
+        elif detail.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in detail and steps:
+            steps[0][4] = 'Using filesort'
+    return [tuple(step) for step in steps]
+
+
+def bounded_index_scan(sql, rows, min_rows):
+    """按索引顺序读、读够 LIMIT 行就停止的扫描 (ORDER BY ... LIMIT)：MySQL 估算的行数很少；
+    SQLite 不给出行数，看语句是否带 LIMIT"""
+    if rows is not None:
+        return rows < min_rows
+    return bool(_LIMIT.search(sql))
+
+
+def pick_sample(cursor):
+    """选一个有选课记录的学生和课程、一条候补记录以及一条审计日志作为查询参数"""
+    cursor.execute("SELECT student_id, course_id FROM selections ORDER BY selection_id LIMIT 1")
+    sample = cursor.fetchone() or {'student_id': 1, 'course_id': 1}
+    cursor.execute("SELECT student_id AS waitlist_student_id, course_id AS waitlist_course_id FROM waitlist LIMIT 1")
+    sample.update(cursor.fetchone() or {'waitlist_student_id': sample['student_id'],
+                                        'waitlist_course_id': sample['course_id']})
+    cursor.execute("SELECT change_timestamp, log_id FROM grade_audit_log ORDER BY log_id LIMIT 1")
+    sample.update(cursor.fetchone() or {'change_timestamp': '2000-01-01 00:00:00', 'log_id': 0})
+    return sample
+
+
+def check_plans(min_rows=1000):
+    """返回 (检查结果列表, 问题列表)"""
+    engine = backend.get_engine().name
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+    results, problems = [], []
+    try:
+        row_counts = table_row_counts(cursor, engine)
+        sample = pick_sample(cursor)
+        for name, sql, params, forbid_filesort in build_checks(sample, engine):
+            aliases = table_aliases(sql)
+            for table, access, key, rows, extra in explain(cursor, engine, sql, params):
+                results.append((name, table, access, key, rows, extra))
+                real_table = aliases.get(table, table)
+                if not real_table or real_table.startswith('<') or row_counts.get(real_table, 0) < min_rows:
+                    continue  # 派生表/子查询结果，或数据量太小不具参考意义
+                if name not in FULL_SCAN_ALLOWED and (
+                        access == 'ALL' or (access == 'index' and not bounded_index_scan(sql, rows, min_rows))):
+                    problems.append(f"{name}: 表 {real_table} 全{'表' if access == 'ALL' else '索引'}扫描 (rows={rows})")
+                if forbid_filesort and 'Using filesort' in extra:
+                    problems.append(f"{name}: 表 {real_table} 使用了 filesort")
+    finally:
+        conn.rollback()  # EXPLAIN DELETE/UPDATE 不会真正修改数据，这里只是保险
+        cursor.close()
+        conn.close()
+    return results, problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查 backend 查询的执行计划")
+    parser.add_argument('--min-rows', type=int, default=1000, help="行数少于该值的表不做检查")
+    args = parser.parse_args(argv)
+
+    results, problems = check_plans(args.min_rows)
+    print(f"{'查询':<32} {'表':<16} {'type':<8} {'key':<30} {'rows':>8}  Extra")
+    print("-" * 110)
+    for name, table, access, key, rows, extra in results:
+        print(f"{name:<32} {table:<16} {access:<8} {str(key):<30} {str(rows):>8}  {extra}")
+    if problems:
+        print("\n发现查询计划退化:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\n所有查询计划检查通过。")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import tkinter as tk
 from tkinter import ttk # ttk 模块提供了一些样式更好的控件
 from tkinter import messagebox # 用于显示简单的消息框
+from datetime import datetime, timedelta
 
 # 假设你的后端逻辑在 backend.py 文件中
 # 你需要确保 backend.py 中的 DB_CONFIG 配置正确
 # 并且相关函数 (get_all_students, add_student, update_student, delete_student,
 # get_all_courses, add_course, update_course, delete_course,
 # select_course, drop_course, get_student_selected_courses, record_grade,
-# get_grade_audit_logs) 存在且能正常工作
+# get_grade_audit_page) 存在且能正常工作
 try:
     import backend # 导入我们之前写的后端逻辑
+    from virtual_tree import VirtualTreeList
+    from task_dispatcher import TaskDispatcher
+    from snapshot_store import SnapshotStore
+    from search_index import SearchIndex
+    from change_feed import ChangeCursor, group_changes
+    import analytics # 成绩统计分析 (需要 numpy，缺失时只有该选项卡不可用)
 except ImportError:
     messagebox.showerror("错误", "无法导入 backend.py。\n请确保该文件存在于同一目录下且无语法错误。")
     exit()
@@ -19,11 +26,38 @@ except Exception as e:
 
 
 class StudentCourseApp:
+    # 虚拟列表每页行数；Treeview 中最多保留 VIRTUAL_LIST_PAGES 页
+    VIRTUAL_LIST_PAGE_SIZE = 200
+    VIRTUAL_LIST_PAGES = 3
+    # 学生/课程下拉框：输入后停顿多久开始搜索 (毫秒)，以及最多列出的候选数
+    TYPE_AHEAD_DELAY_MS = 150
+    TYPE_AHEAD_LIMIT = 50
+    # 每隔多久读取一次变更日志 (毫秒)；一次积压的变更多于 CHANGE_RELOAD_THRESHOLD 条时整表重新加载更快
+    CHANGE_POLL_MS = 3000
+    CHANGE_RELOAD_THRESHOLD = 2000
+
     def __init__(self, root_window):
         self.root = root_window
         self.root.title("学生选课管理系统") # 窗口标题
         self.root.geometry("1000x800") # 调整窗口初始大小
 
+        # --- 后台任务调度：数据库调用都在线程池中执行，不阻塞 Tk 主线程 ---
+        self.create_status_bar()
+        self.dispatcher = TaskDispatcher(self.root, on_busy_change=self.set_busy)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # --- 学生/课程共享快照：列表和下拉框都从这里读，一次变更只查询一次数据库 ---
+        # 快照常驻内存，用紧凑的元组行 (compact_rows.Row) 代替每行一个 dict，按列名取值的代码不变
+        # 下拉框的搜索索引在后台线程随快照一起同步，只增删有变化的记录
+        self.student_index = SearchIndex('student_id', ('student_name', 'email'), gram_fields=('student_name',),
+                                         label=self.student_label)
+        self.course_index = SearchIndex('course_id', ('course_name',), label=self.course_label)
+        self.store = SnapshotStore(self.dispatcher.submit)
+        self.store.register('students', 'student_id', lambda: self.fetch_indexed(
+            backend.iter_all_students(row_format=backend.ROW_TUPLE), self.student_index))
+        self.store.register('courses', 'course_id', lambda: self.fetch_indexed(
+            backend.iter_all_courses(row_format=backend.ROW_TUPLE), self.course_index))
+
         # --- 创建主 Notebook (选项卡) ---
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(expand=True, fill='both', padx=10, pady=10)
@@ -47,15 +81,204 @@ class StudentCourseApp:
         self.audit_log_tab = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(self.audit_log_tab, text='成绩审计日志')
         self.create_audit_log_widgets()
+
+        # --- 创建成绩分析选项卡 ---
+        self.analytics_tab = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(self.analytics_tab, text='成绩分析')
+        self.create_analytics_widgets()
         
-        # --- 初始加载数据 ---
-        self.load_students()
-        self.load_courses()
-        self.populate_selection_student_combobox() # 填充选课管理中的学生下拉框
-        self.populate_selection_course_combobox()  # 填充选课管理中的课程下拉框
+        # --- 快照刷新后同步更新列表和选课管理中的下拉框；增量更新时只改动受影响的行 ---
+        self.store.subscribe('students', self.on_students_snapshot,
+                             on_patch=lambda snapshot, rows, deleted: self.student_list.patch(rows, deleted))
+        self.store.subscribe('courses', self.on_courses_snapshot,
+                             on_patch=lambda snapshot, rows, deleted: self.course_list.patch(rows, deleted))
+
+        # --- 变更日志 (迁移 009)：写操作后和定时轮询时只读取变化的行；不可用时退回写后整表刷新 ---
+        self.change_cursor = None
+        self.change_poll = {'in_flight': False, 'again': None, 'after': None}
+
+        # --- 初始加载数据：先记下变更日志的版本号再加载快照，之后的变更由轮询补上 ---
+        self.dispatcher.submit(backend.get_change_version, on_success=self.start_change_feed,
+                               on_error=lambda exc: self.start_change_feed(None))
         self.load_grade_audit_logs() # 初始加载审计日志
 
 
+    #-------------------------------------------------------------------
+    # 后台任务与忙碌状态
+    #-------------------------------------------------------------------
+    def create_status_bar(self):
+        # 状态栏需在 Notebook 之前 pack，保证窗口缩小时仍然可见
+        status_frame = ttk.Frame(self.root, padding=(10, 0, 10, 5))
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.status_var = tk.StringVar(value="就绪")
+        ttk.Label(status_frame, textvariable=self.status_var).pack(side=tk.LEFT)
+        self.busy_bar = ttk.Progressbar(status_frame, mode="indeterminate", length=120)
+        self.busy_bar.pack(side=tk.RIGHT)
+
+    def set_busy(self, busy):
+        """有后台任务在执行时显示忙碌指示，而不是让窗口卡住"""
+        if busy:
+            self.status_var.set("正在处理...")
+            self.busy_bar.start(15)
+            self.root.configure(cursor="watch")
+        else:
+            self.status_var.set("就绪")
+            self.busy_bar.stop()
+            self.root.configure(cursor="")
+
+    def run_backend(self, func, *args, on_success=None, error_title="操作失败", parent=None, key=None):
+        """在线程池中调用 backend 函数，结果在主线程交给 on_success；异常统一弹框提示"""
+        def on_error(exc):
+            if isinstance(exc, AttributeError):
+                messagebox.showerror("后端函数错误", f"调用 backend.{func.__name__} 时出错: {exc}\n请确保该函数已正确定义。", parent=parent)
+            else:
+                messagebox.showerror(error_title, f"发生错误: {exc}\n请确保数据库连接正常且backend.py中的函数无误。", parent=parent)
+        return self.dispatcher.submit(func, *args, on_success=on_success, on_error=on_error, key=key)
+
+    @staticmethod
+    def fetch_indexed(rows, index):
+        """(后台线程) 读出全表并同步搜索索引，返回行列表作为快照"""
+        rows = list(rows)
+        index.sync(rows)
+        return rows
+
+    @staticmethod
+    def student_label(student):
+        return f"{student['student_id']} - {student['student_name']}"
+
+    @staticmethod
+    def course_label(course):
+        return f"{course['course_id']} - {course['course_name']}"
+
+    def on_close(self):
+        if self.change_poll['after'] is not None:
+            self.root.after_cancel(self.change_poll['after'])
+        self.dispatcher.shutdown()
+        self.print_fetch_report()
+        self.root.destroy()
+
+    def print_fetch_report(self):
+        """打印各界面操作触发的学生/课程全表查询次数和增量更新次数"""
+        for title, report in (("界面操作触发的数据库查询次数", self.store.fetch_report()),
+                              ("变更日志增量更新次数", self.store.fetch_report(self.store.patch_counts))):
+            if not report:
+                continue
+            print(f"\n--- {title} ---")
+            for action, counts in report.items():
+                detail = ", ".join(f"{name}: {count}" for name, count in counts.items())
+                print(f"{action:<12} {detail}")
+
+    #-------------------------------------------------------------------
+    # 变更日志：增量刷新
+    #-------------------------------------------------------------------
+    def start_change_feed(self, version):
+        """version 为加载快照之前的变更日志版本号；为 None (未执行迁移 009 或出错) 时不轮询"""
+        if version is not None:
+            self.change_cursor = ChangeCursor(version)
+            self.change_poll['after'] = self.root.after(self.CHANGE_POLL_MS, self.poll_changes)
+        self.load_students(action='启动')
+        self.load_courses(action='启动')
+
+    def poll_changes(self):
+        """定时读取其他用户的修改"""
+        self.sync_changes(action='轮询')
+        self.change_poll['after'] = self.root.after(self.CHANGE_POLL_MS, self.poll_changes)
+
+    def after_write(self, tables, action):
+        """写操作成功后刷新界面：有变更日志时只同步变化的行，否则按 tables 整表刷新"""
+        if self.change_cursor is not None:
+            self.sync_changes(action)
+            return
+        if 'selections' in tables and self.get_selected_student_id_from_combo():
+            self.load_student_selections_for_selected_student()
+        if 'students' in tables:
+            self.load_students(action=action)
+        if 'courses' in tables:
+            self.load_courses(action=action)
+
+    def sync_changes(self, action='轮询'):
+        poll = self.change_poll
+        if poll['in_flight'] or any(table.in_flight for table in self.store.tables.values()):
+            # 上一次同步或整表加载尚未完成：完成后再同步，避免用较旧的行覆盖较新的快照
+            if poll['again'] is None or action != '轮询':
+                poll['again'] = action
+            return
+        poll['in_flight'] = True
+        generations = {name: table.generation for name, table in self.store.tables.items()}
+        self.dispatcher.submit(self.fetch_changes, self.change_cursor.since(), self.get_selected_student_id_from_combo(),
+                               on_success=lambda result: self.apply_changes(result, generations, action),
+                               on_error=lambda exc: self.apply_changes(None, generations, action),
+                               background=True)
+
+    def fetch_changes(self, since, student_id):
+        """(后台线程) 读取 since 之后的变更和受影响的行，并同步搜索索引
+
+        返回 None 表示没有新变更 (或数据库暂时不可用，下次轮询再试)；{'reload': True} 表示需要整表重新加载
+        (日志已被清理、积压过多或读取行失败)；否则为 {表名: (行, 已删除的主键)}，
+        'selections' 为 (学生ID, 该学生受影响的选课行, 已退选的课程ID)。
+        """
+        cursor = self.change_cursor
+        feed = backend.get_changes_since(since, self.CHANGE_RELOAD_THRESHOLD)
+        if feed is None:
+            return None
+        changes = feed['changes']
+        if (feed['oldest'] is not None and since < feed['oldest'] - 1) or len(changes) >= self.CHANGE_RELOAD_THRESHOLD:
+            cursor.reset(feed['latest'])
+            return {'reload': True}
+        grouped = group_changes(cursor.accept(changes))
+        result = {'reload': False}
+        for name, fetch, index in (('students', backend.get_students_by_ids, self.student_index),
+                                   ('courses', backend.get_courses_by_ids, self.course_index)):
+            keys = grouped[name]
+            if not keys:
+                continue
+            rows = fetch(keys, row_format=backend.ROW_TUPLE)
+            if rows is None:
+                cursor.reset(feed['latest'])
+                return {'reload': True}
+            snapshot = self.store.tables[name]
+            deleted = keys - {row[snapshot.key_field] for row in rows}
+            if snapshot.loaded:  # 索引尚未构建时由整表加载统一构建
+                for row in rows:
+                    index.add(row)
+                for key in deleted:
+                    index.remove(key)
+            result[name] = (rows, deleted)
+        course_ids = {course_id for changed_student, course_id in grouped['selections'] if changed_student == student_id}
+        if course_ids:
+            rows = backend.get_student_selections_for_courses(student_id, course_ids)
+            if rows is None:
+                cursor.reset(feed['latest'])
+                return {'reload': True}
+            result['selections'] = (student_id, rows, course_ids - {row['course_id'] for row in rows})
+        return result if len(result) > 1 else None
+
+    def resume_change_sync(self):
+        """整表加载完成后补做加载期间等待的同步"""
+        poll = self.change_poll
+        if poll['again'] is not None and not poll['in_flight']:
+            action, poll['again'] = poll['again'], None
+            self.sync_changes(action)
+
+    def apply_changes(self, result, generations, action):
+        poll = self.change_poll
+        poll['in_flight'] = False
+        if result is not None and result['reload']:
+            self.load_students(action=action)
+            self.load_courses(action=action)
+            if self.get_selected_student_id_from_combo():
+                self.load_student_selections_for_selected_student()
+        elif result is not None:
+            for name in ('students', 'courses'):
+                if name in result:
+                    rows, deleted = result[name]
+                    self.store.apply(name, rows, deleted, generations[name], action)
+            if 'selections' in result:
+                self.patch_student_selections(*result['selections'])
+        if poll['again'] is not None:
+            action, poll['again'] = poll['again'], None
+            self.sync_changes(action)
+
     #-------------------------------------------------------------------
     # 学生管理相关 Widgets 和方法
     #-------------------------------------------------------------------
@@ -73,7 +296,7 @@ class StudentCourseApp:
         self.delete_student_button = ttk.Button(student_action_frame, text="删除选中学生", command=self.delete_selected_student)
         self.delete_student_button.pack(side=tk.LEFT, padx=5)
         
-        self.refresh_students_button = ttk.Button(student_action_frame, text="刷新列表", command=self.load_students)
+        self.refresh_students_button = ttk.Button(student_action_frame, text="刷新列表", command=lambda: self.load_students(action='刷新学生列表'))
         self.refresh_students_button.pack(side=tk.LEFT, padx=5)
 
         # --- 学生列表显示区域 ---
@@ -95,31 +318,33 @@ class StudentCourseApp:
 
         self.student_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         student_scrollbar = ttk.Scrollbar(student_list_frame, orient=tk.VERTICAL, command=self.student_tree.yview)
-        self.student_tree.configure(yscroll=student_scrollbar.set)
         student_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.student_list = VirtualTreeList(
+            self.student_tree, student_scrollbar,
+            fetch_page=self.store.tables['students'].page,
+            row_key=lambda student: student['student_id'],
+            row_values=lambda student: (
+                student.get('student_id', ''), student.get('student_name', ''),
+                student.get('student_gender', ''), student.get('enrollment_year', ''),
+                student.get('email', '')
+            ),
+            page_size=self.VIRTUAL_LIST_PAGE_SIZE, max_pages=self.VIRTUAL_LIST_PAGES)
         self.student_tree.bind("<Double-1>", self.on_student_double_click)
 
     def on_student_double_click(self, event):
         if self.student_tree.selection():
             self.open_update_student_window()
 
-    def load_students(self):
-        for item in self.student_tree.get_children():
-            self.student_tree.delete(item)
-        try:
-            students_data = backend.get_all_students()
-            if students_data:
-                for student in students_data:
-                    self.student_tree.insert("", tk.END, values=(
-                        student.get('student_id', ''), student.get('student_name', ''),
-                        student.get('student_gender', ''), student.get('enrollment_year', ''),
-                        student.get('email', '')
-                    ))
-            self.populate_selection_student_combobox() 
-        except AttributeError as ae:
-             messagebox.showerror("后端函数错误", f"调用 backend.py 中的函数时出错: {ae}\n请确保 get_all_students 函数已正确定义。")
-        except Exception as e:
-            messagebox.showerror("加载学生数据失败", f"发生错误: {e}\n请确保数据库连接正常且backend.py中的函数无误。")
+    def load_students(self, action='刷新学生列表'):
+        # 只刷新一次共享快照；列表和下拉框在 on_students_snapshot 中从快照重建
+        self.store.refresh('students', action, on_error=lambda e: messagebox.showerror(
+            "加载学生数据失败", f"发生错误: {e}\n请确保数据库连接正常且backend.py中的函数无误。"))
+
+    def on_students_snapshot(self, snapshot):
+        # 虚拟列表：一次性清空后只显示第一页，其余页在滚动时从快照按需读取
+        self.student_list.reload()
+        self.populate_selection_student_combobox() 
+        self.resume_change_sync()
 
     def open_add_student_window(self):
         self.add_student_win = tk.Toplevel(self.root)
@@ -165,17 +390,16 @@ class StudentCourseApp:
             messagebox.showwarning("输入错误", "请输入有效的入学年份 (例如 2023)！", parent=self.add_student_win)
             return
         year = int(year_str)
-        try:
-            if backend.add_student(name, gender, year, email):
-                messagebox.showinfo("成功", "学生添加成功！", parent=self.add_student_win)
-                self.add_student_win.destroy()
-                self.load_students() 
+        win = self.add_student_win
+        def done(ok):
+            if ok:
+                messagebox.showinfo("成功", "学生添加成功！", parent=win)
+                win.destroy()
+                self.after_write(('students',), '添加学生')
             else:
-                messagebox.showerror("失败", "添加学生失败，可能是邮箱重复或数据库错误。", parent=self.add_student_win)
-        except AttributeError as ae:
-            messagebox.showerror("后端函数错误", f"调用 backend.add_student 时出错: {ae}\n请确保该函数已正确定义。", parent=self.add_student_win)
-        except Exception as e:
-            messagebox.showerror("操作失败", f"添加学生时发生错误: {e}", parent=self.add_student_win)
+                messagebox.showerror("失败", "添加学生失败，可能是邮箱重复或数据库错误。", parent=win)
+        self.run_backend(backend.add_student, name, gender, year, email,
+                         on_success=done, error_title="添加学生失败", parent=win)
 
     def open_update_student_window(self):
         selected_item = self.student_tree.focus() 
@@ -235,17 +459,20 @@ class StudentCourseApp:
             messagebox.showwarning("输入错误", "请输入有效的入学年份 (例如 2023)！", parent=self.update_student_win)
             return
         year = int(year_str)
-        try:
-            if backend.update_student(student_id, name, gender, year, email):
-                messagebox.showinfo("成功", "学生信息更新成功！", parent=self.update_student_win)
-                self.update_student_win.destroy()
-                self.load_students() 
+        win = self.update_student_win
+        update_student = getattr(backend, 'update_student', None)
+        if update_student is None:
+            messagebox.showerror("后端函数错误", "backend.py 中缺少 update_student 函数。\n请确保该函数已正确定义以更新学生所有信息。", parent=win)
+            return
+        def done(ok):
+            if ok:
+                messagebox.showinfo("成功", "学生信息更新成功！", parent=win)
+                win.destroy()
+                self.after_write(('students',), '修改学生')
             else:
-                messagebox.showerror("失败", "更新学生信息失败，可能是邮箱重复或数据库错误。", parent=self.update_student_win)
-        except AttributeError:
-             messagebox.showerror("后端函数错误", "backend.py 中缺少 update_student 函数。\n请确保该函数已正确定义以更新学生所有信息。", parent=self.update_student_win)
-        except Exception as e:
-            messagebox.showerror("操作失败", f"更新学生时发生错误: {e}", parent=self.update_student_win)
+                messagebox.showerror("失败", "更新学生信息失败，可能是邮箱重复或数据库错误。", parent=win)
+        self.run_backend(update_student, student_id, name, gender, year, email,
+                         on_success=done, error_title="更新学生失败", parent=win)
 
     def delete_selected_student(self):
         selected_item = self.student_tree.focus()
@@ -255,16 +482,13 @@ class StudentCourseApp:
         student_data = self.student_tree.item(selected_item, "values")
         student_id, student_name = student_data[0], student_data[1]
         if messagebox.askyesno("确认删除", f"您确定要删除学生 '{student_name}' (ID: {student_id}) 吗？\n此操作将同时删除该学生的所有选课记录。"):
-            try:
-                if backend.delete_student(student_id):
+            def done(ok):
+                if ok:
                     messagebox.showinfo("成功", f"学生 '{student_name}' 删除成功！")
-                    self.load_students() 
+                    self.after_write(('students',), '删除学生')
                 else:
                     messagebox.showerror("失败", f"删除学生 '{student_name}' 失败。")
-            except AttributeError as ae:
-                messagebox.showerror("后端函数错误", f"调用 backend.delete_student 时出错: {ae}\n请确保该函数已正确定义。")
-            except Exception as e:
-                 messagebox.showerror("操作失败", f"删除学生时发生错误: {e}")
+            self.run_backend(backend.delete_student, student_id, on_success=done, error_title="删除学生失败")
 
     #-------------------------------------------------------------------
     # 课程管理相关 Widgets 和方法
@@ -278,7 +502,7 @@ class StudentCourseApp:
         self.update_course_button.pack(side=tk.LEFT, padx=5)
         self.delete_course_button = ttk.Button(course_action_frame, text="删除选中课程", command=self.delete_selected_course)
         self.delete_course_button.pack(side=tk.LEFT, padx=5)
-        self.refresh_courses_button = ttk.Button(course_action_frame, text="刷新列表", command=self.load_courses)
+        self.refresh_courses_button = ttk.Button(course_action_frame, text="刷新列表", command=lambda: self.load_courses(action='刷新课程列表'))
         self.refresh_courses_button.pack(side=tk.LEFT, padx=5)
 
         course_list_frame = ttk.LabelFrame(self.course_tab, text="课程列表", padding="10")
@@ -298,36 +522,43 @@ class StudentCourseApp:
         self.course_tree.column("enroll_count", width=80, anchor=tk.CENTER, stretch=tk.NO)
         self.course_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         course_scrollbar = ttk.Scrollbar(course_list_frame, orient=tk.VERTICAL, command=self.course_tree.yview)
-        self.course_tree.configure(yscroll=course_scrollbar.set)
         course_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.course_list = VirtualTreeList(
+            self.course_tree, course_scrollbar,
+            fetch_page=self.store.tables['courses'].page,
+            row_key=lambda course: course['course_id'],
+            row_values=lambda course: (
+                course.get('course_id', ''), course.get('course_name', ''),
+                course.get('teacher_name', ''), course.get('credits', ''),
+                course.get('department', ''), self.format_enrollment(course)
+            ),
+            page_size=self.VIRTUAL_LIST_PAGE_SIZE, max_pages=self.VIRTUAL_LIST_PAGES)
         self.course_tree.bind("<Double-1>", self.on_course_double_click)
 
+    @staticmethod
+    def format_enrollment(course):
+        """选课人数列：有容量上限时显示为 人数 / 容量"""
+        count = course.get('enrollment_count', 0)
+        capacity = course.get('capacity')
+        return count if capacity is None else f"{count} / {capacity}"
+
     def on_course_double_click(self, event):
         if self.course_tree.selection():
             self.open_update_course_window()
 
-    def load_courses(self):
-        for item in self.course_tree.get_children():
-            self.course_tree.delete(item)
-        try:
-            courses_data = backend.get_all_courses()
-            if courses_data:
-                for course in courses_data:
-                    self.course_tree.insert("", tk.END, values=(
-                        course.get('course_id', ''), course.get('course_name', ''),
-                        course.get('teacher_name', ''), course.get('credits', ''),
-                        course.get('department', ''), course.get('enrollment_count', 0)
-                    ))
-            self.populate_selection_course_combobox() 
-        except AttributeError as ae:
-             messagebox.showerror("后端函数错误", f"调用 backend.py 中的函数时出错: {ae}\n请确保 get_all_courses 函数已正确定义。")
-        except Exception as e:
-            messagebox.showerror("加载课程数据失败", f"发生错误: {e}\n请确保数据库连接正常且backend.py中的函数无误。")
+    def load_courses(self, action='刷新课程列表'):
+        self.store.refresh('courses', action, on_error=lambda e: messagebox.showerror(
+            "加载课程数据失败", f"发生错误: {e}\n请确保数据库连接正常且backend.py中的函数无误。"))
+
+    def on_courses_snapshot(self, snapshot):
+        self.course_list.reload()
+        self.populate_selection_course_combobox() 
+        self.resume_change_sync()
     
     def open_add_course_window(self):
         self.add_course_win = tk.Toplevel(self.root)
         self.add_course_win.title("添加新课程")
-        self.add_course_win.geometry("380x280")
+        self.add_course_win.geometry("380x320")
         self.add_course_win.transient(self.root)
         self.add_course_win.grab_set()
         form_frame = ttk.Frame(self.add_course_win, padding="15")
@@ -344,8 +575,11 @@ class StudentCourseApp:
         ttk.Label(form_frame, text="开课院系:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
         self.add_c_department_entry = ttk.Entry(form_frame, width=30)
         self.add_c_department_entry.grid(row=3, column=1, padx=5, pady=5)
+        ttk.Label(form_frame, text="容量 (留空不限):").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        self.add_c_capacity_entry = ttk.Entry(form_frame, width=30)
+        self.add_c_capacity_entry.grid(row=4, column=1, padx=5, pady=5)
         save_button = ttk.Button(form_frame, text="保存", command=self.save_new_course)
-        save_button.grid(row=4, column=0, columnspan=2, pady=15)
+        save_button.grid(row=5, column=0, columnspan=2, pady=15)
         self.add_c_name_entry.focus_set()
 
     def save_new_course(self):
@@ -353,24 +587,28 @@ class StudentCourseApp:
         teacher = self.add_c_teacher_entry.get().strip()
         credits_str = self.add_c_credits_entry.get().strip()
         department = self.add_c_department_entry.get().strip()
+        capacity_str = self.add_c_capacity_entry.get().strip()
         if not name:
             messagebox.showwarning("输入错误", "课程名称不能为空！", parent=self.add_course_win)
             return
         if not credits_str.isdigit() or int(credits_str) < 0:
             messagebox.showwarning("输入错误", "学分必须是非负整数！", parent=self.add_course_win)
             return
+        if capacity_str and not capacity_str.isdigit():
+            messagebox.showwarning("输入错误", "容量必须是非负整数，或留空表示不限！", parent=self.add_course_win)
+            return
         credits = int(credits_str)
-        try:
-            if backend.add_course(name, teacher, credits, department):
-                messagebox.showinfo("成功", "课程添加成功！", parent=self.add_course_win)
-                self.add_course_win.destroy()
-                self.load_courses() 
+        capacity = int(capacity_str) if capacity_str else None
+        win = self.add_course_win
+        def done(ok):
+            if ok:
+                messagebox.showinfo("成功", "课程添加成功！", parent=win)
+                win.destroy()
+                self.after_write(('courses',), '添加课程')
             else:
-                messagebox.showerror("失败", "添加课程失败，可能是课程名称重复或数据库错误。", parent=self.add_course_win)
-        except AttributeError as ae:
-            messagebox.showerror("后端函数错误", f"调用 backend.add_course 时出错: {ae}\n请确保该函数已正确定义。", parent=self.add_course_win)
-        except Exception as e:
-            messagebox.showerror("操作失败", f"添加课程时发生错误: {e}", parent=self.add_course_win)
+                messagebox.showerror("失败", "添加课程失败，可能是课程名称重复或数据库错误。", parent=win)
+        self.run_backend(backend.add_course, name, teacher, credits, department, capacity,
+                         on_success=done, error_title="添加课程失败", parent=win)
 
     def open_update_course_window(self):
         selected_item = self.course_tree.focus()
@@ -422,17 +660,20 @@ class StudentCourseApp:
             messagebox.showwarning("输入错误", "学分必须是非负整数！", parent=self.update_course_win)
             return
         credits = int(credits_str)
-        try:
-            if backend.update_course(course_id, name, teacher, credits, department):
-                messagebox.showinfo("成功", "课程信息更新成功！", parent=self.update_course_win)
-                self.update_course_win.destroy()
-                self.load_courses() 
+        win = self.update_course_win
+        update_course = getattr(backend, 'update_course', None)
+        if update_course is None:
+            messagebox.showerror("后端函数错误", "backend.py 中缺少 update_course 函数。\n请确保该函数已正确定义。", parent=win)
+            return
+        def done(ok):
+            if ok:
+                messagebox.showinfo("成功", "课程信息更新成功！", parent=win)
+                win.destroy()
+                self.after_write(('courses',), '修改课程')
             else:
-                messagebox.showerror("失败", "更新课程信息失败，可能是课程名称重复或数据库错误。", parent=self.update_course_win)
-        except AttributeError:
-             messagebox.showerror("后端函数错误", "backend.py 中缺少 update_course 函数。\n请确保该函数已正确定义。", parent=self.update_course_win)
-        except Exception as e:
-            messagebox.showerror("操作失败", f"更新课程时发生错误: {e}", parent=self.update_course_win)
+                messagebox.showerror("失败", "更新课程信息失败，可能是课程名称重复或数据库错误。", parent=win)
+        self.run_backend(update_course, course_id, name, teacher, credits, department,
+                         on_success=done, error_title="更新课程失败", parent=win)
 
     def delete_selected_course(self):
         selected_item = self.course_tree.focus()
@@ -442,16 +683,13 @@ class StudentCourseApp:
         course_data = self.course_tree.item(selected_item, "values")
         course_id, course_name = course_data[0], course_data[1]
         if messagebox.askyesno("确认删除", f"您确定要删除课程 '{course_name}' (ID: {course_id}) 吗？\n此操作将同时删除与此课程相关的所有选课记录。"):
-            try:
-                if backend.delete_course(course_id):
+            def done(ok):
+                if ok:
                     messagebox.showinfo("成功", f"课程 '{course_name}' 删除成功！")
-                    self.load_courses() 
+                    self.after_write(('courses',), '删除课程')
                 else:
                     messagebox.showerror("失败", f"删除课程 '{course_name}' 失败。")
-            except AttributeError as ae:
-                messagebox.showerror("后端函数错误", f"调用 backend.delete_course 时出错: {ae}\n请确保该函数已正确定义。")
-            except Exception as e:
-                 messagebox.showerror("操作失败", f"删除课程时发生错误: {e}")
+            self.run_backend(backend.delete_course, course_id, on_success=done, error_title="删除课程失败")
 
     #-------------------------------------------------------------------
     # 选课管理相关 Widgets 和方法
@@ -463,18 +701,29 @@ class StudentCourseApp:
         student_sel_frame.pack(side=tk.LEFT, padx=(0, 20), fill=tk.X, expand=True)
         ttk.Label(student_sel_frame, text="选择学生:").pack(side=tk.LEFT, padx=(0,5))
         self.sel_student_combo_var = tk.StringVar()
-        self.sel_student_combo = ttk.Combobox(student_sel_frame, textvariable=self.sel_student_combo_var, state="readonly", width=25)
+        # 可输入的下拉框：按学号、姓名或邮箱输入即搜，回车选中第一条候选
+        self.sel_student_combo = ttk.Combobox(student_sel_frame, textvariable=self.sel_student_combo_var, width=25)
         self.sel_student_combo.pack(side=tk.LEFT, padx=(0,10))
+        self.bind_type_ahead(self.sel_student_combo, 'students', self.student_index, backend.search_students,
+                             self.student_label, 'student_combo_map')
+        # 切换学生即加载其已选课程；上一个学生的查询若尚未返回会被作废
+        self.sel_student_combo.bind("<<ComboboxSelected>>", lambda e: self.load_student_selections_for_selected_student())
         load_selected_courses_button = ttk.Button(student_sel_frame, text="查询该学生已选课程", command=self.load_student_selections_for_selected_student)
         load_selected_courses_button.pack(side=tk.LEFT)
         course_sel_frame = ttk.Frame(top_frame)
         course_sel_frame.pack(side=tk.LEFT, fill=tk.X, expand=True)
         ttk.Label(course_sel_frame, text="选择课程进行选课:").pack(side=tk.LEFT, padx=(0,5))
         self.sel_available_course_combo_var = tk.StringVar()
-        self.sel_available_course_combo = ttk.Combobox(course_sel_frame, textvariable=self.sel_available_course_combo_var, state="readonly", width=30)
+        self.sel_available_course_combo = ttk.Combobox(course_sel_frame, textvariable=self.sel_available_course_combo_var, width=30)
         self.sel_available_course_combo.pack(side=tk.LEFT, padx=(0,10))
+        self.bind_type_ahead(self.sel_available_course_combo, 'courses', self.course_index, backend.search_courses,
+                             self.course_label, 'course_combo_map')
         select_this_course_button = ttk.Button(course_sel_frame, text="选修此课程", command=self.process_student_select_course)
         select_this_course_button.pack(side=tk.LEFT)
+        waitlist_button = ttk.Button(course_sel_frame, text="加入候补", command=self.process_join_waitlist)
+        waitlist_button.pack(side=tk.LEFT, padx=(5,0))
+        roster_button = ttk.Button(course_sel_frame, text="按课程录入成绩", command=self.open_course_roster_window)
+        roster_button.pack(side=tk.LEFT, padx=(5,0))
 
         selected_courses_frame = ttk.LabelFrame(self.selection_tab, text="学生已选课程列表", padding="10")
         selected_courses_frame.pack(fill=tk.BOTH, expand=True, pady=10)
@@ -502,69 +751,141 @@ class StudentCourseApp:
         drop_course_button.pack(side=tk.LEFT, padx=5)
         grade_course_button = ttk.Button(selected_courses_action_frame, text="录入/修改成绩", command=self.open_grade_entry_window)
         grade_course_button.pack(side=tk.LEFT, padx=5)
+        self.student_summary_var = tk.StringVar()
+        ttk.Label(selected_courses_action_frame, textvariable=self.student_summary_var).pack(side=tk.RIGHT, padx=5)
 
     def populate_selection_student_combobox(self):
-        try:
-            students = backend.get_all_students()
-            if students:
-                self.student_combo_map = {f"{s['student_id']} - {s['student_name']}": s['student_id'] for s in students}
-                self.sel_student_combo['values'] = list(self.student_combo_map.keys())
-                self.sel_student_combo.set('') 
-            else:
-                self.sel_student_combo['values'] = []
-                self.sel_student_combo.set('')
-        except Exception as e:
-            messagebox.showerror("错误", f"加载学生列表到下拉框失败: {e}")
-            self.sel_student_combo['values'] = []
-            self.sel_student_combo.set('')
-            
+        # 直接读共享快照，不再单独调用 backend.get_all_students；只列出第一页，其余靠输入搜索
+        students = self.store.tables['students'].page(None, self.TYPE_AHEAD_LIMIT)
+        self.set_combo_results(self.sel_student_combo, 'student_combo_map',
+                               [(s['student_id'], self.student_label(s)) for s in students])
+        self.sel_student_combo.set('')
+
     def populate_selection_course_combobox(self):
-        try:
-            courses = backend.get_all_courses()
-            if courses:
-                self.course_combo_map = {f"{c['course_id']} - {c['course_name']}": c['course_id'] for c in courses}
-                self.sel_available_course_combo['values'] = list(self.course_combo_map.keys())
-                self.sel_available_course_combo.set('') 
+        courses = self.store.tables['courses'].page(None, self.TYPE_AHEAD_LIMIT)
+        self.set_combo_results(self.sel_available_course_combo, 'course_combo_map',
+                               [(c['course_id'], self.course_label(c)) for c in courses])
+        self.sel_available_course_combo.set('')
+
+    def set_combo_results(self, combo, map_attr, results):
+        """results 为 [(主键, 显示文本)]；显示文本到主键的映射存到 self.<map_attr>"""
+        combo_map = {text: key for key, text in results}
+        setattr(self, map_attr, combo_map)
+        combo['values'] = list(combo_map)
+
+    def bind_type_ahead(self, combo, table_name, index, search_func, label, map_attr):
+        """下拉框输入即搜：快照已加载时查内存索引 (search_index.py)，否则调用 backend 在数据库中搜索"""
+        pending = {'after': None}
+
+        def run_search():
+            pending['after'] = None
+            query = combo.get().strip()
+            if query in getattr(self, map_attr, {}):
+                return  # 已经是一个完整的候选项
+            snapshot = self.store.tables[table_name]
+            if not query:
+                rows = snapshot.page(None, self.TYPE_AHEAD_LIMIT)
+                self.set_combo_results(combo, map_attr, [(row[snapshot.key_field], label(row)) for row in rows])
+            elif snapshot.loaded:
+                self.set_combo_results(combo, map_attr, index.search(query, self.TYPE_AHEAD_LIMIT))
             else:
-                self.sel_available_course_combo['values'] = []
-                self.sel_available_course_combo.set('')
-        except Exception as e:
-            messagebox.showerror("错误", f"加载课程列表到下拉框失败: {e}")
-            self.sel_available_course_combo['values'] = []
-            self.sel_available_course_combo.set('')
+                def done(rows):
+                    if combo.get().strip() == query:  # 结果返回前输入已经变了就丢弃
+                        self.set_combo_results(combo, map_attr, [(row[snapshot.key_field], label(row)) for row in rows])
+                self.run_backend(search_func, query, self.TYPE_AHEAD_LIMIT, on_success=done,
+                                 error_title="搜索失败", key=f'search_{table_name}')
+
+        def on_key(event):
+            if event.keysym in ('Up', 'Down', 'Return', 'KP_Enter', 'Escape', 'Tab'):
+                return
+            if pending['after'] is not None:
+                self.root.after_cancel(pending['after'])
+            pending['after'] = self.root.after(self.TYPE_AHEAD_DELAY_MS, run_search)
+
+        def on_return(event):
+            # 回车：输入不是完整候选项时选中第一条候选
+            values = combo['values']
+            if combo.get() not in getattr(self, map_attr, {}) and values:
+                combo.set(values[0])
+                combo.event_generate('<<ComboboxSelected>>')
+
+        combo.bind('<KeyRelease>', on_key)
+        combo.bind('<Return>', on_return)
+
+    def combo_key(self, display_val, map_attr, table_name):
+        """下拉框当前文本对应的主键：候选项直接查映射，直接输入的编号需在快照中存在"""
+        key = getattr(self, map_attr, {}).get(display_val)
+        if key is None and display_val.strip().isdigit():
+            snapshot = self.store.tables[table_name]
+            if snapshot.get(int(display_val)) is not None:
+                key = int(display_val)
+        return key
 
     def get_selected_student_id_from_combo(self):
-        display_val = self.sel_student_combo_var.get()
-        return self.student_combo_map.get(display_val)
+        return self.combo_key(self.sel_student_combo_var.get(), 'student_combo_map', 'students')
 
     def get_selected_course_id_from_combo(self):
-        display_val = self.sel_available_course_combo_var.get()
-        return self.course_combo_map.get(display_val)
+        return self.combo_key(self.sel_available_course_combo_var.get(), 'course_combo_map', 'courses')
 
     def load_student_selections_for_selected_student(self):
-        for item in self.student_selections_tree.get_children():
-            self.student_selections_tree.delete(item)
+        self.student_selections_tree.delete(*self.student_selections_tree.get_children())
         student_id = self.get_selected_student_id_from_combo()
         if not student_id:
+            self.dispatcher.cancel('student_selections')
             messagebox.showwarning("提示", "请先选择一个学生。")
             return
-        try:
-            selected_courses = backend.get_student_selected_courses(student_id)
+        def done(selected_courses):
+            self.student_selections_tree.delete(*self.student_selections_tree.get_children())
             if selected_courses:
                 for sel_course in selected_courses:
-                    grade_display = sel_course.get('grade', '') if sel_course.get('grade') is not None else "未录入"
-                    self.student_selections_tree.insert("", tk.END, values=(
-                        sel_course.get('course_id', ''),
-                        sel_course.get('course_name', ''),
-                        sel_course.get('teacher_name', ''),
-                        sel_course.get('credits', ''),
-                        grade_display,
-                        sel_course.get('selection_date', '')
-                    ))
-        except AttributeError as ae:
-            messagebox.showerror("后端函数错误", f"调用 backend.get_student_selected_courses 时出错: {ae}\n请确保该函数已正确定义。")
-        except Exception as e:
-            messagebox.showerror("加载已选课程失败", f"发生错误: {e}")
+                    # iid 为课程号：变更日志同步时按课程就地更新
+                    self.student_selections_tree.insert("", tk.END, iid=str(sel_course['course_id']),
+                                                        values=self.selection_values(sel_course))
+        # 同一 key：切换学生时，上一个学生尚未返回的查询结果会被丢弃
+        self.run_backend(backend.get_student_selected_courses, student_id,
+                         on_success=done, error_title="加载已选课程失败", key='student_selections')
+        self.student_summary_var.set('')
+        self.load_student_summary(student_id)
+
+    def load_student_summary(self, student_id):
+        self.run_backend(backend.get_student_summary, student_id,
+                         on_success=self.show_student_summary, error_title="加载学分汇总失败", key='student_summary')
+
+    @staticmethod
+    def selection_values(sel_course):
+        grade_display = sel_course.get('grade', '') if sel_course.get('grade') is not None else "未录入"
+        return (
+            sel_course.get('course_id', ''),
+            sel_course.get('course_name', ''),
+            sel_course.get('teacher_name', ''),
+            sel_course.get('credits', ''),
+            grade_display,
+            sel_course.get('selection_date', '')
+        )
+
+    def patch_student_selections(self, student_id, rows, dropped_course_ids):
+        """变更日志同步：只改动已选课程列表中受影响的行，并重新读取学分汇总"""
+        if student_id != self.get_selected_student_id_from_combo():
+            return  # 读取期间已切换到其他学生
+        tree = self.student_selections_tree
+        for course_id in dropped_course_ids:
+            if tree.exists(str(course_id)):
+                tree.delete(str(course_id))
+        for row in rows:
+            item = str(row['course_id'])
+            if tree.exists(item):
+                tree.item(item, values=self.selection_values(row))
+            else:
+                tree.insert("", tk.END, iid=item, values=self.selection_values(row))
+        self.load_student_summary(student_id)
+
+    def show_student_summary(self, summary):
+        if not summary:
+            self.student_summary_var.set('')
+            return
+        average = summary['average_grade'] if summary['average_grade'] is not None else "无"
+        self.student_summary_var.set(f"已选 {summary['course_count']} 门，共 {summary['total_credits']} 学分；"
+                                     f"已出成绩 {summary['graded_credits']} 学分，加权平均分 {average}")
 
     def process_student_select_course(self):
         student_id = self.get_selected_student_id_from_combo()
@@ -575,17 +896,30 @@ class StudentCourseApp:
         if not course_id:
             messagebox.showwarning("操作无效", "请选择要选修的课程。", parent=self.selection_tab)
             return
-        try:
-            if backend.select_course(student_id, course_id):
+        def done(ok):
+            if ok:
                 messagebox.showinfo("成功", "选课成功！", parent=self.selection_tab)
-                self.load_student_selections_for_selected_student() 
-                self.load_courses() 
+                self.after_write(('selections', 'courses'), '选课')
             else:
-                messagebox.showerror("失败", "选课失败。\n可能原因：学生已选此课程，或数据库操作错误。", parent=self.selection_tab)
-        except AttributeError as ae:
-            messagebox.showerror("后端函数错误", f"调用 backend.select_course 时出错: {ae}\n请确保该函数已正确定义。", parent=self.selection_tab)
-        except Exception as e:
-            messagebox.showerror("操作失败", f"选课时发生错误: {e}", parent=self.selection_tab)
+                messagebox.showerror("失败", "选课失败。\n可能原因：学生已选此课程、课程已满，或数据库操作错误。", parent=self.selection_tab)
+        self.run_backend(backend.select_course, student_id, course_id,
+                         on_success=done, error_title="选课失败", parent=self.selection_tab)
+
+    def process_join_waitlist(self):
+        student_id = self.get_selected_student_id_from_combo()
+        course_id = self.get_selected_course_id_from_combo()
+        if not student_id or not course_id:
+            messagebox.showwarning("操作无效", "请先选择学生和课程。", parent=self.selection_tab)
+            return
+        def done(position):
+            if position:
+                messagebox.showinfo("成功", f"已加入候补队列，当前排在第 {position} 位。\n有名额空出时将按顺序自动选入。",
+                                    parent=self.selection_tab)
+            else:
+                messagebox.showerror("失败", "加入候补失败。\n可能原因：课程尚有名额、学生已选此课程或已在候补队列中。",
+                                     parent=self.selection_tab)
+        self.run_backend(backend.join_waitlist, student_id, course_id,
+                         on_success=done, error_title="加入候补失败", parent=self.selection_tab)
 
     def process_student_drop_course(self):
         selected_item_in_tree = self.student_selections_tree.focus()
@@ -601,17 +935,14 @@ class StudentCourseApp:
         course_name_to_drop = selected_course_data[1]
         student_display_name = self.sel_student_combo_var.get()
         if messagebox.askyesno("确认退课", f"您确定要为学生 '{student_display_name}' 退选课程 '{course_name_to_drop}' (ID: {course_id_to_drop}) 吗？", parent=self.selection_tab):
-            try:
-                if backend.drop_course(student_id, course_id_to_drop):
+            def done(ok):
+                if ok:
                     messagebox.showinfo("成功", "退课成功！", parent=self.selection_tab)
-                    self.load_student_selections_for_selected_student() 
-                    self.load_courses() 
+                    self.after_write(('selections', 'courses'), '退课')
                 else:
                     messagebox.showerror("失败", "退课失败。", parent=self.selection_tab)
-            except AttributeError as ae:
-                messagebox.showerror("后端函数错误", f"调用 backend.drop_course 时出错: {ae}\n请确保该函数已正确定义。", parent=self.selection_tab)
-            except Exception as e:
-                messagebox.showerror("操作失败", f"退课时发生错误: {e}", parent=self.selection_tab)
+            self.run_backend(backend.drop_course, student_id, course_id_to_drop,
+                             on_success=done, error_title="退课失败", parent=self.selection_tab)
 
     def open_grade_entry_window(self):
         selected_item_in_tree = self.student_selections_tree.focus()
@@ -665,18 +996,172 @@ class StudentCourseApp:
             except ValueError:
                 messagebox.showwarning("输入错误", "成绩必须是有效的数字。", parent=self.grade_entry_win)
                 return
-        try:
-            if backend.record_grade(student_id, course_id, grade):
-                messagebox.showinfo("成功", "成绩保存成功！", parent=self.grade_entry_win)
-                self.grade_entry_win.destroy()
-                self.load_student_selections_for_selected_student() 
+        win = self.grade_entry_win
+        def done(ok):
+            if ok:
+                messagebox.showinfo("成功", "成绩保存成功！", parent=win)
+                win.destroy()
+                self.after_write(('selections',), '录入成绩')
                 self.load_grade_audit_logs() # 成绩变更后刷新审计日志
             else:
-                messagebox.showerror("失败", "保存成绩失败。", parent=self.grade_entry_win)
-        except AttributeError as ae:
-            messagebox.showerror("后端函数错误", f"调用 backend.record_grade 时出错: {ae}\n请确保该函数已正确定义。", parent=self.grade_entry_win)
-        except Exception as e:
-            messagebox.showerror("操作失败", f"保存成绩时发生错误: {e}", parent=self.grade_entry_win)
+                messagebox.showerror("失败", "保存成绩失败。", parent=win)
+        self.run_backend(backend.record_grade, student_id, course_id, grade,
+                         on_success=done, error_title="保存成绩失败", parent=win)
+
+    # 批量录入结果的显示文字
+    ROSTER_OUTCOME_TEXT = {
+        backend.GRADE_OK: "已保存",
+        backend.GRADE_UNCHANGED: "未变化",
+        backend.GRADE_NOT_ENROLLED: "未选此课",
+        backend.GRADE_INVALID: "成绩无效",
+        backend.GRADE_ERROR: "保存失败",
+    }
+
+    def open_course_roster_window(self):
+        """按课程的选课名单录入成绩：在表格中逐行填写，最后一次提交"""
+        course_id = self.get_selected_course_id_from_combo()
+        if not course_id:
+            messagebox.showwarning("操作无效", "请先在上方选择一门课程。", parent=self.selection_tab)
+            return
+        self.roster_course_id = course_id
+        self.roster_edits = {}  # student_id -> 新成绩文本 (空串表示清除成绩)
+        self.roster_win = tk.Toplevel(self.root)
+        self.roster_win.title(f"成绩录入 - {self.sel_available_course_combo_var.get()}")
+        self.roster_win.geometry("600x520")
+        self.roster_win.transient(self.root)
+
+        roster_frame = ttk.Frame(self.roster_win, padding="10")
+        roster_frame.pack(fill=tk.BOTH, expand=True)
+        self.roster_tree = ttk.Treeview(roster_frame, columns=("student_id", "name", "grade", "new_grade", "result"), show="headings")
+        self.roster_tree.heading("student_id", text="学生ID")
+        self.roster_tree.heading("name", text="姓名")
+        self.roster_tree.heading("grade", text="当前成绩")
+        self.roster_tree.heading("new_grade", text="新成绩")
+        self.roster_tree.heading("result", text="结果")
+        self.roster_tree.column("student_id", width=70, anchor=tk.CENTER, stretch=tk.NO)
+        self.roster_tree.column("name", width=150, stretch=tk.YES)
+        self.roster_tree.column("grade", width=90, anchor=tk.CENTER, stretch=tk.NO)
+        self.roster_tree.column("new_grade", width=90, anchor=tk.CENTER, stretch=tk.NO)
+        self.roster_tree.column("result", width=90, anchor=tk.CENTER, stretch=tk.NO)
+        self.roster_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        roster_scrollbar = ttk.Scrollbar(roster_frame, orient=tk.VERTICAL, command=self.roster_tree.yview)
+        self.roster_tree.configure(yscroll=roster_scrollbar.set)
+        roster_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.roster_tree.bind("<Double-1>", lambda e: self.edit_roster_cell(self.roster_tree.identify_row(e.y)))
+        self.roster_tree.bind("<Return>", lambda e: self.edit_roster_cell(self.roster_tree.focus()))
+
+        roster_action_frame = ttk.Frame(self.roster_win, padding="10")
+        roster_action_frame.pack(fill=tk.X)
+        ttk.Label(roster_action_frame, text="双击或回车编辑新成绩，回车跳到下一行；清空表示清除成绩").pack(side=tk.LEFT)
+        ttk.Button(roster_action_frame, text="关闭", command=self.roster_win.destroy).pack(side=tk.RIGHT, padx=5)
+        self.roster_submit_button = ttk.Button(roster_action_frame, text="提交全部成绩", command=self.submit_roster_grades)
+        self.roster_submit_button.pack(side=tk.RIGHT, padx=5)
+
+        self.run_backend(backend.get_course_enrolled_students, course_id, backend.ROW_TUPLE, on_success=self.show_course_roster,
+                         error_title="加载选课名单失败", parent=self.roster_win, key='course_roster')
+
+    def show_course_roster(self, students):
+        if not self.roster_win.winfo_exists():
+            return
+        self.roster_tree.delete(*self.roster_tree.get_children())
+        for student in sorted(students or [], key=lambda s: s['student_id']):
+            grade = student.get('grade')
+            self.roster_tree.insert("", tk.END, iid=str(student['student_id']), values=(
+                student['student_id'], student.get('student_name', ''),
+                grade if grade is not None else "未录入", "", ""))
+        children = self.roster_tree.get_children()
+        if children:
+            self.roster_tree.focus(children[0])
+            self.roster_tree.selection_set(children[0])
+            self.roster_tree.focus_set()
+
+    def edit_roster_cell(self, item):
+        """在“新成绩”单元格上放一个输入框；回车保存并编辑下一行，Esc 取消"""
+        if not item:
+            return
+        bbox = self.roster_tree.bbox(item, "new_grade")
+        if not bbox:
+            self.roster_tree.see(item)
+            self.roster_tree.update_idletasks()
+            bbox = self.roster_tree.bbox(item, "new_grade")
+            if not bbox:
+                return
+        x, y, width, height = bbox
+        entry = ttk.Entry(self.roster_tree, justify=tk.CENTER)
+        entry.place(x=x, y=y, width=width, height=height)
+        entry.insert(0, self.roster_edits.get(int(item), self.roster_tree.set(item, "grade").replace("未录入", "")))
+        entry.select_range(0, tk.END)
+        entry.focus_set()
+        finished = []
+
+        def save(move_next):
+            if finished:
+                return
+            finished.append(True)
+            self.set_roster_edit(item, entry.get().strip())
+            entry.destroy()
+            following = self.roster_tree.next(item)
+            if move_next and following:
+                self.roster_tree.selection_set(following)
+                self.roster_tree.focus(following)
+                self.roster_tree.see(following)
+                self.edit_roster_cell(following)
+            else:
+                self.roster_tree.focus_set()
+
+        def cancel():
+            finished.append(True)
+            entry.destroy()
+            self.roster_tree.focus_set()
+        entry.bind("<Return>", lambda e: save(True))
+        entry.bind("<FocusOut>", lambda e: save(False))
+        entry.bind("<Escape>", lambda e: cancel())
+
+    def set_roster_edit(self, item, text):
+        current = self.roster_tree.set(item, "grade").replace("未录入", "")
+        if text == current:
+            self.roster_edits.pop(int(item), None)
+            self.roster_tree.set(item, "new_grade", "")
+        else:
+            self.roster_edits[int(item)] = text
+            self.roster_tree.set(item, "new_grade", text if text else "(清除)")
+        self.roster_tree.set(item, "result", "")
+
+    def submit_roster_grades(self):
+        """把所有修改过的成绩一次提交给 backend.record_grades (同一事务)"""
+        if not self.roster_edits:
+            messagebox.showinfo("提示", "没有修改任何成绩。", parent=self.roster_win)
+            return
+        grades = {student_id: (text or None) for student_id, text in self.roster_edits.items()}
+        self.roster_submit_button.configure(state=tk.DISABLED)
+        self.run_backend(backend.record_grades, self.roster_course_id, grades,
+                         on_success=lambda outcomes: self.show_roster_results(grades, outcomes),
+                         error_title="保存成绩失败", parent=self.roster_win)
+
+    def show_roster_results(self, grades, outcomes):
+        if not self.roster_win.winfo_exists():
+            return
+        self.roster_submit_button.configure(state=tk.NORMAL)
+        saved = 0
+        for student_id, outcome in outcomes.items():
+            item = str(student_id)
+            if not self.roster_tree.exists(item):
+                continue
+            self.roster_tree.set(item, "result", self.ROSTER_OUTCOME_TEXT.get(outcome, outcome))
+            if outcome in (backend.GRADE_OK, backend.GRADE_UNCHANGED):
+                grade = grades[student_id]
+                self.roster_tree.set(item, "grade", grade if grade is not None else "未录入")
+                self.roster_tree.set(item, "new_grade", "")
+                self.roster_edits.pop(student_id, None)
+                saved += outcome == backend.GRADE_OK
+        failed = len(self.roster_edits)
+        if failed:
+            messagebox.showwarning("部分未保存", f"已保存 {saved} 条成绩，{failed} 条未保存，请查看“结果”列。", parent=self.roster_win)
+        else:
+            messagebox.showinfo("成功", f"已保存 {saved} 条成绩。", parent=self.roster_win)
+        if saved:
+            self.after_write(('selections',), '录入成绩')
+            self.load_grade_audit_logs() # 成绩变更后刷新审计日志
 
     #-------------------------------------------------------------------
     # 成绩审计日志相关 Widgets 和方法
@@ -686,8 +1171,21 @@ class StudentCourseApp:
         audit_action_frame = ttk.Frame(self.audit_log_tab, padding="10")
         audit_action_frame.pack(fill=tk.X, pady=(0,10))
 
-        self.refresh_audit_button = ttk.Button(audit_action_frame, text="刷新日志", command=self.load_grade_audit_logs)
+        # 筛选条件：留空表示不限；时间格式 YYYY-MM-DD 或 YYYY-MM-DD HH:MM，结束日期当天包含在内
+        self.audit_filter_vars = {}
+        for key, label, width in (('student_id', "学生ID:", 8), ('course_id', "课程ID:", 8),
+                                  ('changed_by', "操作者:", 12), ('since', "从:", 16), ('until', "到:", 16)):
+            ttk.Label(audit_action_frame, text=label).pack(side=tk.LEFT, padx=(5, 0))
+            var = tk.StringVar()
+            entry = ttk.Entry(audit_action_frame, textvariable=var, width=width)
+            entry.pack(side=tk.LEFT, padx=(0, 5))
+            entry.bind("<Return>", lambda event: self.load_grade_audit_logs())
+            self.audit_filter_vars[key] = var
+
+        self.refresh_audit_button = ttk.Button(audit_action_frame, text="查询/刷新", command=self.load_grade_audit_logs)
         self.refresh_audit_button.pack(side=tk.LEFT, padx=5)
+        self.clear_audit_filter_button = ttk.Button(audit_action_frame, text="清除筛选", command=self.clear_audit_filters)
+        self.clear_audit_filter_button.pack(side=tk.LEFT, padx=5)
 
         # --- 审计日志列表显示区域 ---
         audit_list_frame = ttk.LabelFrame(self.audit_log_tab, text="成绩变更记录", padding="10")
@@ -714,35 +1212,144 @@ class StudentCourseApp:
 
         self.audit_log_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         audit_scrollbar = ttk.Scrollbar(audit_list_frame, orient=tk.VERTICAL, command=self.audit_log_tree.yview)
-        self.audit_log_tree.configure(yscroll=audit_scrollbar.set)
         audit_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # 虚拟列表：按 (变更时间, 日志ID) 游标向更早的记录翻页，滚动到底部时才查询下一页
+        self.audit_filters = {}
+        self.audit_list = VirtualTreeList(
+            self.audit_log_tree, audit_scrollbar,
+            fetch_page=lambda after, limit: backend.get_grade_audit_page(after, limit, row_format=backend.ROW_TUPLE,
+                                                                         **self.audit_filters),
+            row_key=backend.audit_cursor,
+            row_values=self.audit_log_values,
+            page_size=self.VIRTUAL_LIST_PAGE_SIZE, max_pages=self.VIRTUAL_LIST_PAGES,
+            submit=self.dispatcher.submit,
+            on_error=lambda e: messagebox.showerror(
+                "加载审计日志失败", f"发生错误: {e}\n请确保数据库连接正常且backend.py中的函数无误。"))
+
+    @staticmethod
+    def parse_audit_time(text, end_of_day=False):
+        """解析筛选时间；只有日期时 end_of_day=True 返回次日零点，使结束日期当天包含在内"""
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+            try:
+                return datetime.strptime(text, fmt)
+            except ValueError:
+                pass
+        day = datetime.strptime(text, "%Y-%m-%d")
+        return day + timedelta(days=1) if end_of_day else day
+
+    def read_audit_filters(self):
+        """读取筛选输入框，返回 get_grade_audit_page 的筛选参数；输入有误时提示并返回 None"""
+        values = {key: var.get().strip() for key, var in self.audit_filter_vars.items()}
+        filters = {}
+        try:
+            for key in ('student_id', 'course_id'):
+                if values[key]:
+                    filters[key] = int(values[key])
+        except ValueError:
+            messagebox.showwarning("输入错误", "学生ID和课程ID必须是整数。")
+            return None
+        try:
+            if values['since']:
+                filters['since'] = self.parse_audit_time(values['since'])
+            if values['until']:
+                filters['until'] = self.parse_audit_time(values['until'], end_of_day=True)
+        except ValueError:
+            messagebox.showwarning("输入错误", "时间格式应为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM。")
+            return None
+        if values['changed_by']:
+            filters['changed_by'] = values['changed_by']
+        return filters
+
+    def clear_audit_filters(self):
+        for var in self.audit_filter_vars.values():
+            var.set("")
+        self.load_grade_audit_logs()
 
     def load_grade_audit_logs(self):
-        """从数据库加载成绩审计日志并显示"""
-        for item in self.audit_log_tree.get_children():
-            self.audit_log_tree.delete(item)
-        try:
-            # 假设 backend.py 中有 get_grade_audit_logs 函数
-            # 该函数应返回包含 student_name 和 course_name (通过JOIN获取) 的日志记录
-            audit_data = backend.get_grade_audit_logs() 
-            if audit_data:
-                for log in audit_data:
-                    old_grade_display = log.get('old_grade', '') if log.get('old_grade') is not None else "N/A"
-                    new_grade_display = log.get('new_grade', '') if log.get('new_grade') is not None else "N/A"
-                    self.audit_log_tree.insert("", tk.END, values=(
-                        log.get('log_id', ''),
-                        log.get('selection_id', ''), # 假设后端返回此字段
-                        log.get('student_name', f"学生ID:{log.get('student_id','未知')}"), # 优先显示姓名
-                        log.get('course_name', f"课程ID:{log.get('course_id','未知')}"), # 优先显示课程名
-                        old_grade_display,
-                        new_grade_display,
-                        log.get('changed_by', 'DB_TRIGGER'),
-                        log.get('change_timestamp', '')
-                    ))
-        except AttributeError as ae:
-             messagebox.showerror("后端函数错误", f"调用 backend.py 中的函数时出错: {ae}\n请确保 get_grade_audit_logs 函数已正确定义。")
-        except Exception as e:
-            messagebox.showerror("加载审计日志失败", f"发生错误: {e}\n请确保数据库连接正常且相关函数无误。")
+        """按当前筛选条件从第一页重新加载成绩审计日志"""
+        filters = self.read_audit_filters()
+        if filters is None:
+            return
+        self.audit_filters = filters
+        self.audit_list.reload()
+
+    @staticmethod
+    def audit_log_values(log):
+        old_grade_display = log.get('old_grade', '') if log.get('old_grade') is not None else "N/A"
+        new_grade_display = log.get('new_grade', '') if log.get('new_grade') is not None else "N/A"
+        return (
+            log.get('log_id', ''),
+            log.get('selection_id', ''),
+            log.get('student_name') or f"学生ID:{log.get('student_id') or '未知'}", # 学生被删除时显示ID
+            log.get('course_name') or f"课程ID:{log.get('course_id') or '未知'}", # 课程被删除时显示ID
+            old_grade_display,
+            new_grade_display,
+            log.get('changed_by') or 'DB_TRIGGER',
+            log.get('change_timestamp', '')
+        )
+
+    #-------------------------------------------------------------------
+    # 成绩分析相关 Widgets 和方法
+    #-------------------------------------------------------------------
+    def create_analytics_widgets(self):
+        # --- 操作区域 (成绩分析) ---
+        analytics_action_frame = ttk.Frame(self.analytics_tab, padding="10")
+        analytics_action_frame.pack(fill=tk.X, pady=(0,10))
+
+        ttk.Label(analytics_action_frame, text="分组方式:").pack(side=tk.LEFT, padx=5)
+        self.analytics_group_var = tk.StringVar(value='按课程')
+        self.analytics_group_combo = ttk.Combobox(analytics_action_frame, textvariable=self.analytics_group_var,
+                                                  values=list(analytics.GROUPINGS), state="readonly", width=12)
+        self.analytics_group_combo.pack(side=tk.LEFT, padx=5)
+        self.analytics_button = ttk.Button(analytics_action_frame, text="计算统计", command=self.load_grade_analytics)
+        self.analytics_button.pack(side=tk.LEFT, padx=5)
+        self.analytics_overall_var = tk.StringVar(value="")
+        ttk.Label(analytics_action_frame, textvariable=self.analytics_overall_var).pack(side=tk.LEFT, padx=15)
+
+        # --- 统计结果显示区域 ---
+        analytics_list_frame = ttk.LabelFrame(self.analytics_tab, text="成绩统计 (分数段: <60 / 60-70 / 70-80 / 80-90 / 90-100)", padding="10")
+        analytics_list_frame.pack(fill=tk.BOTH, expand=True)
+
+        columns = ("group", "count", "mean", "weighted", "median", "std", "min", "max", "p25", "p75", "p90", "hist")
+        headings = ("分组", "人数", "平均分", "学分加权", "中位数", "标准差", "最低", "最高", "P25", "P75", "P90", "分数段人数")
+        self.analytics_tree = ttk.Treeview(analytics_list_frame, columns=columns, show="headings")
+        for column, heading in zip(columns, headings):
+            self.analytics_tree.heading(column, text=heading)
+            self.analytics_tree.column(column, width=60, anchor=tk.CENTER, stretch=tk.NO)
+        self.analytics_tree.column("group", width=180, anchor=tk.W, stretch=tk.YES)
+        self.analytics_tree.column("hist", width=160, stretch=tk.YES)
+
+        self.analytics_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        analytics_scrollbar = ttk.Scrollbar(analytics_list_frame, orient=tk.VERTICAL, command=self.analytics_tree.yview)
+        self.analytics_tree.configure(yscroll=analytics_scrollbar.set)
+        analytics_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def load_grade_analytics(self):
+        """一次读取全部成绩，在后台线程中按所选方式分组统计"""
+        grouping = self.analytics_group_var.get()
+        stats_func, _ = analytics.GROUPINGS[grouping]
+
+        def compute():
+            data = analytics.load_grades()
+            if data is None:  # 原因已由 backend.log 输出；抛出异常由 run_backend 弹出 error_title
+                raise RuntimeError("读取成绩数据失败")
+            return stats_func(data), analytics.overall_stats(data)
+        self.run_backend(compute, on_success=lambda result: self.show_grade_analytics(grouping, *result),
+                         error_title="成绩统计失败", key='analytics')
+
+    def show_grade_analytics(self, grouping, rows, overall):
+        self.analytics_tree.delete(*self.analytics_tree.get_children())
+        _, label = analytics.GROUPINGS[grouping]
+        for row in rows:
+            self.analytics_tree.insert("", tk.END, values=(
+                label(row), row['count'], row['mean'], row['weighted_mean'] if row['weighted_mean'] is not None else "N/A",
+                row['p50'], row['std'], row['min'], row['max'], row['p25'], row['p75'], row['p90'],
+                " / ".join(str(n) for n in row['histogram'])
+            ))
+        if overall:
+            self.analytics_overall_var.set(f"全部: {overall['count']} 条成绩, 平均分 {overall['mean']}, 中位数 {overall['p50']}")
+        else:
+            self.analytics_overall_var.set("暂无成绩数据")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,378 @@
+"""backend 调用耗时统计与慢查询记录
+
+enable(backend) 把 backend 中的公开函数替换为带计时的包装。每次调用记录调用次数、异常次数和
+总耗时，以及其中借连接 (connect)、执行并读取查询 (query)、提交 (commit) 各用了多少时间、返回
+了多少行，累计到进程内的直方图中，可以导出为 JSON (snapshot) 或 Prometheus 文本格式
+(to_prometheus)。一次调用超过 slow_threshold 秒时，把其中最慢的一条 SQL、参数和 EXPLAIN 结果
+记入慢查询列表。disable() 恢复原函数，未启用时没有任何额外开销。
+
+用法:
+    import backend, metrics
+    metrics.enable(backend, slow_threshold=0.2)
+    ...
+    print(metrics.to_prometheus())
+    metrics.slow_queries()
+也可以设置环境变量 SCS_METRICS=1 (慢查询阈值 SCS_SLOW_QUERY_MS，默认 200)，导入 backend 时自动启用。
+"""
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from storage_engines import DB_ERRORS
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+PHASES = ('total', 'connect', 'query', 'commit')
+# 不包装的公开函数：配置/统计/日志工具和纯 SQL 拼接函数没有数据库开销；run_steps 的耗时已计入调用它的公开函数
+SKIP_FUNCTIONS = {
+    'get_db_connection', 'get_engine', 'get_pool', 'close_pool', 'use_engine', 'get_pool_stats',
+    'set_cache_enabled', 'clear_caches', 'get_cache_stats', 'set_logging', 'log', 'run_steps',
+    'audit_cursor', 'build_grade_audit_query', 'merge_audit_pages', 'id_chunks', 'group_rows',
+}
+# 可以 EXPLAIN 的语句
+EXPLAIN_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class Histogram:
+    """固定桶的直方图；counts[i] 为落在 (buckets[i-1], buckets[i]] 内的次数，最后一格为 +Inf"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(上界, 累计次数)]，与 Prometheus 的 le 桶一致"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': round(self.sum, 6),
+                'buckets': {_format_bound(bound): count for bound, count in self.cumulative()}}
+
+
+class FunctionStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = {phase: Histogram(LATENCY_BUCKETS) for phase in PHASES}
+        self.rows = Histogram(ROW_BUCKETS)
+
+
+class _Call:
+    """一次函数调用期间累计的各阶段耗时"""
+    __slots__ = ('name', 'connect', 'query', 'commit', 'rows', 'slowest')
+
+    def __init__(self, name):
+        self.name = name
+        self.connect = self.query = self.commit = 0.0
+        self.rows = 0
+        self.slowest = None  # (sql, params, 秒)
+
+    def add_statement(self, sql, params, elapsed):
+        self.query += elapsed
+        if self.slowest is None or elapsed > self.slowest[2]:
+            self.slowest = (sql, params, elapsed)
+
+
+_lock = threading.Lock()
+_stats = {}             # 函数名 -> FunctionStats
+_slow_log = deque(maxlen=100)
+_config = {'slow_threshold': 0.2}
+_originals = {}         # 被替换的原函数，disable() 时恢复
+_module = None
+
+
+# --- 连接与游标代理：把耗时记到借出连接时所在的调用上 ---
+class _TimedCursor:
+    def __init__(self, cursor, call):
+        self._cursor = cursor
+        self._call = call
+
+    def execute(self, sql, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, *args, **kwargs)
+        finally:
+            self._call.add_statement(sql, args[0] if args else kwargs.get('params'), time.perf_counter() - start)
+
+    def executemany(self, sql, seq_params, *args, **kwargs):
+        seq_params = list(seq_params)
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_params, *args, **kwargs)
+        finally:
+            # 记录第一组参数：EXPLAIN 时按单条语句执行，参数个数要与占位符一致
+            self._call.add_statement(sql, seq_params[0] if seq_params else None, time.perf_counter() - start)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        self._call.query += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        self._call.rows += row is not None
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._fetch(self._cursor.fetchmany, *args)
+        self._call.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._call.rows += len(rows)
+        return rows
+
+    def __getattr__(self, name):
+        # rowcount, lastrowid, close ... 直接转发
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    def __init__(self, conn, call):
+        self._conn = conn
+        self._call = call
+
+    def cursor(self, *args, **kwargs):
+        return _TimedCursor(self._conn.cursor(*args, **kwargs), self._call)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            self._call.commit += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+# --- 调用上下文 ---
+_local = threading.local()
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+def _timed_get_db_connection(original):
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        if not stack:
+            return original(*args, **kwargs)  # 不在被统计的函数内 (例如脚本直接借连接)
+        call = stack[-1]
+        start = time.perf_counter()
+        conn, cursor = original(*args, **kwargs)
+        call.connect += time.perf_counter() - start
+        if conn is None:
+            return conn, cursor
+        return _TimedConnection(conn, call), _TimedCursor(cursor, call)
+    return wrapper
+
+def _finish(call, elapsed, failed):
+    with _lock:
+        stats = _stats.get(call.name)
+        if stats is None:
+            stats = _stats[call.name] = FunctionStats()
+        stats.calls += 1
+        stats.errors += failed
+        for phase, value in zip(PHASES, (elapsed, call.connect, call.query, call.commit)):
+            stats.seconds[phase].observe(value)
+        stats.rows.observe(call.rows)
+    if elapsed >= _config['slow_threshold'] and call.slowest is not None:
+        _record_slow(call, elapsed)
+
+def _instrument(name, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call = _Call(name)
+        stack = _stack()
+        stack.append(call)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+        finally:
+            stack.pop()
+            if failed:
+                _finish(call, time.perf_counter() - start, True)
+        if inspect.isgenerator(result):
+            # 流式查询：SQL 在迭代时才执行，按每次取下一行的时间累计
+            return _timed_generator(result, call, time.perf_counter() - start)
+        _finish(call, time.perf_counter() - start, False)
+        return result
+    return wrapper
+
+def _timed_generator(gen, call, elapsed):
+    stack = _stack()
+    failed = False
+    try:
+        while True:
+            stack.append(call)
+            start = time.perf_counter()
+            try:
+                item = next(gen)
+            except StopIteration:
+                break
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed += time.perf_counter() - start
+                stack.pop()
+            yield item
+    finally:
+        gen.close()
+        _finish(call, elapsed, failed)
+
+
+# --- 慢查询 ---
+def _explain(sql, params):
+    """在单独的连接上对 sql 执行 EXPLAIN (SQLite 为 EXPLAIN QUERY PLAN)，返回计划行或错误说明"""
+    words = sql.split(None, 1)
+    if not words or words[0].upper() not in EXPLAIN_STATEMENTS:
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if _module.get_engine().name == 'sqlite' else "EXPLAIN "
+    conn, cursor = _originals['get_db_connection']()
+    if not conn:
+        return None
+    try:
+        cursor.execute(prefix + sql, params or ())
+        return [dict(row) for row in cursor.fetchall()]
+    except DB_ERRORS as err:
+        return f"EXPLAIN 失败: {err}"
+    finally:
+        cursor.close()
+        conn.close()
+
+def _record_slow(call, elapsed):
+    sql, params, statement_seconds = call.slowest
+    entry = {
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'function': call.name,
+        'elapsed_s': round(elapsed, 6),
+        'connect_s': round(call.connect, 6),
+        'query_s': round(call.query, 6),
+        'commit_s': round(call.commit, 6),
+        'rows': call.rows,
+        'sql': " ".join(sql.split()),
+        'params': params,
+        'statement_s': round(statement_seconds, 6),
+        'explain': _explain(sql, params) if _config.get('explain', True) else None,
+    }
+    with _lock:
+        _slow_log.append(entry)
+
+
+# --- 开关 ---
+def enable(module, slow_threshold=0.2, slow_log_size=100, explain=True):
+    """包装 module (backend) 中的公开函数；重复调用只更新配置"""
+    global _module, _slow_log
+    _config.update(slow_threshold=slow_threshold, explain=explain)
+    if _slow_log.maxlen != slow_log_size:
+        with _lock:
+            _slow_log = deque(_slow_log, maxlen=slow_log_size)
+    if _originals:
+        return
+    _module = module
+    for name, func in list(vars(module).items()):
+        # *_steps 是由 run_steps 驱动的步骤生成器，耗时算在调用它的公开函数里
+        if (inspect.isfunction(func) and func.__module__ == module.__name__ and not name.startswith(('_', 'print_'))
+                and not name.endswith('_steps') and name not in SKIP_FUNCTIONS):
+            _originals[name] = func
+            setattr(module, name, _instrument(name, func))
+    _originals['get_db_connection'] = module.get_db_connection
+    module.get_db_connection = _timed_get_db_connection(module.get_db_connection)
+
+def disable():
+    """恢复被包装的原函数 (已有的统计保留)"""
+    global _module
+    for name, func in _originals.items():
+        setattr(_module, name, func)
+    _originals.clear()
+    _module = None
+
+def is_enabled():
+    return bool(_originals)
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _slow_log.clear()
+
+
+# --- 导出 ---
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+def slow_queries():
+    with _lock:
+        return list(_slow_log)
+
+def snapshot():
+    """所有统计的 dict，可直接 json.dumps"""
+    with _lock:
+        functions = {}
+        for name, stats in sorted(_stats.items()):
+            functions[name] = {
+                'calls': stats.calls,
+                'errors': stats.errors,
+                'seconds': {phase: histogram.to_dict() for phase, histogram in stats.seconds.items()},
+                'rows': stats.rows.to_dict(),
+            }
+        return {'slow_threshold_s': _config['slow_threshold'], 'functions': functions, 'slow_queries': list(_slow_log)}
+
+def dump_json(path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2, default=str)
+
+def to_prometheus(prefix='scs_backend'):
+    """Prometheus 文本格式 (exposition format 0.0.4)"""
+    lines = [
+        f"# HELP {prefix}_calls_total backend 函数调用次数",
+        f"# TYPE {prefix}_calls_total counter",
+    ]
+    with _lock:
+        items = sorted(_stats.items())
+        for name, stats in items:
+            lines.append(f'{prefix}_calls_total{{function="{name}"}} {stats.calls}')
+        lines += [f"# HELP {prefix}_errors_total backend 函数抛出异常的次数", f"# TYPE {prefix}_errors_total counter"]
+        for name, stats in items:
+            lines.append(f'{prefix}_errors_total{{function="{name}"}} {stats.errors}')
+        lines += [f"# HELP {prefix}_seconds backend 函数耗时，phase 为 total/connect/query/commit",
+                  f"# TYPE {prefix}_seconds histogram"]
+        for name, stats in items:
+            for phase, histogram in stats.seconds.items():
+                lines += _histogram_lines(f"{prefix}_seconds", f'function="{name}",phase="{phase}"', histogram)
+        lines += [f"# HELP {prefix}_rows 每次调用读取的行数", f"# TYPE {prefix}_rows histogram"]
+        for name, stats in items:
+            lines += _histogram_lines(f"{prefix}_rows", f'function="{name}"', stats.rows)
+    return "\n".join(lines) + "\n"
+
+def _histogram_lines(metric, labels, histogram):
+    lines = [f'{metric}_bucket{{{labels},le="{_format_bound(bound)}"}} {count}'
+             for bound, count in histogram.cumulative()]
+    lines.append(f"{metric}_sum{{{labels}}} {histogram.sum:.6f}")
+    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+    return lines
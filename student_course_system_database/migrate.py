@@ -0,0 +1,145 @@
+"""数据库迁移脚本
+
+student_course_system.sql (SQLite 为 sqlite_schema.sql) 是初始结构 (版本 0)，之后的结构变更按版本号
+放在 migrations/<引擎>/NNN_说明.sql 中，两个引擎的同一版本号对应同一变更。
+已执行的版本记录在 schema_migrations 表里，重复运行只会执行新增的迁移。
+SQLite 数据库在首次连接时会自动建表并执行迁移，无需手动运行本脚本。
+
+用法:
+    python migrate.py            # 执行所有未执行的迁移
+    python migrate.py --status   # 查看各迁移的执行状态
+    python migrate.py --to 3     # 只迁移到版本 3
+"""
+import argparse
+import os
+import re
+
+import backend
+
+MIGRATIONS_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+_FILENAME_RE = re.compile(r'^(\d+)_(.+)\.sql$')
+
+
+def split_sql_script(text):
+    """把 SQL 脚本拆成单条语句；支持 mysql 客户端的 DELIMITER 指令 (触发器、存储过程)"""
+    statements = []
+    delimiter = ';'
+    buffer = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not buffer and (not stripped or stripped.startswith('--')):
+            continue
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split(None, 1)[1]
+            continue
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(buffer).rstrip()
+            statement = statement[:len(statement) - len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            buffer = []
+    tail = '\n'.join(buffer).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def migrations_dir(engine_name=None):
+    """某个存储引擎的迁移目录，默认取 backend 当前使用的引擎"""
+    return os.path.join(MIGRATIONS_ROOT, engine_name or backend.DB_ENGINE)
+
+
+def discover_migrations(directory=None):
+    """返回 [(版本号, 名称, 路径)]，按版本号排序"""
+    directory = directory or migrations_dir()
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise SystemExit(f"迁移版本号重复: {versions}")
+    return migrations
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def apply_migrations(conn, cursor, target=None, directory=None):
+    """在给定连接上执行所有未执行 (且版本号不超过 target) 的迁移，返回本次执行的版本号列表"""
+    executed = []
+    ensure_migrations_table(cursor)
+    conn.commit()
+    done = applied_versions(cursor)
+    for version, name, path in discover_migrations(directory):
+        if version in done or (target is not None and version > target):
+            continue
+        with open(path, encoding='utf-8') as f:
+            statements = split_sql_script(f.read())
+        print(f"执行迁移 {version:03d}_{name} ({len(statements)} 条语句)...")
+        # MySQL 的 DDL 会隐式提交，迁移无法整体回滚；失败时停止并保留已执行的版本记录
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+        executed.append(version)
+    return executed
+
+
+def migrate(target=None, directory=None):
+    """通过 backend 的连接池执行迁移"""
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+    try:
+        executed = apply_migrations(conn, cursor, target, directory)
+        if not executed:
+            print("数据库结构已是最新。")
+        return executed
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def print_status(directory=None):
+    conn, cursor = backend.get_db_connection()
+    if not conn:
+        raise SystemExit("无法连接数据库，请检查 backend.DB_CONFIG")
+    try:
+        ensure_migrations_table(cursor)
+        conn.commit()
+        done = applied_versions(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    for version, name, _ in discover_migrations(directory):
+        print(f"{version:03d}  {'已执行' if version in done else '未执行':<4}  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="执行数据库结构迁移")
+    parser.add_argument('--status', action='store_true', help="只显示迁移状态")
+    parser.add_argument('--to', type=int, default=None, help="迁移到指定版本为止")
+    args = parser.parse_args(argv)
+    if args.status:
+        print_status()
+    else:
+        migrate(args.to)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+-- 001: 为选课名单和成绩审计日志的查询路径添加索引
+
+-- get_course_enrolled_students: WHERE course_id = ? 再按 student_id 回表 students
+-- 覆盖索引包含查询需要的 grade、selection_date，不必再回表 selections
+CREATE INDEX idx_selections_course_cover
+    ON selections (course_id, student_id, grade, selection_date);
+
+-- get_grade_audit_logs: ORDER BY change_timestamp DESC, log_id DESC LIMIT n
+-- 反向扫描索引取前 n 条，避免对整张日志表做 filesort
+CREATE INDEX idx_audit_change_ts
+    ON grade_audit_log (change_timestamp, log_id);
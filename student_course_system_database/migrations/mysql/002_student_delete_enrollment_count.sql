@@ -0,0 +1,22 @@
+-- 002: 删除学生时同步减少其所选课程的 enrollment_count
+-- MySQL 的外键级联删除不会执行 selections 上的 trg_after_selection_delete，
+-- 之前删除学生后课程人数一直偏大；SQLite 的级联删除会执行触发器，两个引擎的结果因此不一致。
+
+DELIMITER $$
+CREATE TRIGGER trg_before_student_delete
+BEFORE DELETE ON students
+FOR EACH ROW
+BEGIN
+    -- (student_id, course_id) 唯一，每门课最多匹配一行
+    UPDATE courses c
+    JOIN selections s ON s.course_id = c.course_id
+    SET c.enrollment_count = IF(c.enrollment_count > 0, c.enrollment_count - 1, 0)
+    WHERE s.student_id = OLD.student_id;
+END $$
+DELIMITER ;
+
+-- 修正此前累积的偏差
+UPDATE courses c
+SET c.enrollment_count = (
+    SELECT COUNT(*) FROM selections s WHERE s.course_id = c.course_id
+);
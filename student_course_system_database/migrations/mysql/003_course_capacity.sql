@@ -0,0 +1,27 @@
+-- 003: 课程容量上限，选课时原子地占座，防止热门课程超卖
+-- capacity 为 NULL 表示不限人数。
+--
+-- 原来的 AFTER INSERT 触发器先插入选课 (外键检查对课程行加共享锁)，再更新课程行 (升级为排他锁)；
+-- 大量并发选同一门课时共享锁升级会互相死锁。改为 BEFORE INSERT 触发器，
+-- 先用带条件的 UPDATE 对课程行加排他锁并占座，只锁这一门课的这一行，不影响其他课程。
+-- 插入因重复选课或外键失败时，整条语句 (包括触发器中的 UPDATE) 会一起回滚。
+
+ALTER TABLE courses ADD COLUMN capacity INT NULL DEFAULT NULL COMMENT '容量上限，NULL 表示不限';
+
+DROP TRIGGER IF EXISTS trg_after_selection_insert;
+
+DELIMITER $$
+CREATE TRIGGER trg_before_selection_insert
+BEFORE INSERT ON selections
+FOR EACH ROW
+BEGIN
+    UPDATE courses
+    SET enrollment_count = enrollment_count + 1
+    WHERE course_id = NEW.course_id
+      AND (capacity IS NULL OR enrollment_count < capacity);
+    -- 课程不存在时不报“已满”，交给外键约束报 1452
+    IF ROW_COUNT() = 0 AND EXISTS (SELECT 1 FROM courses WHERE course_id = NEW.course_id) THEN
+        SIGNAL SQLSTATE '45000' SET MYSQL_ERRNO = 45001, MESSAGE_TEXT = 'COURSE_FULL';
+    END IF;
+END $$
+DELIMITER ;
@@ -0,0 +1,16 @@
+-- 004: 课程候补队列 (先进先出)
+-- seq 为课程内连续的排队序号：入队取当前最大值 + 1，出队从头部删除，中途退出时后面的序号依次减 1，
+-- 所以排队位置 = 自己的 seq - 该课程最小的 seq + 1，两次索引查找即可得到，与队列长度无关。
+
+CREATE TABLE IF NOT EXISTS waitlist (
+    waitlist_id INT AUTO_INCREMENT PRIMARY KEY,
+    course_id INT NOT NULL,
+    student_id INT NOT NULL,
+    seq INT NOT NULL,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE,
+    UNIQUE KEY uq_waitlist_student_course (student_id, course_id),
+    -- 不设为唯一索引：中途退出时批量减 1 的过程中会短暂出现重复序号
+    KEY idx_waitlist_course_seq (course_id, seq)
+);
@@ -0,0 +1,117 @@
+-- 005: 学生学分/成绩汇总表，由触发器增量维护
+-- average_grade = weighted_grade_sum / graded_credits (按学分加权的平均分)，查询时直接按主键读取一行。
+-- 汇总与明细是否一致可用 summary_check.py 检查和修复。
+
+CREATE TABLE IF NOT EXISTS student_summary (
+    student_id INT PRIMARY KEY,
+    course_count INT NOT NULL DEFAULT 0,
+    total_credits INT NOT NULL DEFAULT 0,
+    graded_credits INT NOT NULL DEFAULT 0,                  -- 已有成绩的课程学分
+    weighted_grade_sum DECIMAL(12, 2) NOT NULL DEFAULT 0,   -- SUM(grade * credits)，只计已有成绩的课程
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+);
+
+-- 根据现有数据初始化
+INSERT INTO student_summary (student_id, course_count, total_credits, graded_credits, weighted_grade_sum)
+SELECT st.student_id,
+       COUNT(s.selection_id),
+       COALESCE(SUM(COALESCE(c.credits, 0)), 0),
+       COALESCE(SUM(CASE WHEN s.grade IS NULL THEN 0 ELSE COALESCE(c.credits, 0) END), 0),
+       COALESCE(SUM(COALESCE(s.grade, 0) * COALESCE(c.credits, 0)), 0)
+FROM students st
+LEFT JOIN selections s ON s.student_id = st.student_id
+LEFT JOIN courses c ON c.course_id = s.course_id
+GROUP BY st.student_id;
+
+-- 新学生先建一行全零的汇总，之后的选课触发器只需 UPDATE
+DELIMITER $$
+CREATE TRIGGER trg_after_student_insert
+AFTER INSERT ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO student_summary (student_id) VALUES (NEW.student_id);
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_after_selection_summary_insert
+AFTER INSERT ON selections
+FOR EACH ROW
+BEGIN
+    UPDATE student_summary ss
+    JOIN courses c ON c.course_id = NEW.course_id
+    SET ss.course_count = ss.course_count + 1,
+        ss.total_credits = ss.total_credits + COALESCE(c.credits, 0),
+        ss.graded_credits = ss.graded_credits + IF(NEW.grade IS NULL, 0, COALESCE(c.credits, 0)),
+        ss.weighted_grade_sum = ss.weighted_grade_sum + COALESCE(NEW.grade, 0) * COALESCE(c.credits, 0)
+    WHERE ss.student_id = NEW.student_id;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_after_selection_summary_delete
+AFTER DELETE ON selections
+FOR EACH ROW
+BEGIN
+    UPDATE student_summary ss
+    JOIN courses c ON c.course_id = OLD.course_id
+    SET ss.course_count = ss.course_count - 1,
+        ss.total_credits = ss.total_credits - COALESCE(c.credits, 0),
+        ss.graded_credits = ss.graded_credits - IF(OLD.grade IS NULL, 0, COALESCE(c.credits, 0)),
+        ss.weighted_grade_sum = ss.weighted_grade_sum - COALESCE(OLD.grade, 0) * COALESCE(c.credits, 0)
+    WHERE ss.student_id = OLD.student_id;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_after_selection_summary_grade
+AFTER UPDATE ON selections
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.grade <=> NEW.grade) THEN
+        UPDATE student_summary ss
+        JOIN courses c ON c.course_id = NEW.course_id
+        SET ss.graded_credits = ss.graded_credits
+                + IF(NEW.grade IS NULL, 0, COALESCE(c.credits, 0)) - IF(OLD.grade IS NULL, 0, COALESCE(c.credits, 0)),
+            ss.weighted_grade_sum = ss.weighted_grade_sum
+                + (COALESCE(NEW.grade, 0) - COALESCE(OLD.grade, 0)) * COALESCE(c.credits, 0)
+        WHERE ss.student_id = NEW.student_id;
+    END IF;
+END $$
+DELIMITER ;
+
+-- 修改学分时按新旧学分差调整所有选课学生的汇总
+-- (选课触发器更新 enrollment_count 也会触发本触发器，学分不变时直接跳过)
+DELIMITER $$
+CREATE TRIGGER trg_after_course_credits_update
+AFTER UPDATE ON courses
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.credits <=> NEW.credits) THEN
+        UPDATE student_summary ss
+        JOIN selections s ON s.student_id = ss.student_id
+        SET ss.total_credits = ss.total_credits + COALESCE(NEW.credits, 0) - COALESCE(OLD.credits, 0),
+            ss.graded_credits = ss.graded_credits
+                + IF(s.grade IS NULL, 0, COALESCE(NEW.credits, 0) - COALESCE(OLD.credits, 0)),
+            ss.weighted_grade_sum = ss.weighted_grade_sum
+                + COALESCE(s.grade, 0) * (COALESCE(NEW.credits, 0) - COALESCE(OLD.credits, 0))
+        WHERE s.course_id = NEW.course_id;
+    END IF;
+END $$
+DELIMITER ;
+
+-- MySQL 的级联删除不执行 selections 上的触发器：删除课程前先从选课学生的汇总中扣除这门课
+DELIMITER $$
+CREATE TRIGGER trg_before_course_delete
+BEFORE DELETE ON courses
+FOR EACH ROW
+BEGIN
+    UPDATE student_summary ss
+    JOIN selections s ON s.student_id = ss.student_id
+    SET ss.course_count = ss.course_count - 1,
+        ss.total_credits = ss.total_credits - COALESCE(OLD.credits, 0),
+        ss.graded_credits = ss.graded_credits - IF(s.grade IS NULL, 0, COALESCE(OLD.credits, 0)),
+        ss.weighted_grade_sum = ss.weighted_grade_sum - COALESCE(s.grade, 0) * COALESCE(OLD.credits, 0)
+    WHERE s.course_id = OLD.course_id;
+END $$
+DELIMITER ;
@@ -0,0 +1,14 @@
+-- 006: 成绩审计日志按筛选条件键集分页所需的复合索引
+-- get_grade_audit_page: WHERE <筛选列> = ? [AND 时间范围] AND (change_timestamp, log_id) 早于游标
+--                       ORDER BY change_timestamp DESC, log_id DESC LIMIT n
+-- 等值列在前、排序列在后，反向扫描索引即可直接取出一页，不需要 filesort；
+-- 无筛选条件时使用 001 中的 idx_audit_change_ts
+
+CREATE INDEX idx_audit_student_ts
+    ON grade_audit_log (student_id, change_timestamp, log_id);
+
+CREATE INDEX idx_audit_course_ts
+    ON grade_audit_log (course_id, change_timestamp, log_id);
+
+CREATE INDEX idx_audit_changed_by_ts
+    ON grade_audit_log (changed_by, change_timestamp, log_id);
@@ -0,0 +1,20 @@
+-- 007: 成绩审计日志归档表
+-- audit_archive.py 按月把超过保留期的日志从 grade_audit_log 整批移到这里，热表大小保持有界。
+-- 归档表没有外键 (删除学生/课程时不必再维护历史日志)，采用压缩行格式；
+-- 索引与热表相同，backend.get_grade_audit_page 用同一条键集分页查询同时读取两张表。
+
+CREATE TABLE IF NOT EXISTS grade_audit_log_archive (
+    log_id INT PRIMARY KEY,
+    selection_id INT,
+    student_id INT,
+    course_id INT,
+    old_grade DECIMAL(5,2),
+    new_grade DECIMAL(5,2),
+    changed_by VARCHAR(100),
+    change_timestamp TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_audit_archive_ts (change_timestamp, log_id),
+    INDEX idx_audit_archive_student_ts (student_id, change_timestamp, log_id),
+    INDEX idx_audit_archive_course_ts (course_id, change_timestamp, log_id),
+    INDEX idx_audit_archive_changed_by_ts (changed_by, change_timestamp, log_id)
+) ROW_FORMAT=COMPRESSED;
@@ -0,0 +1,8 @@
+-- 008: 学生/课程名称搜索的全文索引 (ngram 分词，适用于中文)
+-- backend.search_students / search_courses: MATCH ... AGAINST ('"输入"' IN BOOLEAN MODE)
+-- 界面下拉框优先使用内存索引 (search_index.py)，学生/课程快照尚未加载时才走这里。
+-- ngram_token_size 默认为 2，更短的输入由 backend 改用 LIKE。
+
+ALTER TABLE students ADD FULLTEXT INDEX ft_students_name_email (student_name, email) WITH PARSER ngram;
+
+ALTER TABLE courses ADD FULLTEXT INDEX ft_courses_name (course_name) WITH PARSER ngram;
@@ -0,0 +1,122 @@
+-- 009: 变更日志，界面按版本号增量刷新 (backend.get_changes_since)，不必在每次写入后重新读取整张表
+-- change_id 是全局递增的版本号，某张表的当前版本为该表最大的 change_id (idx_change_log_table)。
+-- 没有采用每张表一行的计数器：并发选课时所有事务都要更新同一行，会在行锁上排队。
+-- selections 记录 row_id = student_id、ref_id = course_id；courses 的 enrollment_count 随选课变化，
+-- 只在其他列变化时记录，人数变化由 selections 的记录推出。
+-- 外键级联删除不会执行 selections 上的触发器，所以删除学生/课程前先为其选课记录各记一条删除。
+-- 日志只需保留最近一段，用 backend.prune_change_log 清理。
+
+CREATE TABLE IF NOT EXISTS change_log (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(32) NOT NULL,
+    row_id INT NOT NULL,
+    ref_id INT NULL,
+    op CHAR(1) NOT NULL COMMENT 'I 新增 / U 修改 / D 删除',
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_change_log_table (table_name, change_id)
+);
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_student_insert
+AFTER INSERT ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('students', NEW.student_id, 'I');
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_student_update
+AFTER UPDATE ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('students', NEW.student_id, 'U');
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_student_cascade
+BEFORE DELETE ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op)
+    SELECT 'selections', student_id, course_id, 'D' FROM selections WHERE student_id = OLD.student_id;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_student_delete
+AFTER DELETE ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('students', OLD.student_id, 'D');
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_course_insert
+AFTER INSERT ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('courses', NEW.course_id, 'I');
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_course_update
+AFTER UPDATE ON courses
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.course_name <=> NEW.course_name AND OLD.teacher_name <=> NEW.teacher_name
+            AND OLD.credits <=> NEW.credits AND OLD.department <=> NEW.department
+            AND OLD.capacity <=> NEW.capacity) THEN
+        INSERT INTO change_log (table_name, row_id, op) VALUES ('courses', NEW.course_id, 'U');
+    END IF;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_course_cascade
+BEFORE DELETE ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op)
+    SELECT 'selections', student_id, course_id, 'D' FROM selections WHERE course_id = OLD.course_id;
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_course_delete
+AFTER DELETE ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('courses', OLD.course_id, 'D');
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_selection_insert
+AFTER INSERT ON selections
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op) VALUES ('selections', NEW.student_id, NEW.course_id, 'I');
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_selection_update
+AFTER UPDATE ON selections
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op) VALUES ('selections', NEW.student_id, NEW.course_id, 'U');
+END $$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER trg_change_log_selection_delete
+AFTER DELETE ON selections
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op) VALUES ('selections', OLD.student_id, OLD.course_id, 'D');
+END $$
+DELIMITER ;
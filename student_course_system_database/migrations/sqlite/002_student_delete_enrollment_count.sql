@@ -0,0 +1,3 @@
+-- 002: 删除学生时同步减少其所选课程的 enrollment_count (见 migrations/mysql/002)
+-- SQLite 的外键级联删除会执行 trg_after_selection_delete，本来就是正确的；
+-- 保留这个空迁移使两个引擎的版本号保持一致。
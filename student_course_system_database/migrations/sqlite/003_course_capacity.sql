@@ -0,0 +1,16 @@
+-- 003: 课程容量上限 (见 migrations/mysql/003)，capacity 为 NULL 表示不限人数
+-- SQLite 同一时刻只有一个写事务，检查和 trg_after_selection_insert 中的 +1 之间不会插入其他选课，
+-- 所以只需在插入前检查是否已满；RAISE(ABORT) 会回滚整条语句，错误码映射为 45001。
+
+ALTER TABLE courses ADD COLUMN capacity INTEGER DEFAULT NULL;
+
+DELIMITER $$
+CREATE TRIGGER IF NOT EXISTS trg_before_selection_insert
+BEFORE INSERT ON selections
+FOR EACH ROW
+WHEN EXISTS (SELECT 1 FROM courses
+             WHERE course_id = NEW.course_id AND capacity IS NOT NULL AND enrollment_count >= capacity)
+BEGIN
+    SELECT RAISE(ABORT, 'COURSE_FULL');
+END $$
+DELIMITER ;
@@ -0,0 +1,14 @@
+-- 004: 课程候补队列 (见 migrations/mysql/004)
+
+CREATE TABLE IF NOT EXISTS waitlist (
+    waitlist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    joined_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE,
+    UNIQUE (student_id, course_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_waitlist_course_seq ON waitlist (course_id, seq);
@@ -0,0 +1,98 @@
+-- 005: 学生学分/成绩汇总表，由触发器增量维护 (见 migrations/mysql/005)
+
+CREATE TABLE IF NOT EXISTS student_summary (
+    student_id INTEGER PRIMARY KEY,
+    course_count INTEGER NOT NULL DEFAULT 0,
+    total_credits INTEGER NOT NULL DEFAULT 0,
+    graded_credits INTEGER NOT NULL DEFAULT 0,
+    weighted_grade_sum DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+);
+
+INSERT INTO student_summary (student_id, course_count, total_credits, graded_credits, weighted_grade_sum)
+SELECT st.student_id,
+       COUNT(s.selection_id),
+       COALESCE(SUM(COALESCE(c.credits, 0)), 0),
+       COALESCE(SUM(CASE WHEN s.grade IS NULL THEN 0 ELSE COALESCE(c.credits, 0) END), 0),
+       COALESCE(SUM(COALESCE(s.grade, 0) * COALESCE(c.credits, 0)), 0)
+FROM students st
+LEFT JOIN selections s ON s.student_id = st.student_id
+LEFT JOIN courses c ON c.course_id = s.course_id
+GROUP BY st.student_id;
+
+DELIMITER $$
+CREATE TRIGGER IF NOT EXISTS trg_after_student_insert
+AFTER INSERT ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO student_summary (student_id) VALUES (NEW.student_id);
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_after_selection_summary_insert
+AFTER INSERT ON selections
+FOR EACH ROW
+BEGIN
+    UPDATE student_summary
+    SET course_count = course_count + 1,
+        total_credits = total_credits + COALESCE((SELECT credits FROM courses WHERE course_id = NEW.course_id), 0),
+        graded_credits = graded_credits + CASE WHEN NEW.grade IS NULL THEN 0
+            ELSE COALESCE((SELECT credits FROM courses WHERE course_id = NEW.course_id), 0) END,
+        weighted_grade_sum = weighted_grade_sum
+            + COALESCE(NEW.grade, 0) * COALESCE((SELECT credits FROM courses WHERE course_id = NEW.course_id), 0)
+    WHERE student_id = NEW.student_id;
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_after_selection_summary_delete
+AFTER DELETE ON selections
+FOR EACH ROW
+BEGIN
+    UPDATE student_summary
+    SET course_count = course_count - 1,
+        total_credits = total_credits - COALESCE((SELECT credits FROM courses WHERE course_id = OLD.course_id), 0),
+        graded_credits = graded_credits - CASE WHEN OLD.grade IS NULL THEN 0
+            ELSE COALESCE((SELECT credits FROM courses WHERE course_id = OLD.course_id), 0) END,
+        weighted_grade_sum = weighted_grade_sum
+            - COALESCE(OLD.grade, 0) * COALESCE((SELECT credits FROM courses WHERE course_id = OLD.course_id), 0)
+    WHERE student_id = OLD.student_id;
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_after_selection_summary_grade
+AFTER UPDATE OF grade ON selections
+FOR EACH ROW
+WHEN OLD.grade IS NOT NEW.grade
+BEGIN
+    UPDATE student_summary
+    SET graded_credits = graded_credits
+            + (CASE WHEN NEW.grade IS NULL THEN 0 ELSE 1 END - CASE WHEN OLD.grade IS NULL THEN 0 ELSE 1 END)
+              * COALESCE((SELECT credits FROM courses WHERE course_id = NEW.course_id), 0),
+        weighted_grade_sum = weighted_grade_sum
+            + (COALESCE(NEW.grade, 0) - COALESCE(OLD.grade, 0))
+              * COALESCE((SELECT credits FROM courses WHERE course_id = NEW.course_id), 0)
+    WHERE student_id = NEW.student_id;
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_after_course_credits_update
+AFTER UPDATE OF credits ON courses
+FOR EACH ROW
+WHEN OLD.credits IS NOT NEW.credits
+BEGIN
+    UPDATE student_summary
+    SET total_credits = total_credits + COALESCE(NEW.credits, 0) - COALESCE(OLD.credits, 0),
+        graded_credits = graded_credits + (COALESCE(NEW.credits, 0) - COALESCE(OLD.credits, 0))
+            * (SELECT COUNT(*) FROM selections s
+               WHERE s.student_id = student_summary.student_id AND s.course_id = NEW.course_id AND s.grade IS NOT NULL),
+        weighted_grade_sum = weighted_grade_sum + (COALESCE(NEW.credits, 0) - COALESCE(OLD.credits, 0))
+            * COALESCE((SELECT s.grade FROM selections s
+                        WHERE s.student_id = student_summary.student_id AND s.course_id = NEW.course_id), 0)
+    WHERE student_id IN (SELECT student_id FROM selections WHERE course_id = NEW.course_id);
+END $$
+
+-- 级联删除发生在课程行删除之后，那时已查不到学分；先在删除前显式删掉选课记录，
+-- 让上面的 selections 删除触发器在课程还在时扣除汇总
+CREATE TRIGGER IF NOT EXISTS trg_before_course_delete
+BEFORE DELETE ON courses
+FOR EACH ROW
+BEGIN
+    DELETE FROM selections WHERE course_id = OLD.course_id;
+END $$
+DELIMITER ;
@@ -0,0 +1,15 @@
+-- 006: 成绩审计日志按筛选条件键集分页所需的复合索引 (与 migrations/mysql/006 相同)
+-- 新索引以 student_id / course_id 开头，外键 ON DELETE SET NULL 查找子行时同样可用，
+-- 原来的单列索引不再需要
+
+DROP INDEX IF EXISTS idx_audit_student;
+DROP INDEX IF EXISTS idx_audit_course;
+
+CREATE INDEX IF NOT EXISTS idx_audit_student_ts
+    ON grade_audit_log (student_id, change_timestamp, log_id);
+
+CREATE INDEX IF NOT EXISTS idx_audit_course_ts
+    ON grade_audit_log (course_id, change_timestamp, log_id);
+
+CREATE INDEX IF NOT EXISTS idx_audit_changed_by_ts
+    ON grade_audit_log (changed_by, change_timestamp, log_id);
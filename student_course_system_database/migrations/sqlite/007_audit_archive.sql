@@ -0,0 +1,25 @@
+-- 007: 成绩审计日志归档表 (与 migrations/mysql/007 相同，SQLite 没有压缩行格式)
+
+CREATE TABLE IF NOT EXISTS grade_audit_log_archive (
+    log_id INTEGER PRIMARY KEY,
+    selection_id INTEGER,
+    student_id INTEGER,
+    course_id INTEGER,
+    old_grade DECIMAL(5,2),
+    new_grade DECIMAL(5,2),
+    changed_by VARCHAR(100),
+    change_timestamp TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_archive_ts
+    ON grade_audit_log_archive (change_timestamp, log_id);
+
+CREATE INDEX IF NOT EXISTS idx_audit_archive_student_ts
+    ON grade_audit_log_archive (student_id, change_timestamp, log_id);
+
+CREATE INDEX IF NOT EXISTS idx_audit_archive_course_ts
+    ON grade_audit_log_archive (course_id, change_timestamp, log_id);
+
+CREATE INDEX IF NOT EXISTS idx_audit_archive_changed_by_ts
+    ON grade_audit_log_archive (changed_by, change_timestamp, log_id);
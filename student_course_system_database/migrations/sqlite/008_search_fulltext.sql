@@ -0,0 +1,63 @@
+-- 008: 学生/课程名称搜索的全文索引 (与 migrations/mysql/008 对应)
+-- SQLite 使用 FTS5 trigram 分词的外部内容表，由触发器与 students / courses 保持同步；
+-- trigram 至少需要 3 个字符，更短的输入由 backend 改用 LIKE。
+
+CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+    student_name, email, content='students', content_rowid='student_id', tokenize='trigram'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+    course_name, content='courses', content_rowid='course_id', tokenize='trigram'
+);
+
+INSERT INTO students_fts (students_fts) VALUES ('rebuild');
+
+INSERT INTO courses_fts (courses_fts) VALUES ('rebuild');
+
+DELIMITER $$
+CREATE TRIGGER IF NOT EXISTS trg_students_fts_insert
+AFTER INSERT ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO students_fts (rowid, student_name, email) VALUES (NEW.student_id, NEW.student_name, NEW.email);
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_students_fts_delete
+AFTER DELETE ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO students_fts (students_fts, rowid, student_name, email)
+    VALUES ('delete', OLD.student_id, OLD.student_name, OLD.email);
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_students_fts_update
+AFTER UPDATE OF student_name, email ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO students_fts (students_fts, rowid, student_name, email)
+    VALUES ('delete', OLD.student_id, OLD.student_name, OLD.email);
+    INSERT INTO students_fts (rowid, student_name, email) VALUES (NEW.student_id, NEW.student_name, NEW.email);
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_courses_fts_insert
+AFTER INSERT ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO courses_fts (rowid, course_name) VALUES (NEW.course_id, NEW.course_name);
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_courses_fts_delete
+AFTER DELETE ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, course_name) VALUES ('delete', OLD.course_id, OLD.course_name);
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_courses_fts_update
+AFTER UPDATE OF course_name ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, course_name) VALUES ('delete', OLD.course_id, OLD.course_name);
+    INSERT INTO courses_fts (rowid, course_name) VALUES (NEW.course_id, NEW.course_name);
+END $$
+DELIMITER ;
@@ -0,0 +1,80 @@
+-- 009: 变更日志，界面按版本号增量刷新 (与 migrations/mysql/009 对应)
+-- AUTOINCREMENT 保证清理日志后 change_id 也不会回退。
+-- SQLite 的外键级联删除会执行 selections 上的触发器，不需要 MySQL 版本中删除前补记选课记录的触发器；
+-- courses 的触发器只监听 enrollment_count 以外的列，选课人数变化由 selections 的记录推出。
+
+CREATE TABLE IF NOT EXISTS change_log (
+    change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name VARCHAR(32) NOT NULL,
+    row_id INTEGER NOT NULL,
+    ref_id INTEGER,
+    op CHAR(1) NOT NULL,  -- I 新增 / U 修改 / D 删除
+    changed_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_table ON change_log (table_name, change_id);
+
+DELIMITER $$
+CREATE TRIGGER IF NOT EXISTS trg_change_log_student_insert
+AFTER INSERT ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('students', NEW.student_id, 'I');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_student_update
+AFTER UPDATE ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('students', NEW.student_id, 'U');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_student_delete
+AFTER DELETE ON students
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('students', OLD.student_id, 'D');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_course_insert
+AFTER INSERT ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('courses', NEW.course_id, 'I');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_course_update
+AFTER UPDATE OF course_name, teacher_name, credits, department, capacity ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('courses', NEW.course_id, 'U');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_course_delete
+AFTER DELETE ON courses
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, op) VALUES ('courses', OLD.course_id, 'D');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_selection_insert
+AFTER INSERT ON selections
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op) VALUES ('selections', NEW.student_id, NEW.course_id, 'I');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_selection_update
+AFTER UPDATE ON selections
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op) VALUES ('selections', NEW.student_id, NEW.course_id, 'U');
+END $$
+
+CREATE TRIGGER IF NOT EXISTS trg_change_log_selection_delete
+AFTER DELETE ON selections
+FOR EACH ROW
+BEGIN
+    INSERT INTO change_log (table_name, row_id, ref_id, op) VALUES ('selections', OLD.student_id, OLD.course_id, 'D');
+END $$
+DELIMITER ;
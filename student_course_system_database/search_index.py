@@ -0,0 +1,201 @@
+"""学生/课程的内存搜索索引 (下拉框输入即搜)
+
+每张表一个 SearchIndex，索引两类信息:
+- 前缀：所有检索字段 (姓名、邮箱、课程名) 的规范化文本按字典序排成一个有序列表，二分查找
+  取出以输入开头的记录；
+- 子串：名称字段 (student_name / course_name) 的单字和相邻二字 (bigram) 倒排表，多个 bigram
+  的倒排表求交后再核对原文，中文姓名中间的字也能搜到。
+
+输入纯数字时先精确匹配主键。sync(rows) 与上一次的行比较，只增删有变化的记录，
+快照刷新后不必整体重建索引。索引不可用时 (快照尚未加载) 可退回 backend.search_students /
+search_courses 在数据库中搜索 (FULLTEXT ngram / FTS5，迁移 008)。
+
+用法:
+    index = SearchIndex('student_id', ('student_name', 'email'), gram_fields=('student_name',),
+                        label=lambda row: f"{row['student_id']} - {row['student_name']}")
+    index.sync(backend.get_all_students())
+    index.search('张', limit=20)      # [(student_id, 显示文本), ...]
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from operator import add, itemgetter
+
+
+def normalize(value):
+    """检索用的规范化文本：转小写、去掉首尾空白；None 为空串。与原文相同时返回原对象，不额外占内存"""
+    if value is None:
+        return ''
+    text = value if value.__class__ is str else str(value)
+    folded = text.casefold().strip()
+    return text if folded == text else folded
+
+
+def grams(text):
+    """text 的单字和相邻二字集合"""
+    return set(text).union(map(add, text, text[1:]))
+
+
+class SearchIndex:
+    """按主键增删的前缀 + bigram 索引；读写都加锁，可在后台线程 sync、主线程 search
+
+    docs 直接引用传入的行 (与 SnapshotStore 的快照共用同一批对象)，显示文本在搜索时才生成；
+    前缀表用两个平行列表 (文本、主键) 代替 (文本, 主键) 元组，50 万学生时省下约一百万个元组。
+    """
+
+    def __init__(self, key_field, fields, gram_fields=None, label=None):
+        self.key_field = key_field
+        self.fields = tuple(fields)
+        self.gram_fields = tuple(gram_fields if gram_fields is not None else self.fields[:1])
+        # 一次取出全部检索字段 (dict 和 compact_rows.Row 都支持按列名取值)
+        self._values = itemgetter(*self.fields) if len(self.fields) > 1 else lambda row: (row[self.fields[0]],)
+        self.label = label or (lambda row: str(row[key_field]))
+        self.docs = {}                    # 主键 -> 行
+        self.prefix_texts = []            # 规范化文本，有序
+        self.prefix_keys = []             # 与 prefix_texts 对齐的主键
+        self.postings = defaultdict(set)  # 单字/bigram -> {主键}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _gram_texts(self, row):
+        return [normalize(row[field]) for field in self.gram_fields]
+
+    def _add(self, key, row):
+        self.docs[key] = row
+        for value in self._values(row):
+            text = normalize(value)
+            if text:
+                index = bisect_right(self.prefix_texts, text)
+                self.prefix_texts.insert(index, text)
+                self.prefix_keys.insert(index, key)
+        for text in self._gram_texts(row):
+            for gram in grams(text):
+                self.postings[gram].add(key)
+
+    def _remove(self, key):
+        row = self.docs.pop(key)
+        for value in self._values(row):
+            text = normalize(value)
+            if not text:
+                continue
+            index = bisect_left(self.prefix_texts, text)
+            while index < len(self.prefix_texts) and self.prefix_texts[index] == text:
+                if self.prefix_keys[index] == key:
+                    del self.prefix_texts[index]
+                    del self.prefix_keys[index]
+                    break
+                index += 1
+        for text in self._gram_texts(row):
+            for gram in grams(text):
+                keys = self.postings.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[gram]
+
+    def add(self, row):
+        """新增或更新一条记录"""
+        key = row[self.key_field]
+        with self._lock:
+            if key in self.docs:
+                self._remove(key)
+            self._add(key, row)
+
+    def remove(self, key):
+        with self._lock:
+            if key in self.docs:
+                self._remove(key)
+
+    def sync(self, rows):
+        """与最新的全表行对齐：删除已不存在的主键，新增或更新字段有变化的记录
+
+        返回 (新增或更新数, 删除数)。首次调用时整体构建，前缀表一次排序而不是逐条插入。
+        比较也在锁内进行：其他线程可能同时 add/remove，遍历 docs 时字典不能改变大小。
+        """
+        latest = {row[self.key_field]: row for row in rows}
+        if not self.docs:
+            return self._build(latest), 0
+        with self._lock:
+            removed = [key for key in self.docs if key not in latest]
+            changed, unchanged = [], []
+            for key, row in latest.items():
+                old = self.docs.get(key)
+                if old is None or self._values(old) != self._values(row):
+                    changed.append((key, row))
+                elif old is not row:
+                    unchanged.append((key, row))
+            for key in removed:
+                self._remove(key)
+            for key, row in changed:
+                if key in self.docs:
+                    self._remove(key)
+                self._add(key, row)
+            for key, row in unchanged:
+                self.docs[key] = row  # 换成新快照中的行对象，旧快照可以整体释放
+        return len(changed), len(removed)
+
+    def _build(self, latest):
+        texts, keys, postings = [], [], defaultdict(set)
+        for key, row in latest.items():
+            for text in map(normalize, self._values(row)):
+                if text:
+                    texts.append(text)
+                    keys.append(key)
+            for text in self._gram_texts(row):
+                # 单字、二字分别加入，重复的 gram 由 set 去重，不必先为每个名称建一个集合
+                for gram in text:
+                    postings[gram].add(key)
+                for gram in map(add, text, text[1:]):
+                    postings[gram].add(key)
+        # 按文本对下标排序 (稳定排序，同名记录保持传入顺序)，比对 (文本, 主键) 元组排序快
+        order = sorted(range(len(texts)), key=texts.__getitem__)
+        texts = [texts[i] for i in order]
+        keys = [keys[i] for i in order]
+        del order
+        with self._lock:
+            self.docs, self.prefix_texts, self.prefix_keys, self.postings = latest, texts, keys, postings
+        return len(latest)
+
+    def search(self, query, limit=20):
+        """[(主键, 显示文本)]：主键精确匹配、字段前缀匹配、名称子串匹配依次排列，最多 limit 条"""
+        text = normalize(query)
+        if not text or limit <= 0:
+            return []
+        found = {}  # 保持插入顺序
+
+        def take(key):
+            found.setdefault(key, None)
+            return len(found) >= limit
+
+        with self._lock:
+            if text.isdigit() and int(text) in self.docs and take(int(text)):
+                return self._labels(found)
+            index = bisect_left(self.prefix_texts, text)
+            while index < len(self.prefix_texts) and self.prefix_texts[index].startswith(text):
+                if take(self.prefix_keys[index]):
+                    return self._labels(found)
+                index += 1
+            for key in self._substring_candidates(text):
+                if any(text in gram_text for gram_text in self._gram_texts(self.docs[key])) and take(key):
+                    break
+            return self._labels(found)
+
+    def _substring_candidates(self, text):
+        """各 bigram 倒排表的交集 (惰性产出，从最短的倒排表开始逐个检查)"""
+        keys = [text] if len(text) == 1 else [text[i:i + 2] for i in range(len(text) - 1)]
+        lists = []
+        for gram in set(keys):
+            posting = self.postings.get(gram)
+            if not posting:
+                return
+            lists.append(posting)
+        lists.sort(key=len)
+        first, rest = lists[0], lists[1:]
+        for key in first:
+            if all(key in posting for posting in rest):
+                yield key
+
+    def _labels(self, found):
+        return [(key, self.label(self.docs[key])) for key in found]
@@ -0,0 +1,136 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from operator import itemgetter
+
+
+class TableSnapshot:
+    """一张表在进程内的快照：按主键排序的行列表，供多个视图共享读取"""
+
+    def __init__(self, name, key_field, fetch_all):
+        self.name = name
+        self.key_field = key_field
+        self.fetch_all = fetch_all
+        self.rows = []
+        self.keys = []
+        self.version = 0       # 每次刷新后递增，视图可据此判断是否需要重绘
+        self.loaded = False
+        self.generation = 0    # 已发起的整表刷新次数，增量更新据此判断期间是否有整表刷新
+        self.listeners = []
+        self.patch_listeners = []
+        self.in_flight = False
+        self.pending_action = None  # 刷新在途期间又收到的刷新请求 (合并为一次)
+
+    def replace(self, rows):
+        key = itemgetter(self.key_field)
+        self.rows = sorted(rows, key=key)
+        self.keys = [key(row) for row in self.rows]
+        self.version += 1
+        self.loaded = True
+
+    def patch(self, rows, deleted_keys=()):
+        """按主键就地更新：rows 中的行新增或替换同主键的行，deleted_keys 中的主键删除"""
+        key = itemgetter(self.key_field)
+        for deleted in deleted_keys:
+            index = bisect_left(self.keys, deleted)
+            if index < len(self.keys) and self.keys[index] == deleted:
+                del self.rows[index]
+                del self.keys[index]
+        for row in rows:
+            row_key = key(row)
+            index = bisect_left(self.keys, row_key)
+            if index < len(self.keys) and self.keys[index] == row_key:
+                self.rows[index] = row
+            else:
+                self.rows.insert(index, row)
+                self.keys.insert(index, row_key)
+        self.version += 1
+
+    def page(self, after_key, limit):
+        """键集分页读取快照，接口与 backend.get_students_page 一致"""
+        start = 0 if after_key is None else bisect_right(self.keys, after_key)
+        return self.rows[start:start + limit]
+
+    def get(self, key):
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return self.rows[index]
+        return None
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class SnapshotStore:
+    """学生/课程等表的共享快照
+
+    Treeview 和下拉框都从这里读数据，一次变更只触发一次数据库查询；
+    刷新在途时收到的新请求会在当前刷新完成后合并为一次补刷。
+    fetch_counts 按界面操作统计实际发生的数据库全表查询次数，patch_counts 统计增量更新次数。
+    """
+
+    def __init__(self, submit):
+        self._submit = submit  # 签名同 TaskDispatcher.submit
+        self.tables = {}
+        self.fetch_counts = Counter()
+        self.patch_counts = Counter()
+
+    def register(self, name, key_field, fetch_all):
+        self.tables[name] = TableSnapshot(name, key_field, fetch_all)
+        return self.tables[name]
+
+    def subscribe(self, name, callback, on_patch=None):
+        """callback(snapshot) 在每次刷新完成后于主线程调用；on_patch(snapshot, rows, deleted_keys) 在每次增量更新后调用"""
+        self.tables[name].listeners.append(callback)
+        if on_patch is not None:
+            self.tables[name].patch_listeners.append(on_patch)
+
+    def apply(self, name, rows, deleted_keys, generation, action='变更'):
+        """(主线程) 把变更日志读出的行合并进快照，返回是否已增量更新
+
+        generation 为读取这些行之前的 snapshot.generation。快照尚未加载、整表刷新在途，
+        或读取期间发起过整表刷新时，这些行可能比快照旧，改为 (补) 刷新整表。
+        """
+        table = self.tables[name]
+        if not table.loaded or table.in_flight or table.generation != generation:
+            self.refresh(name, action)
+            return False
+        table.patch(rows, deleted_keys)
+        self.patch_counts[(action, name)] += 1
+        for callback in table.patch_listeners:
+            callback(table, rows, deleted_keys)
+        return True
+
+    def refresh(self, name, action='refresh', on_error=None):
+        table = self.tables[name]
+        if table.in_flight:
+            # 已在刷新中：在途的查询可能早于本次变更开始，完成后再补刷一次
+            if table.pending_action is None:
+                table.pending_action = action
+            return
+
+        def done(rows):
+            table.in_flight = False
+            table.replace(rows)
+            for callback in table.listeners:
+                callback(table)
+            if table.pending_action is not None:
+                next_action, table.pending_action = table.pending_action, None
+                self.refresh(name, next_action, on_error)
+
+        def failed(exc):
+            table.in_flight = False
+            table.pending_action = None
+            if on_error:
+                on_error(exc)
+
+        table.in_flight = True
+        table.generation += 1
+        self.fetch_counts[(action, name)] += 1
+        self._submit(table.fetch_all, on_success=done, on_error=failed)
+
+    def fetch_report(self, counts=None):
+        """{界面操作: {表名: 查询次数}}；counts 传 patch_counts 时为增量更新次数"""
+        report = {}
+        for (action, name), count in sorted((self.fetch_counts if counts is None else counts).items()):
+            report.setdefault(action, {})[name] = count
+        return report
@@ -0,0 +1,98 @@
+-- SQLite 版本的初始结构 (对应 student_course_system.sql，版本 0)
+-- 由 storage_engines.SQLiteEngine 在首次连接空数据库时执行，之后的变更见 migrations/sqlite/
+-- 与 MySQL 版本的差异:
+--   * AUTOINCREMENT 保证删除后的 ID 不被复用 (与 InnoDB 自增一致，实体缓存依赖这一点)
+--   * email / course_name 使用 NOCASE，对应 utf8mb4_unicode_ci 的大小写不敏感唯一约束
+--   * 时间默认值使用本地时间，与 MySQL 的 CURRENT_TIMESTAMP / NOW() 一致 (SQLite 默认是 UTC)
+--   * SQLite 的外键级联删除会执行 selections 上的触发器，删除学生时 enrollment_count 同步减少
+
+-- 1. 学生表
+CREATE TABLE IF NOT EXISTS students (
+    student_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_name VARCHAR(100) NOT NULL,
+    student_gender VARCHAR(10) DEFAULT '其他' CHECK (student_gender IN ('男', '女', '其他')),
+    enrollment_year INTEGER,
+    email VARCHAR(100) COLLATE NOCASE UNIQUE
+);
+
+-- 2. 课程表
+CREATE TABLE IF NOT EXISTS courses (
+    course_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_name VARCHAR(100) COLLATE NOCASE NOT NULL UNIQUE,
+    teacher_name VARCHAR(100),
+    credits INTEGER DEFAULT 0,
+    department VARCHAR(100),
+    enrollment_count INTEGER DEFAULT 0  -- 当前选课人数
+);
+
+-- 3. 选课记录表
+CREATE TABLE IF NOT EXISTS selections (
+    selection_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    selection_date TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    grade DECIMAL(5, 2),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE,
+    UNIQUE (student_id, course_id)
+);
+-- MySQL 会为外键列自动建索引，SQLite 不会；course_id 的索引由迁移 001 的覆盖索引提供
+-- (student_id 由上面的 UNIQUE 约束覆盖)
+
+-- 4. 初始化示例数据
+INSERT INTO students (student_name, student_gender, enrollment_year, email) VALUES
+('张三', '男', 2023, 'zhangsan@example.com'),
+('李四', '女', 2022, 'lisi@example.com'),
+('王五', '男', 2023, 'wangwu@example.com');
+
+INSERT INTO courses (course_name, teacher_name, credits, department) VALUES
+('数据库原理', '赵老师', 3, '计算机系'),
+('操作系统', '钱老师', 4, '计算机系'),
+('高等数学', '孙老师', 5, '数学系');
+
+-- 5. 成绩变更审计日志表
+CREATE TABLE IF NOT EXISTS grade_audit_log (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    selection_id INTEGER,
+    student_id INTEGER,
+    course_id INTEGER,
+    old_grade DECIMAL(5,2),
+    new_grade DECIMAL(5,2),
+    changed_by VARCHAR(100) DEFAULT 'DB_TRIGGER',
+    change_timestamp TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE SET NULL,
+    FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE SET NULL
+);
+-- 外键 ON DELETE SET NULL 需要在父表删除时查找子行
+CREATE INDEX IF NOT EXISTS idx_audit_student ON grade_audit_log (student_id);
+CREATE INDEX IF NOT EXISTS idx_audit_course ON grade_audit_log (course_id);
+
+-- 6. 触发器：选课插入后，课程人数+1
+CREATE TRIGGER IF NOT EXISTS trg_after_selection_insert
+AFTER INSERT ON selections
+FOR EACH ROW
+BEGIN
+    UPDATE courses
+    SET enrollment_count = enrollment_count + 1
+    WHERE course_id = NEW.course_id;
+END;
+
+-- 7. 触发器：选课删除后，课程人数-1（不为负数）
+CREATE TRIGGER IF NOT EXISTS trg_after_selection_delete
+AFTER DELETE ON selections
+FOR EACH ROW
+BEGIN
+    UPDATE courses
+    SET enrollment_count = MAX(enrollment_count - 1, 0)
+    WHERE course_id = OLD.course_id;
+END;
+
+-- 8. 触发器：成绩变更写入审计日志 (IS NOT 同时处理了 NULL 的情况)
+CREATE TRIGGER IF NOT EXISTS trg_after_selection_grade_update
+AFTER UPDATE OF grade ON selections
+FOR EACH ROW
+WHEN OLD.grade IS NOT NEW.grade
+BEGIN
+    INSERT INTO grade_audit_log (selection_id, student_id, course_id, old_grade, new_grade, change_timestamp)
+    VALUES (OLD.selection_id, OLD.student_id, OLD.course_id, OLD.grade, NEW.grade, datetime('now', 'localtime'));
+END;
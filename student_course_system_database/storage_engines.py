@@ -0,0 +1,285 @@
+"""存储引擎
+
+backend.py 只通过 get_db_connection() 拿到 (conn, cursor)，SQL 统一使用 %s 占位符、
+错误统一按 MySQL 错误码 (err.errno) 判断。这里提供两种实现:
+
+- MySQLEngine: mysql.connector，原有实现
+- SQLiteEngine: 内嵌 SQLite (WAL 模式)，无需数据库服务器，适合测试、基准测试和单机部署。
+  连接对象模仿 mysql.connector 的接口，触发器从 student_course_system.sql 移植到 sqlite_schema.sql。
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import mysql.connector
+except ImportError:  # 只使用 SQLite 时不需要安装 mysql-connector-python
+    mysql = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class DatabaseError(Exception):
+    """与引擎无关的数据库错误，errno 沿用 MySQL 错误码"""
+
+    def __init__(self, msg, errno=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.errno = errno
+
+    def __str__(self):
+        return f"{self.errno} {self.msg}" if self.errno else self.msg
+
+
+# 选课触发器在课程已满时抛出的自定义错误码 (见 migrations/*/003_course_capacity.sql)
+ERRNO_COURSE_FULL = 45001
+
+# backend 中 except 子句捕获的异常类型
+DB_ERRORS = (DatabaseError,) + ((mysql.connector.Error,) if mysql is not None else ())
+
+
+# --- MySQL ---
+class MySQLEngine:
+    name = 'mysql'
+    schema_file = os.path.join(BASE_DIR, 'student_course_system.sql')
+
+    def __init__(self, config):
+        if mysql is None:
+            raise ImportError("使用 MySQL 引擎需要安装 mysql-connector-python")
+        self.config = config
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def validate(self, conn):
+        conn.ping(reconnect=False)
+        return True
+
+
+# --- SQLite ---
+# SQLite 的错误信息 -> MySQL 错误码，使 backend 中 err.errno == 1062 之类的判断对两种引擎都成立
+_SQLITE_ERRNO_PATTERNS = [
+    ('UNIQUE constraint failed', 1062),        # ER_DUP_ENTRY
+    ('FOREIGN KEY constraint failed', 1452),   # ER_NO_REFERENCED_ROW_2
+    ('NOT NULL constraint failed', 1048),      # ER_BAD_NULL_ERROR
+    ('CHECK constraint failed', 3819),         # ER_CHECK_CONSTRAINT_VIOLATED
+    ('database is locked', 1205),              # ER_LOCK_WAIT_TIMEOUT
+    ('COURSE_FULL', ERRNO_COURSE_FULL),        # trg_before_selection_insert 的 RAISE(ABORT)
+]
+
+def _translate_error(exc):
+    message = str(exc)
+    for pattern, errno in _SQLITE_ERRNO_PATTERNS:
+        if pattern in message:
+            return DatabaseError(message, errno)
+    return DatabaseError(message)
+
+# MySQL 方言 -> SQLite 方言 (只覆盖 backend 中用到的写法)
+_SQL_REWRITES = [
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\bNOW\(\)', re.I), "datetime('now', 'localtime')"),
+    # SQLite 没有行锁：去掉 FOR UPDATE，改由 SQLiteCursor.execute 在事务开始时取得写锁 (BEGIN IMMEDIATE)
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.I), ''),
+]
+_FOR_UPDATE = re.compile(r'\bFOR\s+UPDATE\b', re.I)
+_sql_cache = {}
+
+def translate_sql(sql):
+    translated = _sql_cache.get(sql)
+    if translated is None:
+        translated = sql
+        for pattern, replacement in _SQL_REWRITES:
+            translated = pattern.sub(replacement, translated)
+        if len(_sql_cache) < 1024:
+            _sql_cache[sql] = translated
+    return translated
+
+
+def _register_sqlite_types():
+    # 与 MySQL 返回的 Python 类型保持一致：DECIMAL -> Decimal(两位小数)，TIMESTAMP -> datetime
+    sqlite3.register_adapter(Decimal, str)
+    sqlite3.register_adapter(datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+    sqlite3.register_adapter(date, lambda value: value.isoformat())
+    sqlite3.register_converter('DECIMAL', lambda raw: Decimal(raw.decode()).quantize(Decimal('0.01')))
+    sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+
+_register_sqlite_types()
+
+
+class SQLiteCursor:
+    """模仿 mysql.connector 游标：%s 占位符、dictionary=True 返回 dict、错误带 errno"""
+
+    def __init__(self, raw_cursor, dictionary=False):
+        self._cursor = raw_cursor
+        self._dictionary = dictionary
+        self._columns = None
+
+    def _wrap(self, func, *args):
+        try:
+            func(*args)
+        except sqlite3.Error as exc:
+            raise _translate_error(exc) from exc
+        description = self._cursor.description
+        self._columns = tuple(col[0] for col in description) if description else None
+        return None
+
+    def execute(self, sql, params=()):
+        if not self._cursor.connection.in_transaction and _FOR_UPDATE.search(sql):
+            # 对应 MySQL 的锁定读：先取得写锁再读取，读到的值在本事务提交前不会被其他连接修改
+            # (Python sqlite3 只在写语句前隐式 BEGIN，否则这次读取不在任何事务中)
+            self._wrap(self._cursor.execute, "BEGIN IMMEDIATE")
+        return self._wrap(self._cursor.execute, translate_sql(sql), tuple(params or ()))
+
+    def executemany(self, sql, seq_of_params):
+        return self._wrap(self._cursor.executemany, translate_sql(sql), [tuple(p) for p in seq_of_params])
+
+    def _convert(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self._columns, row))
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return self._columns or ()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """模仿 mysql.connector 连接对象的最小接口"""
+
+    unread_result = False  # SQLite 游标不会阻塞连接，提前停止读取也不影响后续语句
+
+    def __init__(self, raw_conn):
+        self._conn = raw_conn
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as exc:
+            raise _translate_error(exc) from exc
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1").fetchone()
+
+    def is_connected(self):
+        try:
+            self.ping()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def consume_results(self):
+        pass
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+
+class SQLiteEngine:
+    name = 'sqlite'
+    schema_file = os.path.join(BASE_DIR, 'sqlite_schema.sql')
+
+    # WAL：读写互不阻塞；NORMAL 同步级别在 WAL 下掉电只可能丢最后的事务，不会损坏数据库
+    DEFAULT_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',          # SQLite 默认不检查外键，必须每个连接单独打开
+        'busy_timeout': 5000,          # 写锁冲突时等待毫秒数，而不是立即报 database is locked
+        'cache_size': -65536,          # 页缓存 64MB (负数表示 KB)
+        'temp_store': 'MEMORY',
+        'mmap_size': 268435456,
+    }
+
+    def __init__(self, path, pragmas=None, initialize=True):
+        self.path = path
+        self.pragmas = dict(self.DEFAULT_PRAGMAS, **(pragmas or {}))
+        self._init_lock = threading.Lock()
+        self._initialized = not initialize
+
+    def connect(self):
+        # 打不开数据库文件、建表失败等也转换为 DatabaseError，backend 才能按 DB_ERRORS 处理
+        try:
+            self._ensure_schema()
+            return self._open()
+        except sqlite3.Error as exc:
+            raise _translate_error(exc) from exc
+
+    def _open(self):
+        raw = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        try:
+            for key, value in self.pragmas.items():
+                raw.execute(f"PRAGMA {key} = {value}")
+        except sqlite3.Error:
+            raw.close()
+            raise
+        return SQLiteConnection(raw)
+
+    def validate(self, conn):
+        conn.ping()
+        return True
+
+    def _ensure_schema(self):
+        """首次连接时若数据库为空则建表，再执行 migrations/sqlite 下未执行的迁移"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            # 延迟导入：migrate 依赖 backend，backend 依赖本模块
+            import migrate
+            conn = self._open()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students'")
+                if cursor.fetchone() is None:
+                    with open(self.schema_file, encoding='utf-8') as f:
+                        conn._conn.executescript(f.read())
+                migrate.apply_migrations(conn, cursor, directory=migrate.migrations_dir(self.name))
+            finally:
+                cursor.close()
+                conn.close()
+            self._initialized = True
+
+def create_engine(name, mysql_config=None, sqlite_config=None):
+    if name == 'mysql':
+        return MySQLEngine(mysql_config)
+    if name == 'sqlite':
+        return SQLiteEngine(**(sqlite_config or {}))
+    raise ValueError(f"未知的存储引擎: {name}")
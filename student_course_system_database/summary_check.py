@@ -0,0 +1,39 @@
+"""学生汇总一致性检查脚本
+
+从 selections/courses 明细重新计算每个学生的选课数、学分和加权成绩和，与触发器维护的
+student_summary 比较，发现偏差时以非零状态退出；加 --repair 时用重新计算的结果覆盖。
+MySQL 下两次读取在同一个可重复读事务中，检查期间的并发写入不会被误报为偏差。
+
+用法:
+    python summary_check.py            # 只检查
+    python summary_check.py --repair   # 检查并修复
+"""
+import argparse
+import sys
+
+import backend
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查 student_summary 与选课明细是否一致")
+    parser.add_argument('--repair', action='store_true', help="用重新计算的结果修复有偏差的行")
+    parser.add_argument('--limit', type=int, default=50, help="最多打印多少条偏差")
+    args = parser.parse_args(argv)
+
+    drift = backend.check_student_summary(repair=args.repair)
+    if drift is None:
+        sys.exit(2)
+    if not drift:
+        print("student_summary 与明细一致。")
+        return
+    print(f"发现 {len(drift)} 处偏差{'，已修复' if args.repair else ''}:")
+    print(f"{'学生ID':<10} {'字段':<20} {'汇总表':>12} {'重新计算':>12}")
+    for student_id, field, stored, expected in drift[:args.limit]:
+        print(f"{student_id:<10} {field:<20} {str(stored):>12} {str(expected):>12}")
+    if len(drift) > args.limit:
+        print(f"... 另有 {len(drift) - args.limit} 处")
+    if not args.repair:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import queue
+import sys
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+
+class TaskDispatcher:
+    """把后端调用放到线程池执行，并通过 root.after 把结果交回 Tk 主线程
+
+    Tk 控件只能在主线程中操作，所以工作线程只把 (任务, future) 放进队列，
+    由主线程定时轮询队列并调用 on_success / on_error。
+
+    同一个 key 的新任务会使旧任务过期：尚未开始的旧任务被取消，已经在执行的
+    旧任务结果会被丢弃 (例如加载学生 A 的选课时又切换到学生 B)。
+    background=True 的任务 (例如定时轮询) 不计入忙碌状态，不会让界面周期性地显示忙碌。
+    """
+
+    POLL_INTERVAL_MS = 30
+
+    def __init__(self, root, max_workers=4, on_busy_change=None):
+        self.root = root
+        self.on_busy_change = on_busy_change
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-worker')
+        self._results = queue.Queue()
+        self._latest = {}    # key -> 最新任务的 future
+        self._pending = 0
+        self._busy = 0       # 不含 background 任务的在途数
+        self._polling = False
+        self._closed = False
+
+    def submit(self, func, *args, on_success=None, on_error=None, key=None, background=False):
+        """提交 func(*args) 到线程池；on_success(result) / on_error(exc) 在主线程调用"""
+        if self._closed:
+            return None
+        if key is not None:
+            self.cancel(key)
+        future = self._executor.submit(func, *args)
+        task = {'key': key, 'on_success': on_success, 'on_error': on_error, 'background': background}
+        if key is not None:
+            self._latest[key] = future
+        self._pending += 1
+        if not background:
+            self._busy += 1
+            if self._busy == 1 and self.on_busy_change:
+                self.on_busy_change(True)
+        # 回调在工作线程 (或取消时在当前线程) 中执行，这里只入队，不碰 Tk
+        future.add_done_callback(lambda f: self._results.put((task, f)))
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_INTERVAL_MS, self._poll)
+        return future
+
+    def cancel(self, key):
+        """使 key 对应的在途任务过期；未开始的直接取消"""
+        future = self._latest.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def is_busy(self):
+        return self._busy > 0
+
+    def _poll(self):
+        while True:
+            try:
+                task, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if not task['background']:
+                self._busy -= 1
+                if self._busy == 0 and self.on_busy_change and not self._closed:
+                    self.on_busy_change(False)
+            key = task['key']
+            if key is not None:
+                if self._latest.get(key) is not future:
+                    continue  # 已被同 key 的新任务取代
+                del self._latest[key]
+            if self._closed:
+                continue
+            try:
+                self._deliver(task, future)
+            except Exception:
+                # 回调本身出错时交给 Tk 的默认异常报告，不能中断轮询
+                self.root.report_callback_exception(*sys.exc_info())
+        if self._pending > 0 and not self._closed:
+            self.root.after(self.POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False
+
+    def _deliver(self, task, future):
+        try:
+            result = future.result()
+        except CancelledError:
+            return
+        except Exception as exc:
+            if task['on_error']:
+                task['on_error'](exc)
+                return
+            raise
+        if task['on_success']:
+            task['on_success'](result)
+
+    def shutdown(self):
+        """窗口关闭时调用：取消排队中的任务，不等待正在执行的任务"""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,37 @@
+"""compact_rows 的回归测试 (python -m pytest 或 python -m unittest test_compact_rows)"""
+import unittest
+from array import array
+
+from compact_rows import ColumnSet
+
+
+class ColumnSetExtendTest(unittest.TestCase):
+
+    def test_typed_columns(self):
+        columns = ColumnSet(('a', 'b'))
+        columns.extend([(1, 1.5), (2, 2.5)])
+        self.assertIsInstance(columns['a'], array)
+        self.assertIsInstance(columns['b'], array)
+        self.assertEqual(len(columns), 2)
+
+    def test_fallback_to_list_keeps_columns_aligned(self):
+        # array.extend 在遇到 None 之前已追加了 3，转为 list 时不能再追加一遍
+        columns = ColumnSet(('a', 'b'))
+        columns.extend([(1, 1.5), (2, 2.5)])
+        columns.extend([(3, 3.5), (None, None), (5, 5.5)])
+        self.assertEqual(list(columns['a']), [1, 2, 3, None, 5])
+        self.assertEqual(list(columns['b']), [1.5, 2.5, 3.5, None, 5.5])
+        self.assertEqual(len(columns), 5)
+        self.assertEqual([tuple(row) for row in columns],
+                         [(1, 1.5), (2, 2.5), (3, 3.5), (None, None), (5, 5.5)])
+
+    def test_fallback_on_overflow(self):
+        columns = ColumnSet(('a',))
+        columns.extend([(1,)])
+        columns.extend([(2,), (2 ** 70,)])
+        self.assertEqual(list(columns['a']), [1, 2, 2 ** 70])
+        self.assertEqual(len(columns), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+import tkinter as tk
+from bisect import bisect_left
+
+
+class VirtualTreeList:
+    """Treeview 虚拟列表
+
+    Treeview 中只保留可见窗口附近的 max_pages 页数据。滚动接近底部时用最后一行的键
+    向后取下一页 (键集分页)，同时丢弃最上面的一页；滚回顶部时按记录下的起始键重新
+    取回被丢弃的页。这样无论表有多大，Treeview 中的行数都不超过 page_size * max_pages。
+
+    - fetch_page(after_key, limit): 返回 after_key 之后的至多 limit 行，after_key 为 None 表示从头开始
+    - row_key(row): 取一行的分页键 (例如 student_id)
+    - row_values(row): 取一行在 Treeview 中显示的 values
+    - submit: 可选的异步执行函数，签名同 TaskDispatcher.submit；不提供时在当前线程同步取页
+    - on_error(exc): 取页失败时的回调
+    """
+
+    EDGE_FRACTION = 0.1  # 距离边缘多近时触发加载
+
+    def __init__(self, tree, scrollbar, fetch_page, row_key, row_values, page_size=200, max_pages=3,
+                 submit=None, on_error=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page
+        self.row_key = row_key
+        self.row_values = row_values
+        self.page_size = page_size
+        self.max_pages = max(2, max_pages)
+        self._pages = []          # 当前在 Treeview 中的页: {'after': 起始键, 'last': 末行键, 'items': [iid], 'keys': [键]}
+        self._dropped_above = []  # 被丢弃的上方页的起始键 (栈)
+        self._at_end = False      # 最后一页已经取到表尾
+        self._check_pending = False
+        self._loading = False
+        self._generation = 0      # reload 后递增，丢弃旧一轮的取页结果
+        self._submit = submit or _run_inline
+        self.on_error = on_error
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+
+    # --- 对外接口 ---
+    def clear(self):
+        """一次性清空 Treeview，而不是逐条 delete"""
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._pages = []
+        self._dropped_above = []
+        self._at_end = False
+        self._loading = False
+        self._generation += 1
+
+    def reload(self):
+        """清空后从第一页重新加载"""
+        self.clear()
+        self._load_next()
+
+    def patch(self, rows, deleted_keys=()):
+        """按键就地更新已加载的行：已显示的行改写 values 或删除；新行只在落入已加载页的键范围时插入，
+        其余的新行在滚动到时由 fetch_page 取到。不清空 Treeview，滚动位置和选中行保持不变"""
+        for key in deleted_keys:
+            found = self._locate(key)
+            if found and found[2]:
+                page, i, _ = found
+                self.tree.delete(page['items'].pop(i))
+                del page['keys'][i]
+        for row in rows:
+            key = self.row_key(row)
+            found = self._locate(key)
+            if found is None:
+                continue
+            page, i, exists = found
+            if exists:
+                self.tree.item(page['items'][i], values=self.row_values(row))
+                continue
+            offset = 0
+            for other in self._pages:
+                if other is page:
+                    break
+                offset += len(other['items'])
+            page['items'].insert(i, self.tree.insert("", offset + i, values=self.row_values(row)))
+            page['keys'].insert(i, key)
+        if rows and not self._pages and self._at_end:
+            self.reload()  # 原来是空表
+
+    def _locate(self, key):
+        """(页, 页内位置, 是否已显示)；key 不在已加载页的键范围内时为 None"""
+        for n, page in enumerate(self._pages):
+            if page['after'] is not None and key <= page['after']:
+                return None
+            if key <= page['last'] or (n == len(self._pages) - 1 and self._at_end):
+                i = bisect_left(page['keys'], key)
+                return page, i, i < len(page['keys']) and page['keys'][i] == key
+        return None
+
+    def loaded_row_count(self):
+        return sum(len(page['items']) for page in self._pages)
+
+    # --- 滚动处理 ---
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self._check_pending:
+            self._check_pending = True
+            self.tree.after_idle(self._check_edges)
+
+    def _check_edges(self):
+        self._check_pending = False
+        if not self._pages or self._loading:
+            return
+        first, last = self.tree.yview()
+        if last >= 1.0 - self.EDGE_FRACTION and not self._at_end:
+            self._load_next()
+        elif first <= self.EDGE_FRACTION and self._dropped_above:
+            self._load_prev()
+
+    # --- 分页加载 ---
+    def _insert_page(self, after_key, rows, index):
+        items = [self.tree.insert("", index if index == tk.END else index + i, values=self.row_values(row))
+                 for i, row in enumerate(rows)]
+        keys = [self.row_key(row) for row in rows]
+        return {'after': after_key, 'last': keys[-1], 'items': items, 'keys': keys}
+
+    def _request(self, after_key, on_rows):
+        """异步取一页，结果回到主线程后交给 on_rows(rows)"""
+        if self._loading:
+            return
+        self._loading = True
+        generation = self._generation
+
+        def done(rows):
+            if generation != self._generation:
+                return
+            self._loading = False
+            on_rows(rows)
+
+        def failed(exc):
+            if generation != self._generation:
+                return
+            self._loading = False
+            if self.on_error:
+                self.on_error(exc)
+
+        self._submit(self.fetch_page, after_key, self.page_size,
+                     on_success=done, on_error=failed, key=('virtual_page', id(self)))
+
+    def _load_next(self):
+        after_key = self._pages[-1]['last'] if self._pages else None
+        self._request(after_key, lambda rows: self._append_page(after_key, rows))
+
+    def _append_page(self, after_key, rows):
+        if len(rows) < self.page_size:
+            self._at_end = True
+        if not rows:
+            return
+        self._pages.append(self._insert_page(after_key, rows, tk.END))
+        if len(self._pages) > self.max_pages:
+            dropped = self._pages.pop(0)
+            self._dropped_above.append(dropped['after'])
+            self.tree.delete(*dropped['items'])
+            # 删除上方的行后把视图同步上移，保持用户看到的内容不跳动
+            self.tree.yview_scroll(-len(dropped['items']), 'units')
+
+    def _load_prev(self):
+        after_key = self._dropped_above[-1]
+        self._request(after_key, lambda rows: self._prepend_page(after_key, rows))
+
+    def _prepend_page(self, after_key, rows):
+        self._dropped_above.pop()
+        if not rows:
+            return
+        self._pages.insert(0, self._insert_page(after_key, rows, 0))
+        self.tree.yview_scroll(len(rows), 'units')
+        if len(self._pages) > self.max_pages:
+            dropped = self._pages.pop()
+            self.tree.delete(*dropped['items'])
+            self._at_end = False
+
+
+def _run_inline(func, *args, on_success=None, on_error=None, key=None):
+    """未提供 submit 时的同步执行方式"""
+    try:
+        result = func(*args)
+    except Exception as exc:
+        if on_error is None:
+            raise
+        on_error(exc)
+    else:
+        if on_success:
+            on_success(result)